@@ -0,0 +1,145 @@
+"""
+백엔드 API 비동기 클라이언트 (aiohttp 세션 싱글톤, keep-alive 커넥션 풀)
+
+requests는 동기 호출이라 asyncio 이벤트 루프를 통째로 멈추게 하므로
+실행 웹의 모든 백엔드 통신(/command, /state, /action, /verification,
+/logout, /execution_web/init)은 이 모듈을 거친다.
+"""
+
+import json
+import asyncio
+
+import aiohttp
+
+import state_codec
+import service_log
+
+logger = service_log.get_logger("backend")
+
+_base_url = None
+_session = None
+
+POOL_LIMIT = 8            # 동시 커넥션 최대 개수
+KEEPALIVE_TIMEOUT = 30    # 유휴 커넥션 유지 시간 (초)
+
+
+class BackendConnectionError(Exception):
+    """백엔드 서버에 연결할 수 없음"""
+
+
+class BackendResponse:
+    """requests.Response와 비슷하게 쓰기 위한 최소 응답 객체"""
+
+    def __init__(self, status_code, text, headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.text)
+
+
+def configure(base_url):
+    """백엔드 URL 설정 (poll 시작 시 1회 호출)"""
+    global _base_url
+    _base_url = base_url.rstrip("/")
+
+
+def url(path):
+    """백엔드 경로 → 전체 URL"""
+    if _base_url is None:
+        raise RuntimeError("backend_client.configure()가 호출되지 않았습니다.")
+    return f"{_base_url}{path}"
+
+
+async def get_session():
+    """aiohttp 세션 싱글톤 반환 (이벤트 루프 안에서 지연 생성)"""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=POOL_LIMIT,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+        )
+        _session = aiohttp.ClientSession(connector=connector)
+        logger.info("[Backend] HTTP 세션 생성 (keep-alive 풀)")
+    return _session
+
+
+async def request(method, path, *, params=None, json_body=None, data=None, headers=None, timeout=10):
+    """
+    백엔드 요청 공통 처리. 연결 실패는 BackendConnectionError로 변환
+    data: 이미 인코딩된 본문(bytes) - json_body 대신 사용
+    """
+    session = await get_session()
+    try:
+        async with session.request(
+            method,
+            url(path),
+            params=params,
+            json=json_body,
+            data=data,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=timeout),
+        ) as response:
+            text = await response.text()
+            return BackendResponse(response.status, text, response.headers.copy())
+    except aiohttp.ClientConnectionError as e:
+        raise BackendConnectionError(str(e)) from e
+
+
+async def close():
+    """세션 종료 (서비스 종료 시)"""
+    global _session
+    if _session is not None:
+        try:
+            await _session.close()
+            logger.info("[Backend] HTTP 세션 종료 완료")
+        except asyncio.CancelledError:
+            logger.info("[Backend] HTTP 세션 종료 중 취소됨 (정상)")
+        except Exception as e:
+            logger.error(f"[Backend] HTTP 세션 종료 오류: {e}")
+        finally:
+            _session = None
+
+
+# ============================================================
+# 엔드포인트별 헬퍼
+# ============================================================
+
+async def post_init(timeout=5):
+    return await request(
+        "POST", "/execution_web/init", json_body={"status": "started"}, timeout=timeout
+    )
+
+
+async def get_command(params, timeout=10):
+    return await request("GET", "/command", params=params, timeout=timeout)
+
+
+async def get_action(student_id=None, timeout=10):
+    params = {"student_id": student_id} if student_id else None
+    return await request("GET", "/action", params=params, timeout=timeout)
+
+
+async def post_state(data, timeout=10):
+    """상태 전송 (init에서 협상한 압축/축약 형식 적용 → state_codec)"""
+    body, headers = state_codec.encode_state(data)
+    response = await request("POST", "/state", data=body, headers=headers, timeout=timeout)
+    if response.status_code == 415 and state_codec.is_encoded(headers):
+        logger.info("[Backend] 상태 본문 인코딩 거부됨(415) → 평문 JSON으로 재전송")
+        state_codec.disable()
+        body, headers = state_codec.encode_state(data)
+        response = await request("POST", "/state", data=body, headers=headers, timeout=timeout)
+    return response
+
+
+async def post_verification(success, message, student_id=None, timeout=5):
+    body = {"success": success, "message": message}
+    if student_id:
+        body["student_id"] = student_id
+    return await request("POST", "/verification", json_body=body, timeout=timeout)
+
+
+async def post_logout(student_id=None, timeout=5):
+    body = {"student_id": student_id} if student_id else None
+    return await request("POST", "/logout", json_body=body, timeout=timeout)
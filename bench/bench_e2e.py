@@ -0,0 +1,154 @@
+"""
+오프라인 end-to-end 벤치마크 (nDRIMS / Render 백엔드 없이 실행)
+
+bench/mock_servers.py 의 목 nDRIMS 사이트와 목 백엔드를 로컬에 띄우고
+실제 poll_commands() 를 그대로 돌려 명령 전달 → 결과 수신까지의 지연시간을 잰다.
+
+    python bench/bench_e2e.py [--rounds 3] [--menus 12] [--fields 20] [--latency-ms 150] [--headed]
+
+라운드마다 login → state → action(+verification) → state → logout 순서로 명령을 내려준다.
+두 번째 라운드부터의 login은 세션 캐시로 재개되므로 login(캐시) 항목으로 따로 집계된다.
+--session-ttl을 짧게 주면 캐시된 쿠키가 만료되어 전체 로그인으로 넘어가야 한다
+(목 사이트의 main.clx는 만료 쿠키로도 URL이 그대로라 메뉴 로드로만 구분 가능).
+Chromium(playwright install chromium)이 설치되어 있어야 한다.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from mock_servers import MockNdrimsSite, MockBackend  # noqa: E402
+
+STUDENT_ID = "2024000000"
+PASSWORD = "mock-password"
+
+
+def make_script(rounds):
+    """[(라벨, 명령, 완료 조건)] — 라벨이 없는 명령은 앞 명령의 지연시간에 포함"""
+    script = []
+    for r in range(rounds):
+        login = "login" if r == 0 else "login(캐시)"
+        script += [
+            (login, {"type": "login", "student_id": STUDENT_ID, "password": PASSWORD}, "state"),
+            ("scrape(전체)", {"type": "state", "student_id": STUDENT_ID}, "state"),
+            ("action+verification", {"type": "action", "student_id": STUDENT_ID}, None),
+            (None, {"type": "verification", "student_id": STUDENT_ID}, "verification"),
+            ("scrape(증분)", {"type": "state", "student_id": STUDENT_ID}, "state"),
+            (None, {"type": "logout", "student_id": STUDENT_ID}, None),
+        ]
+    script.append((None, {"type": "shutdown"}, None))
+    return script
+
+
+def _ms(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+
+def print_report(backend, snapshot):
+    print("\n" + "=" * 72)
+    print("명령별 지연시간 (백엔드 기준: 명령 전달 → 결과 수신)")
+    print("=" * 72)
+    print(f"{'항목':<22}{'횟수':>6}{'실패':>6}{'p50(ms)':>12}{'p95(ms)':>12}{'max(ms)':>12}")
+    labels = list(dict.fromkeys([*backend.latencies, *backend.failures]))
+    for label in labels:
+        values = backend.latencies.get(label, [])
+        failed = backend.failures.get(label, 0)
+        if values:
+            print(f"{label:<22}{len(values):>6}{failed:>6}"
+                  f"{_ms(values, 0.5):>12.1f}{_ms(values, 0.95):>12.1f}{max(values) * 1000:>12.1f}")
+        else:
+            print(f"{label:<22}{0:>6}{failed:>6}{'-':>12}{'-':>12}{'-':>12}")
+
+    if backend.state_bytes:
+        print(f"\n/state 본문 크기: 최소 {min(backend.state_bytes)} B / 최대 {max(backend.state_bytes)} B "
+              f"({len(backend.state_bytes)}건)")
+    print(f"필드 미인식 페이지(form_fields 문자열): {backend.unrecognized_pages}건")
+    ok = sum(1 for v in backend.verifications if v.get("success"))
+    print(f"검증 결과: {ok}/{len(backend.verifications)} 성공")
+
+    print("\n" + "=" * 72)
+    print("단계별 지연시간 (tracing)")
+    print("=" * 72)
+    print(f"{'단계':<28}{'횟수':>6}{'오류':>6}{'p50(ms)':>12}{'p95(ms)':>12}{'p99(ms)':>12}")
+    for stage, s in snapshot.items():
+        print(f"{stage:<28}{s['count']:>6}{s['errors']:>6}"
+              f"{s['p50_ms']:>12.1f}{s['p95_ms']:>12.1f}{s['p99_ms']:>12.1f}")
+
+
+def print_site_report(site):
+    print(f"목 사이트 세션 없는 요청(만료 쿠키 포함): {site.rejected_requests}건")
+
+
+async def run(args, site, backend):
+    import execution_web_service_gpt as svc
+    import backend_client
+    import playwright_client
+    import tracing
+
+    svc.BACKEND_URL = backend.url
+    svc.POLLING_INTERVAL = 0.2
+    svc.POLLING_BURST_INTERVAL = 0.05
+    svc.POLLING_MAX_INTERVAL = 0.5
+
+    started = time.perf_counter()
+    task = asyncio.create_task(svc.poll_commands())
+    try:
+        finished = await asyncio.to_thread(backend.done.wait, args.timeout)
+        if not finished:
+            print(f"[벤치] {args.timeout}초 안에 시나리오가 끝나지 않았습니다")
+        # 마지막 shutdown 처리가 끝날 시간
+        await asyncio.sleep(1)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await svc.cleanup_browsers(shutdown=True)
+        await playwright_client.close_all()
+        await backend_client.close()
+
+    print(f"\n[벤치] 전체 소요 {time.perf_counter() - started:.1f}초")
+    print_report(backend, tracing.snapshot())
+    print_site_report(site)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--menus", type=int, default=12, help="사이드바 최상위 메뉴 수")
+    parser.add_argument("--fields", type=int, default=20, help="페이지당 입력 필드 수")
+    parser.add_argument("--latency-ms", type=int, default=150, help="목 사이트 API 응답 지연")
+    parser.add_argument("--login-latency-ms", type=int, default=300)
+    parser.add_argument("--session-ttl", type=float, default=None,
+                        help="목 사이트 로그인 쿠키 유효 시간(초). 짧게 주면 login(캐시)가 만료 세션을 걸러내는지 확인")
+    parser.add_argument("--timeout", type=float, default=300, help="시나리오 전체 제한 시간 (초)")
+    parser.add_argument("--compact", action="store_true", help="목 백엔드가 gzip + compact-1 을 광고")
+    parser.add_argument("--headed", action="store_true", help="브라우저 창 표시")
+    args = parser.parse_args()
+
+    site = MockNdrimsSite(args.menus, args.fields, args.latency_ms, args.login_latency_ms, args.session_ttl).start()
+    capabilities = {"state_encodings": ["gzip"], "state_formats": ["compact-1"]} if args.compact else {}
+    backend = MockBackend(make_script(args.rounds), init_capabilities=capabilities).start()
+    print(f"[벤치] 목 nDRIMS: {site.url}  /  목 백엔드: {backend.url}")
+
+    # 서비스 모듈을 import 하기 전에 설정해야 반영되는 값들
+    os.environ["NDRIMS_BASE_URL"] = site.url
+    os.environ.setdefault("METRICS_PORT", "0")
+    os.environ["HEADLESS"] = "false" if args.headed else "true"
+    # SESSION_CACHE_KEY가 없으면 세션 캐시는 메모리에만 보관되어 이전 실행의 쿠키를 쓰지 않음
+    os.environ.pop("SESSION_CACHE_KEY", None)
+
+    try:
+        asyncio.run(run(args, site, backend))
+    finally:
+        site.stop()
+        backend.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+scrape.py 마이크로 벤치마크 (합성 nDRIMS DOM, 네트워크 없이 실행)
+
+트리 항목 수 / 입력 필드 수 / 중첩 팝업 깊이를 바꿔 가며 nDRIMS와 비슷한 페이지를 만들고
+스크래퍼 변형별 소요 시간과 Playwright 드라이버 왕복 횟수(≈ CDP 왕복)를 비교한다.
+
+    python bench/bench_scrape.py [--repeat 5] [--quick]
+    python bench/bench_scrape.py --save-baseline bench/scrape_baseline.json
+    python bench/bench_scrape.py --baseline bench/scrape_baseline.json   # 회귀 시 종료 코드 1
+
+회귀 판정: 호출당 왕복 횟수가 기준보다 늘었거나, p50이 기준보다 --tolerance 비율
+(그리고 --min-delta-ms) 이상 느려진 경우. Chromium(playwright install chromium)이 필요하다.
+"""
+
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import statistics
+import contextlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from playwright.async_api import async_playwright  # noqa: E402
+from playwright._impl._connection import Connection  # noqa: E402
+
+import scrape  # noqa: E402
+
+_WORDS = ["학적", "수업", "성적", "등록", "장학", "졸업", "신청", "조회", "변경", "관리",
+          "휴학", "복학", "전과", "부전공", "복수전공", "계절학기", "강의평가", "출석", "증명서", "상담"]
+
+# (이름, 트리 항목 수, 필드 수, 중첩 팝업 깊이)
+CASES = [
+    ("tree-100", 100, 100, 0),
+    ("tree-1k", 1000, 100, 0),
+    ("tree-5k", 5000, 100, 0),
+    ("fields-10", 1000, 10, 0),
+    ("fields-1k", 1000, 1000, 0),
+    ("dialogs-3", 1000, 100, 3),
+]
+QUICK_CASES = ("tree-100", "fields-10", "dialogs-3")
+
+HIDDEN_PANELS = 4     # 예전에 열었던(숨겨진) 탭 수 — 각 탭에 같은 수의 필드
+HIDDEN_DIALOGS = 8    # 닫혀 있는(display:none) 팝업 수
+
+
+# ============================================================
+# 합성 DOM
+# ============================================================
+
+def _label(i):
+    return _WORDS[i % len(_WORDS)] + _WORDS[(i * 7 + 3) % len(_WORDS)] + str(i)
+
+
+def _fields_html(prefix, count):
+    rows = []
+    for i in range(count):
+        fid = f"{prefix}_{i}"
+        if i % 7 == 6:
+            control = f'<select id="{fid}"><option>선택</option><option selected>재학</option></select>'
+        elif i % 11 == 10:
+            control = f'<textarea id="{fid}">비고 {i}</textarea>'
+        else:
+            control = f'<input id="{fid}" type="{"date" if i % 5 == 4 else "text"}" value="{"2024" if i % 3 == 0 else ""}">'
+        rows.append(f'<div class="field"><label for="{fid}">{_label(i)}</label>{control}</div>')
+    return "".join(rows)
+
+
+def make_page_html(tree_items, fields, dialog_depth):
+    """사이드바(.cl-tree-item 3단계) + 탭패널(숨김 HIDDEN_PANELS개 + 활성 1개) + 팝업"""
+    items = []
+    for i in range(tree_items):
+        level = 1 if i % 20 == 0 else 2 if i % 5 == 0 else 3
+        cls = f"cl-tree-item cl-level-{level}" + (" cl-expanded" if level < 3 else "") + (" cl-selected" if i == 7 else "")
+        items.append(f'<div class="{cls}" role="treeitem" aria-level="{level}">'
+                     f'<div class="cl-text">{_label(i)}</div></div>')
+
+    panels = [
+        f'<div role="tabpanel" style="display:none"><h3>숨김탭{p}조회</h3>{_fields_html(f"h{p}", fields)}</div>'
+        for p in range(HIDDEN_PANELS)
+    ]
+    panels.append(f'<div role="tabpanel"><div role="heading">학적부열람</div>{_fields_html("a", fields)}</div>')
+
+    dialogs = [
+        f'<div class="cl-dialog" style="display:none"><div class="cl-dialog-header"><div class="cl-text">닫힌팝업{d}</div></div></div>'
+        for d in range(HIDDEN_DIALOGS)
+    ]
+    nested = ""
+    for d in reversed(range(dialog_depth)):
+        nested = (f'<div class="cl-dialog"><div class="cl-dialog-header"><div class="cl-text">팝업{d + 1}</div></div>'
+                  f'{_fields_html(f"d{d}", 5)}{nested}</div>')
+
+    return (
+        '<!DOCTYPE html><html lang="ko"><head><meta charset="utf-8"></head><body>'
+        f'<div class="cl-tree" role="tree">{"".join(items)}</div>'
+        f'<div role="tablist"></div>{"".join(panels)}{"".join(dialogs)}{nested}'
+        '</body></html>'
+    )
+
+
+# ============================================================
+# 왕복 횟수 측정 (Playwright 내부 API: 드라이버로 보내는 메시지 수)
+# ============================================================
+
+class RoundTripCounter:
+    def __init__(self):
+        self.count = 0
+        self._original = None
+
+    def __enter__(self):
+        self._original = original = Connection._send_message_to_server
+        counter = self
+
+        def counting(conn, *args, **kwargs):
+            counter.count += 1
+            return original(conn, *args, **kwargs)
+
+        Connection._send_message_to_server = counting
+        return self
+
+    def __exit__(self, *exc):
+        Connection._send_message_to_server = self._original
+
+
+# ============================================================
+# 스크래퍼 변형
+# ============================================================
+
+@contextlib.contextmanager
+def _page_options(scoped, batched):
+    saved = scrape.SCOPED_SCRAPE, scrape.FORM_FIELDS_BATCHED
+    scrape.SCOPED_SCRAPE, scrape.FORM_FIELDS_BATCHED = scoped, batched
+    try:
+        yield
+    finally:
+        scrape.SCOPED_SCRAPE, scrape.FORM_FIELDS_BATCHED = saved
+
+
+def _page_variant(scoped, batched):
+    async def run(page):
+        with _page_options(scoped, batched):
+            return await scrape.scrape_current_page(page)
+    return run
+
+
+async def _ui_state_sequential(page):
+    saved, scrape.PARALLEL_SCRAPE = scrape.PARALLEL_SCRAPE, False
+    try:
+        return await scrape.scrape_current_ui_state(page)
+    finally:
+        scrape.PARALLEL_SCRAPE = saved
+
+
+async def _ui_state_incremental(page):
+    return (await scrape.scrape_current_ui_state_incremental(page))[0]
+
+
+# 이름 → (수집 함수, 노드별 왕복 방식인지)
+VARIANTS = {
+    "sidebar.batched": (lambda page: scrape.scrape_sidebar(page, batched=True), False),
+    "sidebar.per_node": (lambda page: scrape.scrape_sidebar(page, batched=False), True),
+    "page.scoped": (_page_variant(scoped=True, batched=True), False),
+    "page.unscoped": (_page_variant(scoped=False, batched=True), False),
+    "page.per_field": (_page_variant(scoped=False, batched=False), True),
+    "ui_state.full": (scrape.scrape_current_ui_state, False),
+    "ui_state.sequential": (_ui_state_sequential, False),
+    "ui_state.incremental": (_ui_state_incremental, False),  # 첫 호출 이후(변경 없음) 반복
+}
+
+
+def _result_size(result):
+    """결과 크기 요약 (트리 노드 수 / 필드 수)"""
+    if isinstance(result, list):
+        stack, count = list(result), 0
+        while stack:
+            node = stack.pop()
+            count += 1
+            stack.extend(node.get("sub_items", []))
+        return f"{count} nodes"
+    if isinstance(result, dict) and "sidebar" in result:
+        return f"{_result_size(result['sidebar'])}, {_result_size(result['current_page'])}"
+    if isinstance(result, dict):
+        fields = result.get("form_fields")
+        return f"{len(fields) if isinstance(fields, list) else 0} fields"
+    return "-"
+
+
+async def measure(page, fn, repeat):
+    """1회 예열 후 repeat회 측정 → (소요 시간 목록[ms], 호출당 왕복 횟수, 결과)"""
+    result = await fn(page)
+    timings = []
+    with RoundTripCounter() as counter:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = await fn(page)
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings, counter.count / repeat, result
+
+
+async def run(args):
+    cases = [c for c in CASES if not args.quick or c[0] in QUICK_CASES]
+    scrape.logger.setLevel(logging.WARNING)  # 스크래퍼 INFO 로그는 표에서 제외
+    results = {}
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        try:
+            for case, tree_items, fields, dialog_depth in cases:
+                html = make_page_html(tree_items, fields, dialog_depth)
+                for variant, (fn, per_node) in VARIANTS.items():
+                    if per_node and max(tree_items, fields) > args.max_legacy_items:
+                        continue
+                    # 변형마다 새 페이지 (증분 수집 캐시/관찰자 상태가 섞이지 않도록)
+                    page = await browser.new_page()
+                    try:
+                        await page.set_content(html)
+                        timings, round_trips, result = await measure(page, fn, args.repeat)
+                    finally:
+                        await page.close()
+                    results[f"{case}/{variant}"] = {
+                        "p50_ms": statistics.median(timings),
+                        "min_ms": min(timings),
+                        "round_trips": round_trips,
+                        "size": _result_size(result),
+                    }
+                    print(f"[벤치] {case:<10} {variant:<22} {statistics.median(timings):9.1f} ms", file=sys.stderr)
+        finally:
+            await browser.close()
+    return results
+
+
+# ============================================================
+# 출력 / 기준값 비교
+# ============================================================
+
+def print_table(results, baseline=None):
+    print(f"\n{'case/variant':<36}{'p50(ms)':>10}{'min(ms)':>10}{'RT/call':>9}{'기준 p50':>10}  결과")
+    print("-" * 100)
+    for key, r in results.items():
+        base = (baseline or {}).get(key)
+        base_p50 = f"{base['p50_ms']:.1f}" if base else "-"
+        print(f"{key:<36}{r['p50_ms']:>10.1f}{r['min_ms']:>10.1f}{r['round_trips']:>9.1f}{base_p50:>10}  {r['size']}")
+
+
+def find_regressions(results, baseline, tolerance, min_delta_ms):
+    regressions = []
+    for key, r in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        if r["round_trips"] > base["round_trips"]:
+            regressions.append(f"{key}: 왕복 {base['round_trips']:.1f} → {r['round_trips']:.1f}")
+        slower = r["p50_ms"] - base["p50_ms"]
+        if slower > min_delta_ms and r["p50_ms"] > base["p50_ms"] * (1 + tolerance):
+            regressions.append(f"{key}: p50 {base['p50_ms']:.1f} → {r['p50_ms']:.1f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help=f"작은 케이스만 실행 ({', '.join(QUICK_CASES)})")
+    parser.add_argument("--max-legacy-items", type=int, default=1000,
+                        help="노드별 왕복 방식(per_node/per_field)을 돌릴 최대 항목 수")
+    parser.add_argument("--baseline", help="비교할 기준값 JSON (회귀 시 종료 코드 1)")
+    parser.add_argument("--save-baseline", help="이번 결과를 기준값 JSON으로 저장")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="허용 p50 증가 비율")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="이보다 작은 증가는 무시 (ms)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    baseline = None
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+    print_table(results, baseline)
+
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\n[벤치] 기준값 저장: {args.save_baseline}")
+
+    if baseline is not None:
+        regressions = find_regressions(results, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print("\n[회귀 감지]")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print("\n[벤치] 기준값 대비 회귀 없음")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+/state 본문 크기 벤치마크 (브라우저/백엔드 없이 실행)
+
+nDRIMS 사이드바와 비슷한 합성 ui_state(한글 라벨, 3단계 트리)를 만들어
+기존 직렬화(aiohttp json= → ensure_ascii)와 state_codec 인코딩 조합별 크기/시간을 비교한다.
+
+    python bench/bench_state_payload.py [--menus 12] [--fields 40]
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import state_codec  # noqa: E402
+
+_WORDS = ["학적", "수업", "성적", "등록", "장학", "졸업", "신청", "조회", "변경", "관리",
+          "휴학", "복학", "전과", "부전공", "복수전공", "계절학기", "강의평가", "출석", "증명서", "상담"]
+
+
+def _label(rng):
+    return "".join(rng.sample(_WORDS, rng.randint(2, 3)))
+
+
+def make_ui_state(menus=12, fields=40, seed=0):
+    """사이드바 menus개(각 하위 메뉴 5~10개, 그 아래 0~6개) + 입력 필드 fields개"""
+    rng = random.Random(seed)
+
+    def node(children):
+        return {"label": _label(rng), "expanded": bool(children) and rng.random() < 0.2,
+                "checked": False, "sub_items": children}
+
+    sidebar = [
+        node([node([node([]) for _ in range(rng.randint(0, 6))]) for _ in range(rng.randint(5, 10))])
+        for _ in range(menus)
+    ]
+    sidebar[0]["sub_items"][0]["checked"] = True
+
+    form_fields = []
+    for i in range(fields):
+        tag = rng.choice(["input", "input", "input", "select", "textarea"])
+        form_fields.append({
+            "id": f"{tag}_{i}",
+            "label": _label(rng),
+            "type": tag,
+            "input_type": "text" if tag != "select" else "select-one",
+            "value": rng.choice(["", "", "2024", "재학", "컴퓨터공학과"]),
+        })
+
+    return {
+        "url": "https://ndrims.dongguk.edu/main/main.clx",
+        "sidebar": sidebar,
+        "current_page": {"title": "학적부조회", "detail_page": "", "form_fields": form_fields},
+    }
+
+
+def _measure(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        out = fn()
+    return out, (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--menus", type=int, default=12)
+    parser.add_argument("--fields", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    ui_state = make_ui_state(args.menus, args.fields)
+    data = {"success": True, "student_id": "2020112233", "logged_in": True,
+            "last_url": ui_state["url"], "message": "UI 상태 업데이트", "ui_state": ui_state}
+
+    # 왕복 검증 (필드 미인식 페이지는 form_fields가 문자열)
+    assert state_codec.expand_ui_state(state_codec.compact_ui_state(ui_state)) == ui_state
+    unrecognized = {**ui_state, "current_page": {**ui_state["current_page"], "form_fields": "인식되지 않았다"}}
+    assert state_codec.expand_ui_state(state_codec.compact_ui_state(unrecognized)) == unrecognized
+    state_codec.encode_state({**data, "ui_state": unrecognized}, "gzip", True)
+
+    variants = [("기존 (aiohttp json=, ASCII 이스케이프)",
+                 lambda: json.dumps({"data": data}).encode("utf-8"))]
+    encodings = ["gzip"] + (["zstd"] if state_codec.zstandard is not None else [])
+    for compact in (False, True):
+        for encoding in [False] + encodings:
+            name = "축약" if compact else "UTF-8 JSON"
+            if encoding:
+                name += f" + {encoding}"
+            variants.append((name, lambda e=encoding, c=compact: state_codec.encode_state(data, e, c)[0]))
+
+    baseline = None
+    print(f"사이드바 메뉴 {args.menus}개, 입력 필드 {args.fields}개\n")
+    print(f"{'방식':<40}{'바이트':>10}{'비율':>8}{'인코딩 ms':>12}")
+    for name, fn in variants:
+        body, ms = _measure(fn, args.repeat)
+        baseline = baseline or len(body)
+        print(f"{name:<40}{len(body):>10}{len(body) / baseline:>8.1%}{ms:>12.3f}")
+    if state_codec.zstandard is None:
+        print("\n(zstandard 미설치 → zstd 생략)")
+
+
+if __name__ == "__main__":
+    main()
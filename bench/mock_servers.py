@@ -0,0 +1,319 @@
+"""
+오프라인 벤치마크용 목 서버 (표준 라이브러리 http.server)
+
+- MockNdrimsSite: bench/mock_site 정적 파일 + 로그인/메뉴/페이지/신청 API (지연 시간 흉내)
+- MockBackend:    /execution_web/init, /command, /state, /action, /verification, /logout
+                  정해진 명령 시나리오를 순서대로 내려주고, 명령 전달 → 결과 수신까지 지연시간 기록
+
+둘 다 start()로 백그라운드 스레드에서 띄우고 url 속성으로 주소를 얻는다.
+"""
+
+import json
+import gzip
+import time
+import random
+import secrets
+import threading
+from http.cookies import SimpleCookie
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler, BaseHTTPRequestHandler
+
+import state_codec
+from state_sync import apply_patch
+
+SITE_ROOT = Path(__file__).resolve().parent / "mock_site"
+SESSION_COOKIE = "NDRIMS_SESSION"
+# 로그인 쿠키가 있어야 열리는 경로 (main.clx는 만료 시에도 URL이 그대로인 빈 화면)
+_AUTH_PATHS = ("/main/", "/api/menu", "/api/page", "/api/apply")
+
+GRID_ROW_NAMES = [
+    "[학적]휴학신청", "[학적]복학신청", "[성적]이수구분변경신청", "[성적]학점포기신청",
+    "[수업]수강취소신청", "[장학]장학금신청", "[졸업]졸업유예신청", "[등록]분할납부신청",
+]
+_WORDS = ["학적", "수업", "성적", "등록", "장학", "졸업", "신청", "조회", "변경", "관리",
+          "휴학", "복학", "전과", "부전공", "복수전공", "계절학기", "강의평가", "출석", "증명서", "상담"]
+
+
+class _Server:
+    def __init__(self, handler):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.app = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _send_json(handler, status, body):
+    raw = json.dumps(body, ensure_ascii=False).encode("utf-8")
+    handler.send_response(status)
+    handler.send_header("Content-Type", "application/json; charset=utf-8")
+    handler.send_header("Content-Length", str(len(raw)))
+    handler.end_headers()
+    handler.wfile.write(raw)
+
+
+# ============================================================
+# nDRIMS 목 사이트
+# ============================================================
+
+def make_menu(menus=12, seed=0):
+    """사이드바 트리 {label, children}. 첫 메뉴는 trajectory가 쓰는 '【학생신청】신청함'"""
+    rng = random.Random(seed)
+    label = lambda: "".join(rng.sample(_WORDS, rng.randint(2, 3)))
+    tree = [{"label": "【학생신청】신청함", "children": []},
+            {"label": "학적/확인서", "children": [{"label": "학적부열람", "children": []}]}]
+    for _ in range(menus):
+        tree.append({"label": label(), "children": [
+            {"label": label(), "children": [{"label": label(), "children": []} for _ in range(rng.randint(0, 5))]}
+            for _ in range(rng.randint(3, 8))
+        ]})
+    return tree
+
+
+class _SiteHandler(SimpleHTTPRequestHandler):
+    extensions_map = {**SimpleHTTPRequestHandler.extensions_map, ".do": "text/html", ".clx": "text/html"}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=str(SITE_ROOT), **kwargs)
+
+    def log_message(self, *args):
+        pass
+
+    def _delay(self):
+        time.sleep(self.server.app.latency_ms / 1000)
+
+    def _has_session(self):
+        morsel = SimpleCookie(self.headers.get("Cookie", "")).get(SESSION_COOKIE)
+        return morsel is not None and self.server.app.session_valid(morsel.value)
+
+    def do_GET(self):
+        app = self.server.app
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path.startswith(_AUTH_PATHS) and not self._has_session():
+            app.rejected_requests += 1
+            if url.path.startswith("/api/"):
+                return _send_json(self, 401, {"error": "session expired"})
+            raw = "<!DOCTYPE html><html><body>세션이 만료되었습니다.</body></html>".encode("utf-8")
+            self.send_response(401)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+            return
+        if url.path == "/api/menu":
+            return _send_json(self, 200, app.menu)
+        if url.path == "/api/page":
+            self._delay()
+            name = query.get("name", [""])[0]
+            fields = [{"label": f"{name} 항목{i + 1}", "type": "select" if i % 5 == 4 else "input",
+                       "value": "2024" if i % 3 == 0 else ""} for i in range(app.fields)]
+            page = {"title": name, "fields": fields}
+            if name == "【학생신청】신청함":
+                page["grid"] = GRID_ROW_NAMES
+            return _send_json(self, 200, page)
+        if url.path == "/api/apply":
+            self._delay()
+            return _send_json(self, 200, {"ok": True})
+        return super().do_GET()
+
+    def do_POST(self):
+        if urlparse(self.path).path == "/api/login":
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            time.sleep(self.server.app.login_latency_ms / 1000)
+            raw = b'{"ok": true}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(raw)))
+            self.send_header("Set-Cookie", f"{SESSION_COOKIE}={self.server.app.new_session()}; Path=/; HttpOnly")
+            self.end_headers()
+            self.wfile.write(raw)
+            return
+        self.send_error(404)
+
+
+class MockNdrimsSite(_Server):
+    """
+    /api/login이 세션 쿠키를 발급하고, main.clx와 API는 유효한 쿠키가 있어야 응답
+    session_ttl(초)이 지나거나 expire_sessions()를 부르면 기존 쿠키는 만료 (저장된 세션 재사용 검증용)
+    """
+
+    def __init__(self, menus=12, fields=20, latency_ms=150, login_latency_ms=300, session_ttl=None):
+        super().__init__(_SiteHandler)
+        self.menu = make_menu(menus)
+        self.fields = fields
+        self.latency_ms = latency_ms
+        self.login_latency_ms = login_latency_ms
+        self.session_ttl = session_ttl
+        self.rejected_requests = 0  # 만료/없는 쿠키로 들어온 요청 수
+        self._sessions = {}         # 토큰 → 발급 시각
+        self._lock = threading.Lock()
+
+    def new_session(self):
+        token = secrets.token_hex(16)
+        with self._lock:
+            self._sessions[token] = time.monotonic()
+        return token
+
+    def session_valid(self, token):
+        with self._lock:
+            issued = self._sessions.get(token)
+        if issued is None:
+            return False
+        return self.session_ttl is None or time.monotonic() - issued < self.session_ttl
+
+    def expire_sessions(self):
+        with self._lock:
+            self._sessions.clear()
+
+
+# ============================================================
+# 백엔드 목 서버
+# ============================================================
+
+def default_generated_action():
+    """신청함 열기 → 그리드에서 '[성적]이수구분변경신청' 행의 신청 버튼 클릭"""
+    return {
+        "type": "trajectory",
+        "description": "이수구분변경신청",
+        "actions_file": [
+            {"action": {"name": "click", "args": {"selector": "role=treeitem[name='【학생신청】신청함']"}}},
+            {"action": {"name": "click", "args": {"selector": "[name='[성적]이수구분변경신청']"}, "state": "grid"}},
+        ],
+    }
+
+
+class _BackendHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive (실제 백엔드처럼)
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        encoding = self.headers.get("Content-Encoding")
+        if encoding == "gzip":
+            raw = gzip.decompress(raw)
+        elif encoding == "zstd":
+            raw = state_codec.zstandard.ZstdDecompressor().decompress(raw)
+        return raw
+
+    def do_GET(self):
+        app = self.server.app
+        url = urlparse(self.path)
+        if url.path == "/command":
+            return _send_json(self, 200, app.next_command())
+        if url.path == "/action":
+            return _send_json(self, 200, {"generated_action": app.generated_action})
+        self.send_error(404)
+
+    def do_POST(self):
+        app = self.server.app
+        path = urlparse(self.path).path
+        raw = self._body()
+        body = json.loads(raw) if raw else {}
+
+        if path == "/execution_web/init":
+            return _send_json(self, 200, {"status": "ok", **app.init_capabilities})
+        if path == "/state":
+            return _send_json(self, *app.receive_state(body.get("data", {}),
+                                                       self.headers.get("X-State-Format"), len(raw)))
+        if path == "/verification":
+            app.complete("verification", body)
+            return _send_json(self, 200, {"ok": True})
+        if path == "/logout":
+            return _send_json(self, 200, {"ok": True})
+        self.send_error(404)
+
+
+class MockBackend(_Server):
+    """
+    script: [(라벨 또는 None, 명령 dict, 완료 조건)] 순서대로 내려줌
+    - 완료 조건("state" / "verification")이 있는 명령은 결과가 올 때까지 다음 명령을 내려주지 않음
+    - 라벨이 있는 명령부터 완료 조건이 만족될 때까지를 그 라벨의 지연시간으로 기록
+    - step_timeout 초 안에 완료되지 않으면 실패로 기록하고 다음 명령으로 넘어감
+    """
+
+    def __init__(self, script, init_capabilities=None, generated_action=None, step_timeout=60):
+        super().__init__(_BackendHandler)
+        self.script = list(script)
+        self.init_capabilities = init_capabilities or {}
+        self.generated_action = generated_action or default_generated_action()
+        self.latencies = {}       # 라벨 → [초]
+        self.state_bytes = []     # /state 본문 크기 (전송 그대로)
+        self.verifications = []
+        self.unrecognized_pages = 0  # form_fields가 리스트가 아닌(필드 미인식) ui_state 수
+        self.failures = {}        # 라벨 → 시간 초과 횟수
+        self.step_timeout = step_timeout
+        self.done = threading.Event()
+
+        self._lock = threading.Lock()
+        self._waiting_for = None
+        self._waiting_since = 0.0
+        self._chain = None        # (라벨, 시작 시각)
+        self._ui_states = {}      # 학번 → (버전, ui_state)
+
+    def next_command(self):
+        with self._lock:
+            if self._waiting_for and time.perf_counter() - self._waiting_since > self.step_timeout:
+                label = self._chain[0] if self._chain else self._waiting_for
+                self.failures[label] = self.failures.get(label, 0) + 1
+                self._waiting_for = self._chain = None
+            if self._waiting_for or not self.script:
+                if not self.script and not self._waiting_for:
+                    self.done.set()
+                return {"has_task": False}
+            label, command, wait_for = self.script.pop(0)
+            if label and self._chain is None:
+                self._chain = (label, time.perf_counter())
+            self._waiting_for = wait_for
+            self._waiting_since = time.perf_counter()
+            return {"has_task": True, **command}
+
+    def complete(self, kind, payload=None):
+        with self._lock:
+            if kind == "verification":
+                self.verifications.append(payload)
+            if self._waiting_for != kind:
+                return
+            self._waiting_for = None
+            if self._chain:
+                label, start = self._chain
+                self.latencies.setdefault(label, []).append(time.perf_counter() - start)
+                self._chain = None
+
+    def receive_state(self, data, state_format, size):
+        """버전/증분/축약 형식을 실제 백엔드처럼 해석 (불일치 시 409)"""
+        self.state_bytes.append(size)
+        student_id = data.get("student_id")
+        if state_format == state_codec.COMPACT_FORMAT and isinstance(data.get("ui_state"), dict):
+            data["ui_state"] = state_codec.expand_ui_state(data["ui_state"])
+
+        if "ui_state_patch" in data:
+            version, base = self._ui_states.get(student_id, (None, None))
+            if version != data.get("ui_state_base_version"):
+                return 409, {"ui_state_version_mismatch": True}
+            data["ui_state"] = apply_patch(base, data["ui_state_patch"])
+        page = (data.get("ui_state") or {}).get("current_page")
+        if isinstance(page, dict) and not isinstance(page.get("form_fields"), list):
+            self.unrecognized_pages += 1
+        if "ui_state_version" in data:
+            self._ui_states[student_id] = (data["ui_state_version"], data.get("ui_state"))
+
+        if "loginSuccess" in data or "ui_state" in data or data.get("success") is False:
+            self.complete("state", data)
+        return 200, {"ok": True}
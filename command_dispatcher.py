@@ -0,0 +1,70 @@
+"""
+명령 디스패처
+
+- 다른 세션(학번)의 명령은 asyncio 태스크로 동시에 실행
+- 같은 세션의 명령은 들어온 순서대로 하나씩 실행 (state → action → verification 순서 보장)
+- 전체 동시 실행 개수는 max_concurrency 로 제한
+"""
+
+import asyncio
+
+import service_log
+
+logger = service_log.get_logger("dispatcher")
+
+
+class CommandDispatcher:
+    def __init__(self, max_concurrency=4, on_done=None):
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._queues = {}   # 세션 키 → asyncio.Queue[(label, factory)]
+        self._workers = {}  # 세션 키 → 워커 태스크
+        self._on_done = on_done
+
+    def __len__(self):
+        """대기 + 실행 중인 세션 수"""
+        return len(self._workers)
+
+    def submit(self, key, label, factory):
+        """
+        명령 등록. factory는 호출하면 코루틴을 돌려주는 함수
+        (코루틴은 실제 실행 순서가 됐을 때 만들어야 세션 상태를 그 시점 기준으로 읽음)
+        """
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = asyncio.Queue()
+        queue.put_nowait((label, factory))
+
+        if key not in self._workers:
+            self._workers[key] = asyncio.create_task(self._worker(key, queue))
+
+    async def _worker(self, key, queue):
+        try:
+            while not queue.empty():
+                label, factory = queue.get_nowait()
+                async with self._semaphore:
+                    try:
+                        await factory()
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        logger.exception(f"[디스패처] 명령 처리 중 예외 (세션: {key}, 명령: {label}): {e}")
+                if self._on_done:
+                    self._on_done()
+        finally:
+            # 큐가 비었으면 워커 종료 (다음 명령이 오면 새 워커 생성)
+            self._queues.pop(key, None)
+            self._workers.pop(key, None)
+
+    async def join(self):
+        """등록된 모든 명령이 끝날 때까지 대기"""
+        while self._workers:
+            await asyncio.gather(*list(self._workers.values()), return_exceptions=True)
+
+    async def close(self):
+        """실행 중인 명령 취소 (서비스 종료 시)"""
+        workers = list(self._workers.values())
+        for task in workers:
+            task.cancel()
+        if workers:
+            await asyncio.gather(*workers, return_exceptions=True)
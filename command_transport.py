@@ -0,0 +1,346 @@
+"""
+명령 수신 채널 (poll_commands 뒤에 붙는 전송 계층)
+
+- poll     : 기존 방식. GET /command 후 명령이 없으면 interval 만큼 대기
+- longpoll : GET /command?wait=N. 백엔드가 명령이 생길 때까지 최대 N초 붙잡고 있음
+- sse      : GET /command/stream (text/event-stream) 으로 명령을 푸시받음
+- ws       : /command/ws 웹소켓으로 명령을 푸시받음
+
+푸시/롱폴 방식을 백엔드가 지원하지 않으면 자동으로 poll 방식으로 전환한다.
+"""
+
+import json
+import time
+import asyncio
+
+import aiohttp
+
+import backend_client
+import service_log
+
+logger = service_log.get_logger("transport")
+
+LONG_POLL_HOLD = 25        # 롱폴 대기 시간 (초). 백엔드가 이 시간 동안 응답을 보류
+PUSH_IDLE_TIMEOUT = 25     # sse/ws에서 명령이 없을 때 next_command()가 None을 돌려주는 주기 (초)
+PUSH_READ_TIMEOUT = 60     # sse/ws 소켓 읽기 타임아웃 (하트비트 없이 이 시간 지나면 재연결)
+PUSH_MAX_FAILURES = 3      # 연속 연결 실패 시 poll 방식으로 전환하는 기준
+
+
+class PollScheduler:
+    """
+    폴링 간격 조절기 (poll 방식 전용)
+
+    - 명령 처리 직후 burst_window 초 동안은 burst_interval 로 빠르게 폴링
+      (state → action → verification 처럼 연달아 오는 명령을 바로 받기 위함)
+    - 그 이후 명령이 없으면 base_interval 부터 factor 배씩 늘려 max_interval 까지 백오프
+      (유휴 상태의 실행 웹이 공용 백엔드를 덜 두드리도록)
+    """
+
+    def __init__(self, base_interval, burst_interval=None, burst_window=0,
+                 max_interval=None, factor=2.0):
+        self.base_interval = base_interval
+        self.burst_interval = burst_interval if burst_interval is not None else base_interval
+        self.burst_window = burst_window
+        self.max_interval = max(max_interval or base_interval, base_interval)
+        self.factor = factor
+        self._last_command_at = None
+        self._idle_polls = 0
+
+    def on_command(self):
+        """명령 처리 완료 시 호출 → burst 모드 시작, 백오프 초기화"""
+        self._last_command_at = time.monotonic()
+        self._idle_polls = 0
+
+    def next_delay(self):
+        """명령이 없을 때 다음 폴링까지 대기할 시간 (초)"""
+        if (
+            self._last_command_at is not None
+            and time.monotonic() - self._last_command_at < self.burst_window
+        ):
+            return self.burst_interval
+
+        delay = min(self.base_interval * (self.factor ** self._idle_polls), self.max_interval)
+        if delay < self.max_interval:
+            self._idle_polls += 1
+        return delay
+
+
+def parse_command_response(response):
+    """GET /command 응답 → 명령 dict (오류/빈 응답이면 None)"""
+    if response.status_code != 200:
+        logger.error(f"[오류] 백엔드 응답 오류: HTTP {response.status_code}")
+        logger.error(f"[오류] 응답 내용: {response.text[:200]}")
+        return None
+
+    if not response.text or response.text.strip() == "":
+        logger.error(f"[오류] 백엔드에서 빈 응답 수신")
+        return None
+
+    try:
+        return response.json()
+    except json.JSONDecodeError as e:
+        logger.error(f"[오류] JSON 파싱 실패: {e}")
+        logger.error(f"[오류] 응답 내용: {response.text[:200]}")
+        return None
+
+
+def is_empty_command(command):
+    return command.get("has_task") is False or command.get("type") == "none"
+
+
+class CommandTransport:
+    """
+    명령 채널 공통 인터페이스
+
+    next_command(params)는 명령이 오면 그 dict를, 일정 시간 명령이 없으면 None을 반환한다.
+    (None이 돌아올 때마다 poll_commands가 브라우저 닫힘 감시를 수행)
+    """
+
+    name = "base"
+
+    def __init__(self, interval, scheduler=None):
+        self.interval = interval
+        self.scheduler = scheduler or PollScheduler(interval)
+        self._fallback = None
+
+    def fall_back(self, reason):
+        if self._fallback is None:
+            logger.info(f"[명령 채널] {self.name} 사용 불가 → poll 방식으로 전환 ({reason})")
+            self._fallback = IntervalPollTransport(self.interval, self.scheduler)
+
+    def notify_command(self):
+        """명령 하나를 처리했음을 알림 (poll 방식의 burst 모드용)"""
+        self.scheduler.on_command()
+
+    async def next_command(self, params):
+        if self._fallback is not None:
+            return await self._fallback.next_command(params)
+        return await self._next_command(params)
+
+    async def _next_command(self, params):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class IntervalPollTransport(CommandTransport):
+    """기존 고정 간격 폴링"""
+
+    name = "poll"
+
+    async def _next_command(self, params):
+        response = await backend_client.get_command(params=params, timeout=10)
+        command = parse_command_response(response)
+
+        if command is None:
+            await asyncio.sleep(self.interval)
+            return None
+        if is_empty_command(command):
+            await asyncio.sleep(self.scheduler.next_delay())
+            return None
+        return command
+
+
+class LongPollTransport(CommandTransport):
+    """
+    롱폴: 백엔드가 명령이 생길 때까지 응답을 붙잡고 있다가 바로 돌려줌
+    백엔드는 지원 여부를 응답 헤더 X-Long-Poll 또는 JSON의 long_poll 필드로 알려야 한다.
+    (모르는 백엔드에 wait 파라미터를 보내면 즉시 응답이 와서 루프가 헛돌기 때문)
+    """
+
+    name = "longpoll"
+
+    def __init__(self, interval, scheduler=None, hold=LONG_POLL_HOLD):
+        super().__init__(interval, scheduler)
+        self.hold = hold
+
+    async def _next_command(self, params):
+        response = await backend_client.get_command(
+            params={**params, "wait": self.hold},
+            timeout=self.hold + 10,
+        )
+        command = parse_command_response(response)
+        if command is None:
+            await asyncio.sleep(self.interval)
+            return None
+
+        supported = (
+            response.headers.get("X-Long-Poll") == "1"
+            or command.get("long_poll") is True
+        )
+        if not supported:
+            self.fall_back("백엔드가 롱폴을 지원하지 않음")
+            if is_empty_command(command):
+                await asyncio.sleep(self.scheduler.next_delay())
+                return None
+            return command
+
+        if is_empty_command(command):
+            return None
+        return command
+
+
+class _PushTransport(CommandTransport):
+    """
+    sse/ws 공통: 백그라운드 리더 태스크가 명령을 큐에 쌓고 next_command()가 꺼내감
+    """
+
+    def __init__(self, interval, scheduler=None):
+        super().__init__(interval, scheduler)
+        self._queue = asyncio.Queue()
+        self._reader = None
+        self._params = {}
+        self._failures = 0
+
+    async def _next_command(self, params):
+        self._params = params
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read_forever())
+
+        try:
+            command = await asyncio.wait_for(self._queue.get(), timeout=PUSH_IDLE_TIMEOUT)
+        except asyncio.TimeoutError:
+            return None
+
+        if is_empty_command(command):
+            return None
+        return command
+
+    async def _read_forever(self):
+        while self._fallback is None:
+            try:
+                await self._read_stream()
+            except asyncio.CancelledError:
+                raise
+            except _PushUnsupported as e:
+                self.fall_back(str(e))
+            except Exception as e:
+                self._failures += 1
+                logger.warning(f"[명령 채널] {self.name} 연결 끊김 ({self._failures}/{PUSH_MAX_FAILURES}): {e}")
+                if self._failures >= PUSH_MAX_FAILURES:
+                    self.fall_back("연속 연결 실패")
+                else:
+                    await asyncio.sleep(self.interval)
+
+        # 대기 중인 next_command()를 깨워서 바로 poll 방식으로 넘어가게 함
+        self._queue.put_nowait({"has_task": False})
+
+    def _push(self, raw):
+        try:
+            command = json.loads(raw)
+        except json.JSONDecodeError as e:
+            logger.error(f"[오류] 푸시 명령 JSON 파싱 실패: {e}")
+            return
+        if isinstance(command, dict):
+            self._queue.put_nowait(command)
+
+    async def _read_stream(self):
+        raise NotImplementedError
+
+    async def close(self):
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._reader = None
+
+
+class _PushUnsupported(Exception):
+    """백엔드가 해당 푸시 방식을 지원하지 않음"""
+
+
+class SSETransport(_PushTransport):
+    name = "sse"
+
+    async def _read_stream(self):
+        session = await backend_client.get_session()
+        async with session.get(
+            backend_client.url("/command/stream"),
+            params=self._params,
+            headers={"Accept": "text/event-stream"},
+            timeout=aiohttp.ClientTimeout(total=None, sock_read=PUSH_READ_TIMEOUT),
+        ) as response:
+            content_type = response.headers.get("Content-Type", "")
+            if response.status != 200 or "text/event-stream" not in content_type:
+                raise _PushUnsupported(f"HTTP {response.status}, {content_type}")
+
+            logger.info("[명령 채널] SSE 연결됨")
+            self._failures = 0
+            data_lines = []
+            async for raw_line in response.content:
+                line = raw_line.decode("utf-8").rstrip("\r\n")
+                if line.startswith("data:"):
+                    data_lines.append(line[5:].lstrip())
+                elif line == "" and data_lines:
+                    # 빈 줄 = 이벤트 종료
+                    self._push("\n".join(data_lines))
+                    data_lines = []
+                # ':'로 시작하는 하트비트 주석, event:/id: 필드는 무시
+        raise ConnectionError("SSE 스트림 종료")
+
+
+class WebSocketTransport(_PushTransport):
+    name = "ws"
+
+    def __init__(self, interval, scheduler=None):
+        super().__init__(interval, scheduler)
+        self._ws = None
+
+    async def _next_command(self, params):
+        # 브라우저 상태는 대기할 때마다 백엔드에 알려줌 (poll의 쿼리 파라미터 역할)
+        if self._ws is not None and not self._ws.closed:
+            try:
+                await self._ws.send_json({"type": "status", **params})
+            except Exception as e:
+                logger.warning(f"[명령 채널] 상태 전송 실패: {e}")
+        return await super()._next_command(params)
+
+    async def _read_stream(self):
+        session = await backend_client.get_session()
+        try:
+            ws = await session.ws_connect(
+                backend_client.url("/command/ws"),
+                params=self._params,
+                heartbeat=PUSH_READ_TIMEOUT / 2,
+            )
+        except aiohttp.WSServerHandshakeError as e:
+            raise _PushUnsupported(f"핸드셰이크 실패 HTTP {e.status}")
+
+        self._ws = ws
+        logger.info("[명령 채널] WebSocket 연결됨")
+        self._failures = 0
+        try:
+            async for msg in ws:
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    self._push(msg.data)
+                elif msg.type == aiohttp.WSMsgType.ERROR:
+                    raise ws.exception() or ConnectionError("WebSocket 오류")
+        finally:
+            self._ws = None
+            await ws.close()
+        raise ConnectionError("WebSocket 연결 종료")
+
+    async def close(self):
+        if self._ws is not None:
+            await self._ws.close()
+        await super().close()
+
+
+TRANSPORTS = {
+    "poll": IntervalPollTransport,
+    "longpoll": LongPollTransport,
+    "sse": SSETransport,
+    "ws": WebSocketTransport,
+}
+
+
+def create_transport(mode, interval, scheduler=None):
+    """모드 이름 → 전송 객체. 알 수 없는 모드는 poll"""
+    transport_cls = TRANSPORTS.get(mode)
+    if transport_cls is None:
+        logger.warning(f"[경고] 알 수 없는 명령 채널 모드: {mode} → poll 사용")
+        transport_cls = IntervalPollTransport
+    return transport_cls(interval, scheduler)
@@ -0,0 +1,134 @@
+"""
+'확인' 팝업(.cl-dialog) 감시
+
+ActionExecutor.run은 매 액션 전에 nDRIMS "실행 중인 새창이 있습니다" 팝업을 닫는데,
+팝업이 없을 때도 is_visible 확인으로 CDP 왕복을 한 번씩 쓴다.
+페이지마다 MutationObserver를 한 번 설치해서 '확인' 버튼이 있는 팝업이 보이는지 여부가
+바뀔 때만 expose_binding으로 알려받고, 팝업이 없으면 확인 자체를 건너뛴다.
+
+설치 실패 / 페이지 이동 직후처럼 상태를 모르면 present=None → 호출 측은 기존 확인 방식 사용
+페이지 이동(framenavigated) 뒤에는 현재 값을 한 번 다시 물어봄: 같은 문서 안 이동(history API,
+#해시)은 init script가 다시 돌지 않고 값이 바뀌지 않으면 알림도 오지 않기 때문
+"""
+
+import asyncio
+import weakref
+
+from playwright.async_api import Page
+
+import service_log
+
+logger = service_log.get_logger("dialog_watcher")
+
+_BINDING = "__ndrimsDialogChanged"
+
+# 문서마다 1회 설치. 현재 상태를 바인딩으로 알리고 그 값을 반환
+_WATCH_JS = """
+() => {
+    const existing = window.__ndrimsDialogWatcher;
+    if (existing) return existing.report();
+
+    const visible = el => {
+        if (!el.getClientRects().length) return false;
+        const style = getComputedStyle(el);
+        return style.visibility !== 'hidden' && style.display !== 'none';
+    };
+    const hasConfirm = () => {
+        for (const dialog of document.querySelectorAll('.cl-dialog')) {
+            if (!visible(dialog)) continue;
+            for (const b of dialog.querySelectorAll('[role="button"], button')) {
+                const name = (b.getAttribute('aria-label') || b.innerText || '').trim();
+                if (name.includes('확인') && visible(b)) return true;
+            }
+        }
+        return false;
+    };
+
+    let last = null;
+    let pending = false;
+    const report = () => {
+        const present = hasConfirm();
+        if (present !== last) {
+            last = present;
+            if (window.__ndrimsDialogChanged) window.__ndrimsDialogChanged(present);
+        }
+        return present;
+    };
+
+    const start = () => {
+        new MutationObserver(() => {
+            // 같은 틱의 변경은 한 번만 확인
+            if (pending) return;
+            pending = true;
+            queueMicrotask(() => { pending = false; report(); });
+        }).observe(document.documentElement, {
+            subtree: true, childList: true, attributes: true,
+            attributeFilter: ['style', 'class', 'hidden', 'aria-hidden'],
+        });
+        report();
+    };
+
+    window.__ndrimsDialogWatcher = { report };
+    if (document.documentElement) start();
+    else document.addEventListener('DOMContentLoaded', start, { once: true });
+    return last;
+}
+"""
+
+# 이동 직후 현재 값 다시 읽기 (아직 설치 전인 새 문서면 null → init script의 알림을 기다림)
+_REPORT_JS = "() => window.__ndrimsDialogWatcher ? window.__ndrimsDialogWatcher.report() : null"
+
+# page → DialogWatcher. 감시자는 page를 들고 있지 않음 (필요한 page는 인자/frame.page로 받음)
+# page의 이벤트 리스너가 감시자를 참조하므로, 감시자가 page를 잡으면 항목이 영영 지워지지 않음
+_watchers = weakref.WeakKeyDictionary()
+
+
+class DialogWatcher:
+    """page 1개의 '확인' 팝업 표시 여부 (None = 알 수 없음)"""
+
+    def __init__(self):
+        self.present = None
+        self.installed = False
+        self._refresh_tasks = set()
+
+    def _on_change(self, source, present):
+        self.present = bool(present)
+
+    def _on_navigated(self, frame):
+        # 다시 읽기 전까지는 모름 (새 문서면 init script가, 같은 문서면 _refresh가 채움)
+        page = frame.page
+        if frame == page.main_frame:
+            self.present = None
+            task = asyncio.ensure_future(self._refresh(page))
+            self._refresh_tasks.add(task)
+            task.add_done_callback(self._refresh_tasks.discard)
+
+    async def _refresh(self, page):
+        try:
+            present = await page.evaluate(_REPORT_JS)
+        except Exception:
+            return  # 문서 교체 중 (새 문서의 init script 알림으로 채워짐)
+        if present is not None:
+            self.present = bool(present)
+
+    async def install(self, page: Page):
+        try:
+            await page.expose_binding(_BINDING, self._on_change)
+            await page.add_init_script(f"({_WATCH_JS})()")
+            page.on("framenavigated", self._on_navigated)
+            present = await page.evaluate(_WATCH_JS)
+            if present is not None:
+                self.present = bool(present)
+            self.installed = True
+        except Exception as e:
+            logger.warning(f"[WARN] 팝업 감시 설치 실패 (기존 확인 방식 사용): {e}")
+            self.present = None
+
+
+async def watch(page: Page):
+    """page의 팝업 감시자 (최초 1회 설치)"""
+    watcher = _watchers.get(page)
+    if watcher is None:
+        watcher = _watchers[page] = DialogWatcher()
+        await watcher.install(page)
+    return watcher
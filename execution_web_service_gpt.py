@@ -1,13 +1,25 @@
+import os
 import time
-import json
-import requests
 import base64
 import asyncio
+import functools
 from pathlib import Path
 
-from explaywright_gpt import run_trajectory, ActionExecutor
-from scrape import scrape_current_ui_state, scrape_current_page
+from explaywright_gpt import run_trajectory, resume_session, ActionExecutor
+from scrape import scrape_current_ui_state, scrape_current_ui_state_incremental, scrape_current_page
 import playwright_client
+import backend_client
+import state_codec
+import session_cache
+import command_transport
+import page_settle
+import tracing
+import service_log
+from trajectory_compiler import compile_trajectory, load_trajectory, TrajectoryError
+from command_dispatcher import CommandDispatcher
+from session_manager import BrowserSession, SessionManager
+
+logger = service_log.get_logger("service")
 
 # ============================================================
 # 🔧 모델 변경 시 수정 필요 (1/3): 백엔드 URL
@@ -22,288 +34,356 @@ BACKEND_URL = "https://ndrims-project-lam.onrender.com" # 백엔드 API URL
 # 실제 AI 모델은 응답 속도가 느릴 수 있으므로 폴링 간격 조정 고려
 # Mock: 5초 / 실제 모델: 10초 권장
 POLLING_INTERVAL = 5 # 폴링 간격 (초)
-ACTIVE_BROWSERS = [] # 브라우저 객체 저장 (가비지 컬렉션 방지)
-
-LOGIN_STATUS = {
-    "logged_in": False,
-    "student_id": None,
-    "last_url": None,
-}
-
-VERIFICATION_RESULT = {
-    "success": False,
-    "message": "",
-    "has_result": False,  # 검증 결과가 있는지 여부
-}
+# 적응형 폴링: 명령 처리 직후 BURST_WINDOW 동안은 BURST_INTERVAL 간격으로 빠르게,
+# 이후 명령이 없으면 POLLING_INTERVAL 부터 2배씩 늘려 POLLING_MAX_INTERVAL 까지 백오프
+POLLING_BURST_INTERVAL = 0.5 # burst 모드 폴링 간격 (초)
+POLLING_BURST_WINDOW = 10    # 명령 처리 후 burst 모드 유지 시간 (초)
+POLLING_MAX_INTERVAL = 20    # 유휴 시 최대 폴링 간격 (초)
+# 명령 채널: poll(기존 고정 간격) / longpoll / sse / ws
+# 백엔드가 지원하지 않는 모드면 자동으로 poll로 전환됨
+COMMAND_TRANSPORT = os.getenv("COMMAND_TRANSPORT", "poll")
+# 동시에 처리할 최대 명령 수 (서로 다른 학번끼리만 병렬, 같은 학번은 순서대로)
+MAX_CONCURRENT_COMMANDS = int(os.getenv("MAX_CONCURRENT_COMMANDS", "4"))
+# UI 상태 증분 전송: 백엔드가 확인한 마지막 버전 대비 JSON Patch(ui_state_patch)만 보냄
+# (버전 불일치 시 전체 스냅샷으로 자동 재전송, 백엔드 지원 시에만 켤 것 → state_sync.py)
+UI_STATE_DELTA = os.getenv("UI_STATE_DELTA", "false").lower() == "true"
+
+# 액션 후 검증 전 대기: 네트워크/DOM 안정 + 예상 제목 표시를 감지해서 바로 진행
+# (false면 기존 고정 대기: networkidle 3초 + sleep)
+SETTLE_DETECTION = os.getenv("SETTLE_DETECTION", "true").lower() == "true"
+TRAJECTORY_SETTLE_TIMEOUT_MS = 8000  # 기존 networkidle 3초 + sleep 5초
+ACTION_SETTLE_TIMEOUT_MS = 4500      # 기존 networkidle 3초 + sleep 1.5초
+
+# 저장된 로그인 세션(쿠키)으로 재로그인할 때 세션 확인 타임아웃 (ms)
+SESSION_PROBE_TIMEOUT_MS = 3000
+
+# 학번별 브라우저 세션 (page/context, 로그인 상태, 검증 결과를 세션마다 보관)
+SESSIONS = SessionManager()
 
 
 async def poll_commands():
-    print("\n" + "=" * 60)
-    print("실행 웹 폴링 서비스 시작")
-    print("=" * 60)
-    print(f"백엔드 URL: {BACKEND_URL}")
-    print(f"폴링 간격: {POLLING_INTERVAL}초")
-    print("=" * 60 + "\n")
-
-    LOGIN_STATUS["logged_in"] = False     # 시작 시 백엔드에 초기화 신호 전송 + 로컬 상태 초기화
-    LOGIN_STATUS["student_id"] = None
-    LOGIN_STATUS["last_url"] = None
-
+    logger.info("=" * 60)
+    logger.info("실행 웹 폴링 서비스 시작")
+    logger.info("=" * 60)
+    logger.info(f"백엔드 URL: {BACKEND_URL}")
+    logger.info(f"폴링 간격: {POLLING_INTERVAL}초 (burst {POLLING_BURST_INTERVAL}초 / 최대 {POLLING_MAX_INTERVAL}초)")
+    logger.info(f"명령 채널: {COMMAND_TRANSPORT}")
+    logger.info(f"동시 처리 명령 수: {MAX_CONCURRENT_COMMANDS}")
+    logger.info("=" * 60)
+
+    backend_client.configure(BACKEND_URL)
+    await tracing.start()
+    # kill -USR1 <pid> 로 최근 로그(DEBUG 포함)를 파일로 덤프
+    service_log.install_dump_signal(asyncio.get_running_loop())
+
+    # 첫 로그인이 브라우저 기동을 기다리지 않도록 컨텍스트 풀을 미리 채움
+    playwright_client.schedule_warmup()
+    playwright_client.start_lifecycle_monitor()
+
+    init_response = None
     try:
-        print("[초기화] 백엔드에 실행웹 시작 신호 전송...")
-        init_response = requests.post(
-            f"{BACKEND_URL}/execution_web/init",
-            json={"status": "started"},
-            timeout=5,
-        )
+        logger.info("[초기화] 백엔드에 실행웹 시작 신호 전송...")
+        init_response = await backend_client.post_init(timeout=5)
         if init_response.status_code == 200:
-            print("[초기화] 백엔드 초기화 완료")
+            logger.info("[초기화] 백엔드 초기화 완료")
         else:
-            print(f"[경고] 백엔드 초기화 실패: {init_response.status_code}")
+            logger.warning(f"[경고] 백엔드 초기화 실패: {init_response.status_code}")
     except Exception as e:
-        print(f"[경고] 백엔드 초기화 신호 전송 실패: {e}")
+        logger.warning(f"[경고] 백엔드 초기화 신호 전송 실패: {e}")
+
+    # /state 압축·축약 형식 협상 (init 실패 시 환경변수 강제 설정만 적용)
+    state_codec.negotiate(init_response if init_response is not None and init_response.status_code == 200 else None)
+
+    scheduler = command_transport.PollScheduler(
+        POLLING_INTERVAL,
+        burst_interval=POLLING_BURST_INTERVAL,
+        burst_window=POLLING_BURST_WINDOW,
+        max_interval=POLLING_MAX_INTERVAL,
+    )
+    transport = command_transport.create_transport(COMMAND_TRANSPORT, POLLING_INTERVAL, scheduler)
+    # 명령 처리가 끝날 때마다 burst 모드로 (연달아 오는 다음 명령을 빠르게 받기 위함)
+    dispatcher = CommandDispatcher(MAX_CONCURRENT_COMMANDS, on_done=transport.notify_command)
+    try:
+        await _poll_loop(transport, dispatcher)
+    finally:
+        await dispatcher.close()
+        await transport.close()
+        await playwright_client.stop_lifecycle_monitor()
+        await tracing.stop()
+
+
+async def _poll_loop(transport, dispatcher):
+    last_login_key = None  # 학번/토큰이 없는 명령은 마지막 로그인 세션으로 보냄
 
     while True:
         try: 
-            if ACTIVE_BROWSERS: # 브라우저 닫힘 감시
-                for b in ACTIVE_BROWSERS[:]:
-                    page = b.get("page")
-                    if page and page.is_closed():
-                        print("[모니터링] 브라우저 창이 닫혔습니다. 세션 정리 중...")
-                        await cleanup_browsers()
-                        try:
-                            requests.post(f"{BACKEND_URL}/logout", timeout=5)
-                            print("[모니터링] 백엔드에 로그아웃 요청 전송 완료")
-                        except Exception as e:
-                            print(f"[모니터링] 백엔드 로그아웃 요청 실패: {e}")
-                        # 한 번 감지되면 추가 감지 방지
-                        break
-                
+            for session in SESSIONS: # 브라우저 닫힘 감시 (세션별)
+                if session.is_page_closed():
+                    logger.info(f"[모니터링] 브라우저 창이 닫혔습니다. 세션 정리 중... (학번: {session.student_id})")
+                    await cleanup_browsers(session)
+                    try:
+                        await backend_client.post_logout(student_id=session.student_id, timeout=5)
+                        logger.info("[모니터링] 백엔드에 로그아웃 요청 전송 완료")
+                    except Exception as e:
+                        logger.warning(f"[모니터링] 백엔드 로그아웃 요청 실패: {e}")
+
             # 현재 브라우저 상태를 함께 전달
-            browser_count = len(ACTIVE_BROWSERS)
+            browser_count = len(SESSIONS)
             browser_running = browser_count > 0
 
-            response = requests.get(
-                f"{BACKEND_URL}/command",
-                params={
-                    "browser_running": str(browser_running).lower(),
-                    "browser_count": browser_count,
-                },
-                timeout=10,
-            )
-
-            # JSON 파싱 전에 응답 상태 확인
-            if response.status_code != 200:
-                print(f"[오류] 백엔드 응답 오류: HTTP {response.status_code}")
-                print(f"[오류] 응답 내용: {response.text[:200]}")
-                await asyncio.sleep(POLLING_INTERVAL)
-                continue
-
-            # 빈 응답 체크
-            if not response.text or response.text.strip() == "":
-                print(f"[오류] 백엔드에서 빈 응답 수신")
-                await asyncio.sleep(POLLING_INTERVAL)
-                continue
+            # 명령 대기 (명령 없음/응답 오류 시 대기는 전송 계층이 처리)
+            with tracing.span("poll"):
+                command = await transport.next_command(
+                    {
+                        "browser_running": str(browser_running).lower(),
+                        "browser_count": browser_count,
+                    }
+                )
 
-            try:
-                command = response.json()
-            except json.JSONDecodeError as e:
-                print(f"[오류] JSON 파싱 실패: {e}")
-                print(f"[오류] 응답 내용: {response.text[:200]}")
-                await asyncio.sleep(POLLING_INTERVAL)
+            # 명령 없음
+            if command is None:
                 continue
 
             cmd_type = command.get("type")
 
-            # 명령 없음
-            if command.get("has_task") is False or cmd_type == "none":
-                await asyncio.sleep(POLLING_INTERVAL)
+            # 전체 종료 명령은 진행 중인 명령이 모두 끝난 뒤 바로 처리
+            if cmd_type == "shutdown" or (
+                cmd_type == "logout" and SESSIONS.resolve_key(command) is None
+            ):
+                await dispatcher.join()
+                await handle_command(command, None)
+                transport.notify_command()
                 continue
 
-            # 로그인
+            # 세션별로 순서를 지키며 병렬 실행
             if cmd_type == "login":
-                print("\n[명령 수신] 로그인 요청")
-                print(f"  - 학번: {command['student_id']}")
-                if "token" in command:
-                    print(f"  - 토큰: {command['token']}")
-                await execute_login_and_send_result(
-                    command["student_id"], command["password"]
-                )
+                session_key = command.get("student_id")
+                last_login_key = session_key
+            else:
+                session_key = SESSIONS.resolve_key(command) or last_login_key or "_default"
 
-            # 상태 / 프롬프트
-            elif cmd_type == "state":
-                prompt = command.get("prompt_text", "")
-                print("\n[명령 수신] State 명령")
-                print(f"  - 프롬프트: {prompt}")
-
-                # UI 상태만 전송 (프롬프트 처리 없이)
-                await send_ui_state_only()
-                print("\n[명령 수신] 액션 명령 요청")
-                #await execute_action_command()
-
-            # 액션 실행
-            elif cmd_type == "action":
-                print("\n[명령 수신] 액션 명령 요청")
-                await execute_action_command()
-
-            # 검증 결과 요청
-            elif cmd_type == "verification":
-                print("\n[명령 수신] 검증 결과 요청")
-                global VERIFICATION_RESULT
-                if VERIFICATION_RESULT["has_result"]:
-                    # 검증 결과를 백엔드로 전송
-                    try:
-                        response = requests.post(
-                            f"{BACKEND_URL}/verification",
-                            json={
-                                "success": VERIFICATION_RESULT["success"],
-                                "message": VERIFICATION_RESULT["message"]
-                            },
-                            headers={"Content-Type": "application/json"},
-                            timeout=5,
-                        )
-                        if response.status_code == 200:
-                            print(f"[검증 전송 완료] 성공={VERIFICATION_RESULT['success']}, 메시지={VERIFICATION_RESULT['message']}")
-                            # 전송 후 초기화
-                            VERIFICATION_RESULT = {"success": False, "message": "", "has_result": False}
-                        else:
-                            print(f"[검증 전송 실패] 상태 코드: {response.status_code}")
-                    except Exception as e:
-                        print(f"[검증 전송 오류] {e}")
-                else:
-                    print("[경고] 검증 결과가 없습니다.")
+            dispatcher.submit(
+                session_key, cmd_type, functools.partial(handle_command, command, session_key)
+            )
+            transport.notify_command()
 
-            # 브라우저 종료
-            elif cmd_type in ("shutdown","logout"):
-                print("\n[명령 수신] 브라우저 닫기({cmd_type})")
-                print(f"[디버그] 현재 ACTIVE_BROWSERS 개수: {len(ACTIVE_BROWSERS)}")
+        except backend_client.BackendConnectionError:
+            logger.error("[오류] 백엔드 서버에 연결할 수 없습니다.")
+            logger.info("  → 백엔드 서버가 실행 중인지 확인하세요.")
+            await asyncio.sleep(10)
+        except Exception as e:
+            logger.exception(f"[오류] 폴링 중 예외 발생: {e}")
+            await asyncio.sleep(POLLING_INTERVAL)
 
-                await cleanup_browsers()
 
-                print("[완료] 브라우저 닫기 완료")
-                print(f"[디버그] 정리 후 ACTIVE_BROWSERS 개수: {len(ACTIVE_BROWSERS)}")
 
-            else:
-                print(f"[경고] 알 수 없는 명령: {cmd_type}")
 
-        except requests.exceptions.ConnectionError:
-            print("[오류] 백엔드 서버에 연결할 수 없습니다.")
-            print("  → 백엔드 서버가 실행 중인지 확인하세요.")
-            await asyncio.sleep(10)
-        except Exception as e:
-            print(f"[오류] 폴링 중 예외 발생: {e}")
-            import traceback
+async def handle_command(command, session_key): #명령 1개 처리 (디스패처 태스크 안에서 실행)
+    # 명령 1개 = trace 1개 (이 안의 단계별 span이 같은 trace_id로 묶임)
+    with tracing.trace("command", type=command.get("type"), session=session_key):
+        await _handle_command(command, session_key)
 
-            traceback.print_exc()
-            await asyncio.sleep(POLLING_INTERVAL)
 
+async def _handle_command(command, session_key):
+    cmd_type = command.get("type")
+    # 실행 시점 기준으로 세션 조회 (앞선 login 명령이 끝난 뒤의 세션을 보도록)
+    session = SESSIONS.get(session_key) or SESSIONS.resolve(command)
+
+    # 로그인
+    if cmd_type == "login":
+        logger.info("[명령 수신] 로그인 요청")
+        logger.info(f"  - 학번: {command['student_id']}")
+        if "token" in command:
+            logger.info(f"  - 토큰: {service_log.mask(command['token'])}")
+        await execute_login_and_send_result(
+            command["student_id"], command["password"], command.get("token")
+        )
+
+    # 상태 / 프롬프트
+    elif cmd_type == "state":
+        prompt = command.get("prompt_text", "")
+        logger.info("[명령 수신] State 명령")
+        logger.info(f"  - 프롬프트: {prompt}")
+
+        # UI 상태만 전송 (프롬프트 처리 없이)
+        await send_ui_state_only(session)
+        logger.info("[명령 수신] 액션 명령 요청")
+        #await execute_action_command()
+
+    # 액션 실행
+    elif cmd_type == "action":
+        logger.info("[명령 수신] 액션 명령 요청")
+        await execute_action_command(session)
+
+    # 검증 결과 요청
+    elif cmd_type == "verification":
+        logger.info("[명령 수신] 검증 결과 요청")
+        await send_verification_result(session)
+
+    # 브라우저 종료
+    elif cmd_type in ("shutdown","logout"):
+        logger.info(f"[명령 수신] 브라우저 닫기({cmd_type})")
+        logger.debug(f"[디버그] 현재 세션 수: {len(SESSIONS)}")
+
+        # logout은 해당 학번 세션만, shutdown(또는 식별자 없는 logout)은 전체 정리
+        if session_key is not None:
+            if session:
+                await cleanup_browsers(session)
+            else:
+                logger.info("[정리] 해당 학번의 세션이 없습니다")
+        else:
+            await cleanup_browsers(shutdown=(cmd_type == "shutdown"))
+
+        logger.info("[완료] 브라우저 닫기 완료")
+        logger.debug(f"[디버그] 정리 후 세션 수: {len(SESSIONS)}")
 
+    else:
+        logger.warning(f"[경고] 알 수 없는 명령: {cmd_type}")
 
 
-async def execute_login_and_send_result(student_id, password):
+async def execute_login_and_send_result(student_id, password, token=None):
     """
     Playwright로 로그인 실행하고 결과를 즉시 백엔드로 전송
+    (같은 학번의 기존 세션만 정리하고, 다른 학번의 세션은 그대로 둔다)
     """
-    global ACTIVE_BROWSERS, LOGIN_STATUS
-
+    # 같은 학번의 기존 브라우저 정리
+    existing = SESSIONS.get(student_id)
+    if existing:
+        logger.info("[정리] 기존 브라우저 정리 중...")
+        await cleanup_browsers(existing)
 
-    # 기존 브라우저 정리
-    if ACTIVE_BROWSERS:
-        print("[정리] 기존 브라우저 정리 중...")
-        await cleanup_browsers()
+    session = BrowserSession(student_id, token)
 
-    print("[실행] Playwright 로그인 시작...")
+    logger.info("[실행] Playwright 로그인 시작...")
 
     try:
         trajectory_file = Path(__file__).parent / "trajectory_login_only.json"
 
         if not trajectory_file.exists():
-            print(f"[오류] trajectory 파일을 찾을 수 없습니다: {trajectory_file}")
+            logger.error(f"[오류] trajectory 파일을 찾을 수 없습니다: {trajectory_file}")
             result = {
                 "loginSuccess": False,
                 "message": "trajectory 파일을 찾을 수 없습니다.",
             }
-            send_state(result)
+            await send_state(result, session)
             return
 
-        actions = json.loads(trajectory_file.read_text(encoding="utf-8"))
+        actions = load_trajectory(trajectory_file)  # 파일이 바뀌지 않았으면 캐시된 컴파일 결과
         context = {"DG_USERNAME": student_id, "DG_PASSWORD": password}
 
         try:
-            login_success, page, browser, ctx = await run_trajectory(
-                actions, context, keep_browser_open=True
-            )
+            # 세션 복원 실패 → 반납 → trajectory 로그인 사이에 다른 학생의 로그아웃이
+            # 공용 브라우저를 닫지 않도록 로그인이 끝날 때까지 붙잡아 둠
+            with playwright_client.hold_browser():
+                # 저장된 세션이 살아있으면 trajectory 없이 바로 로그인
+                with tracing.span("login.resume"):
+                    login_success, page, browser, ctx = await login_with_cached_session(
+                        student_id, password
+                    )
+                from_cache = login_success
+                if not login_success:
+                    with tracing.span("login.trajectory"):
+                        login_success, page, browser, ctx = await run_trajectory(
+                            actions, context, keep_browser_open=True
+                        )
 
             if login_success and page and browser and ctx:
-                print("[성공] 로그인 완료")
+                logger.info("[성공] 로그인 완료")
 
-                LOGIN_STATUS["logged_in"] = True
-                LOGIN_STATUS["student_id"] = student_id
+                session.attach(page, browser, ctx)
+                session.login_status["logged_in"] = True
                 try:
-                    LOGIN_STATUS["last_url"] = page.url
+                    session.login_status["last_url"] = page.url
                 except Exception:
-                    LOGIN_STATUS["last_url"] = "nDRIMS 메인 페이지"
+                    session.login_status["last_url"] = "nDRIMS 메인 페이지"
 
-                send_state(
+                # 로그인 성공한 세션만 유지
+                SESSIONS.add(session)
+                logger.info(f"[INFO] 브라우저를 열어둔 채로 유지합니다. (세션 수: {len(SESSIONS)})")
+
+                await send_state(
                     {
                         "loginSuccess": True,
                         "message": "로그인 성공",
                         "student_id": student_id,
-                        "last_url": LOGIN_STATUS["last_url"],
-                    }
+                        "last_url": session.login_status["last_url"],
+                    },
+                    session,
                 )
-                print("[완료] 로그인 성공 → 백엔드로 전송 완료\n")
+                logger.info("[완료] 로그인 성공 → 백엔드로 전송 완료")
 
-                # 로그인 성공한 세션만 유지
-                ACTIVE_BROWSERS.append(
-                    {"page": page, "browser": browser, "context": ctx}
-                )
-                print("[INFO] 브라우저를 열어둔 채로 유지합니다.")
+                if not from_cache:
+                    await save_login_session(student_id, password, ctx, page)
             else:
-                print("[실패] 로그인 실패 (메인 페이지로 이동하지 않음)")
-                await cleanup_browsers()
-                send_state(
+                logger.warning("[실패] 로그인 실패 (메인 페이지로 이동하지 않음)")
+                await cleanup_browsers(session)
+                await send_state(
                     {
                         "loginSuccess": False,
                         "message": "로그인 실패: 인증 정보가 올바르지 않거나, 메인 페이지로 이동하지 않았습니다.",
-                    }
+                    },
+                    session,
                 )
-                print("[완료] 로그인 실패 → 백엔드로 전송 완료\n")
+                logger.info("[완료] 로그인 실패 → 백엔드로 전송 완료")
 
         except Exception as inner_e:
             error_msg = str(inner_e)
-            print(f"[실패] 로그인 오류: {error_msg}")
-            await cleanup_browsers()
+            logger.error(f"[실패] 로그인 오류: {error_msg}")
+            await cleanup_browsers(session)
 
             if "Timeout" in error_msg or "waiting for" in error_msg:
                 msg = "로그인 실패: 응답 지연 또는 잘못된 인증 정보"
             else:
                 msg = f"로그인 실패: {error_msg}"
 
-            send_state({"loginSuccess": False, "message": msg})
-            print("[완료] 로그인 실패 → 백엔드로 전송 완료\n")
+            await send_state({"loginSuccess": False, "message": msg}, session)
+            logger.info("[완료] 로그인 실패 → 백엔드로 전송 완료")
 
     except Exception as e:
-        print(f"[실패] 로그인 처리 중 예외: {e}")
-        await cleanup_browsers()
-        send_state(
+        logger.error(f"[실패] 로그인 처리 중 예외: {e}")
+        await cleanup_browsers(session)
+        await send_state(
             {
                 "loginSuccess": False,
                 "message": f"로그인 실패: {str(e)}",
-            }
+            },
+            session,
         )
-        print("[완료] 로그인 실패 → 백엔드로 전송 완료\n")
+        logger.info("[완료] 로그인 실패 → 백엔드로 전송 완료")
+
+
+async def login_with_cached_session(student_id, password): #저장된 쿠키로 로그인 시도
+    cached = await session_cache.load(student_id, password)
+    if not cached:
+        return False, None, None, None
+
+    logger.info("[세션 캐시] 저장된 로그인 세션 발견 → 세션 확인")
+    result = await resume_session(
+        cached["storage_state"], cached["last_url"], SESSION_PROBE_TIMEOUT_MS
+    )
+    if not result[0]:
+        logger.info("[세션 캐시] 세션 만료 → 전체 로그인 진행")
+        session_cache.invalidate(student_id)
+    return result
+
+
+async def save_login_session(student_id, password, ctx, page): #로그인 성공 세션 쿠키 저장
+    try:
+        storage_state = await ctx.storage_state()
+        await session_cache.save(student_id, password, storage_state, page.url)
+    except Exception as e:
+        logger.warning(f"[세션 캐시] 로그인 세션 저장 실패: {e}")
 
 
 async def capture_ui_state(page):
     """
     현재 페이지의 스크린샷과 UI 상태를 캡처
     """
-    print("[캡처 시작] 스크린샷과 UI 상태 수집 중...")
+    logger.info("[캡처 시작] 스크린샷과 UI 상태 수집 중...")
 
     try:
         if page.is_closed():
-            print("[오류] 페이지가 이미 닫혔습니다")
+            logger.error("[오류] 페이지가 이미 닫혔습니다")
             return None
 
         # 스크린샷
@@ -313,98 +393,94 @@ async def capture_ui_state(page):
 
         # UI 상태
         ui_state = await scrape_current_ui_state(page)
-        print("[캡처 완료] UI 상태 수집 성공")
+        logger.info("[캡처 완료] UI 상태 수집 성공")
 
         return {
             #"screenshot": screenshot_base64,
             "ui_state": ui_state,
         }
     except Exception as e:
-        print(f"[캡처 오류] 스크린샷/상태 캡처 실패: {e}")
-        import traceback
-
-        traceback.print_exc()
+        logger.exception(f"[캡처 오류] 스크린샷/상태 캡처 실패: {e}")
         return None
 
 
-async def send_ui_state_only():
+async def send_ui_state_only(session):
     """
     UI 상태만 백엔드로 전송 (액션 실행 후 다음 액션 생성용)
     """
-    global LOGIN_STATUS, ACTIVE_BROWSERS
-
-    print(f"[실행] UI 상태 전송 시작")
+    logger.info(f"[실행] UI 상태 전송 시작")
 
     try:
-        if not ACTIVE_BROWSERS:
-            print("[경고] 브라우저가 없습니다.")
-            send_state({
+        if session is None:
+            logger.warning("[경고] 브라우저가 없습니다.")
+            await send_state({
                 "success": False,
                 "needs_login": True,
                 "message": "브라우저가 닫혔습니다."
             })
             return
 
-        if not LOGIN_STATUS["logged_in"]:
-            print("[경고] 로그인되지 않았습니다.")
-            send_state({
+        login_status = session.login_status
+        if not login_status["logged_in"]:
+            logger.warning("[경고] 로그인되지 않았습니다.")
+            await send_state({
                 "success": False,
                 "needs_login": True,
                 "message": "먼저 로그인하세요."
-            })
+            }, session)
             return
 
-        print(f"[상태] 로그인됨 - 학번: {LOGIN_STATUS['student_id']}")
-        print(f"[상태] 마지막 URL: {LOGIN_STATUS.get('last_url', '알 수 없음')}")
+        logger.info(f"[상태] 로그인됨 - 학번: {login_status['student_id']}")
+        logger.info(f"[상태] 마지막 URL: {login_status.get('last_url', '알 수 없음')}")
 
-        # 현재 페이지 UI 상태 수집
-        page = ACTIVE_BROWSERS[-1]["page"]
+        # 현재 페이지 UI 상태 수집 (바뀐 영역만 다시 수집)
+        page = session.page
         try:
-            ui_state = await scrape_current_ui_state(page)
-            print("[상태] UI 상태 수집 성공")
+            ui_state, changed = await scrape_current_ui_state_incremental(page)
+            if changed is None:
+                logger.info("[상태] UI 상태 수집 성공")
+            else:
+                logger.info(f"[상태] UI 상태 수집 성공 (변경 섹션: {changed or '없음'})")
         except Exception as e:
-            print(f"[오류] UI 상태 수집 실패: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"[오류] UI 상태 수집 실패: {e}")
             ui_state = None
 
         # 백엔드로 전송할 데이터 구성
         state_data = {
             "success": True,
-            "student_id": LOGIN_STATUS["student_id"],
-            "logged_in": LOGIN_STATUS["logged_in"],
-            "last_url": LOGIN_STATUS.get("last_url", "알 수 없음"),
+            "student_id": login_status["student_id"],
+            "logged_in": login_status["logged_in"],
+            "last_url": login_status.get("last_url", "알 수 없음"),
             "message": "UI 상태 업데이트",
             "ui_state": ui_state,
         }
 
-        send_state(state_data)
-        print("[완료] UI 상태 전송 완료\n")
+        if UI_STATE_DELTA and ui_state is not None:
+            await send_versioned_ui_state(state_data, session)
+        else:
+            await send_state(state_data, session)
+        logger.info("[완료] UI 상태 전송 완료")
 
     except Exception as e:
-        print(f"[실패] UI 상태 전송 오류: {e}")
-        import traceback
-        traceback.print_exc()
-        send_state({
+        logger.exception(f"[실패] UI 상태 전송 오류: {e}")
+        await send_state({
             "success": False,
             "message": f"UI 상태 수집 실패: {str(e)}"
-        })
+        }, session)
 
 
-async def execute_prompt_and_send_state(prompt_text: str):
+async def execute_prompt_and_send_state(prompt_text: str, session):
     """
     프롬프트 명령 처리 + 현재 UI 상태를 백엔드로 전송
     (스크린샷 제거 버전)
     """
-    global LOGIN_STATUS, ACTIVE_BROWSERS
-
-    print(f"[실행] 프롬프트 처리 시작: {prompt_text}")
+    logger.info(f"[실행] 프롬프트 처리 시작: {prompt_text}")
 
     try:
         #  로그인 여부 확인
-        if not ACTIVE_BROWSERS:
-            print("[경고] 브라우저가 없습니다. 로그인이 필요합니다.")
-            send_state(
+        if session is None:
+            logger.warning("[경고] 브라우저가 없습니다. 로그인이 필요합니다.")
+            await send_state(
                 {
                     "success": False,
                     "needs_login": True,
@@ -414,67 +490,66 @@ async def execute_prompt_and_send_state(prompt_text: str):
             )
             return
 
-        if not LOGIN_STATUS["logged_in"]:
-            print("[경고] 로그인되지 않았습니다.")
-            send_state(
+        login_status = session.login_status
+        if not login_status["logged_in"]:
+            logger.warning("[경고] 로그인되지 않았습니다.")
+            await send_state(
                 {
                     "success": False,
                     "needs_login": True,
                     "message": "먼저 로그인하세요.",
                     "prompt": prompt_text,
-                }
+                },
+                session,
             )
             return
 
         #  상태 출력
-        print(f"[상태] 로그인됨 - 학번: {LOGIN_STATUS['student_id']}")
-        print(f"[상태] 마지막 URL: {LOGIN_STATUS.get('last_url', '알 수 없음')}")
+        logger.info(f"[상태] 로그인됨 - 학번: {login_status['student_id']}")
+        logger.info(f"[상태] 마지막 URL: {login_status.get('last_url', '알 수 없음')}")
 
         #  현재 페이지 UI 상태 수집
-        page = ACTIVE_BROWSERS[-1]["page"]
+        page = session.page
         try:
             ui_state = await scrape_current_ui_state(page)
-            print("[상태] UI 상태 수집 성공")
+            logger.info("[상태] UI 상태 수집 성공")
         except Exception as e:
-            print(f"[오류] UI 상태 수집 실패: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"[오류] UI 상태 수집 실패: {e}")
             ui_state = None
 
         #  백엔드로 전송할 데이터 구성 (스크린샷 제거됨)
         state_data = {
             "success": True,
             "prompt": prompt_text,
-            "student_id": LOGIN_STATUS["student_id"],
-            "logged_in": LOGIN_STATUS["logged_in"],
-            "last_url": LOGIN_STATUS.get("last_url", "알 수 없음"),
+            "student_id": login_status["student_id"],
+            "logged_in": login_status["logged_in"],
+            "last_url": login_status.get("last_url", "알 수 없음"),
             "message": f"프롬프트 '{prompt_text}'를 수신했습니다. nDRIMS에 로그인된 상태입니다.",
             "ui_state": ui_state,
         }
 
         #  전송 로그
         if ui_state:
-            print("[상태] UI 상태를 포함하여 백엔드로 전송 중...")
+            logger.info("[상태] UI 상태를 포함하여 백엔드로 전송 중...")
         else:
-            print("[경고] UI 상태가 비어있습니다. 기본 정보만 전송합니다.")
+            logger.warning("[경고] UI 상태가 비어있습니다. 기본 정보만 전송합니다.")
 
         #  백엔드로 상태 전송
-        send_state(state_data)
-        print("[완료] 프롬프트 처리 완료\n")
+        await send_state(state_data, session)
+        logger.info("[완료] 프롬프트 처리 완료")
 
     except Exception as e:
-        print(f"[실패] 프롬프트 처리 오류: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"[실패] 프롬프트 처리 오류: {e}")
 
-        send_state(
+        await send_state(
             {
                 "success": False,
                 "message": f"프롬프트 처리 실패: {str(e)}",
                 "prompt": prompt_text,
-            }
+            },
+            session,
         )
-        print("[완료] 프롬프트 처리 실패 → 백엔드로 전송 완료\n")
+        logger.info("[완료] 프롬프트 처리 실패 → 백엔드로 전송 완료")
 
 
 
@@ -485,8 +560,7 @@ def extract_expected_page_title(actions):
     """
     import re
 
-    for action_item in reversed(actions):
-        action_def = action_item.get("action", {})
+    for action_def in reversed(compile_trajectory(actions).actions):
         action_name = action_def.get("name")
 
         if action_name == "click":
@@ -495,61 +569,70 @@ def extract_expected_page_title(actions):
             text_match = re.search(r"text=([^\]]+)", selector)
             if text_match:
                 title = text_match.group(1).strip()
-                print(f"[추출] 예상 페이지 제목: '{title}' (text= 패턴)")
+                logger.info(f"[추출] 예상 페이지 제목: '{title}' (text= 패턴)")
                 return title
 
             name_match = re.search(r"name=['\"]([^'\"]+)['\"]", selector)
             if name_match:
                 title = name_match.group(1).strip()
-                print(f"[추출] 예상 페이지 제목: '{title}' (name= 패턴)")
+                logger.info(f"[추출] 예상 페이지 제목: '{title}' (name= 패턴)")
                 return title
 
-    print("[추출] 예상 페이지 제목을 찾을 수 없음")
+    logger.info("[추출] 예상 페이지 제목을 찾을 수 없음")
     return None
 
 
-async def execute_trajectory_in_browser(actions, action_description, browser_info, verification=None):
+@tracing.traced("trajectory")
+async def execute_trajectory_in_browser(actions, action_description, session, verification=None):
     """
     이미 열린 브라우저에서 trajectory 액션 실행 + 결과 검증
+    actions: CompiledTrajectory (trajectory JSON 값을 넘기면 여기서 컴파일)
     """
-    page = browser_info["page"]
+    actions = compile_trajectory(actions)
+    page = session.page
 
     if page.is_closed():
-        print("[경고] 페이지가 닫혀 있어 액션을 실행할 수 없습니다.")
-        send_state(
+        logger.warning("[경고] 페이지가 닫혀 있어 액션을 실행할 수 없습니다.")
+        await send_state(
             {
                 "action_success": False,
                 "message": "페이지 세션이 종료되었습니다. 다시 로그인해주세요.",
                 "needs_login": True,
                 "action_description": action_description,
-            }
+            },
+            session,
         )
         return
 
-    print("=" * 60)
-    print(f"[실행] trajectory 시작: '{action_description}'")
-    print(f"[INFO] 실행할 액션 수: {len(actions)}")
-    print("=" * 60)
+    logger.info("=" * 60)
+    logger.info(f"[실행] trajectory 시작: '{action_description}'")
+    logger.info(f"[INFO] 실행할 액션 수: {len(actions)}")
+    logger.info("=" * 60)
 
+    page_settle.track(page)  # 액션이 일으키는 요청부터 추적
     executor = ActionExecutor(page, {})
 
     success_count = 0
     fail_count = 0
 
-    for idx, step in enumerate(actions):
-        action_def = step.get("action", {})
+    # 연속된 입력(type)은 컴파일 시 한 번에 채우도록 묶여 있음 (trajectory_planner)
+    for indices, action_def in actions.plan:
+        idx = indices[0]
         action_name = action_def.get("name")
         action_args = action_def.get("args", {})
         action_state = action_def.get("state")  # state 필드 추출
 
-        print(f"  ▶ [{idx+1}/{len(actions)}] {action_name}: {action_args}")
+        if len(indices) > 1:
+            logger.info(f"  ▶ [{idx+1}-{indices[-1]+1}/{len(actions)}] {action_name}: {len(indices)}개 입력 일괄 처리")
+        else:
+            logger.info(f"  ▶ [{idx+1}/{len(actions)}] {action_name}: {action_args}")
         if action_state:
-            print(f"     [State] {action_state}")
+            logger.info(f"     [State] {action_state}")
 
         try:
             # state가 "grid"이고 click 액션인 경우 액션 이름을 click_grid로 변경
             if action_state == "grid" and action_name == "click":
-                print(f"     [Grid 모드] click 액션을 click_grid로 변경")
+                logger.info(f"     [Grid 모드] click 액션을 click_grid로 변경")
                 # 액션 이름을 click_grid로 변경하여 실행
                 modified_action = {
                     "name": "click_grid",
@@ -560,21 +643,19 @@ async def execute_trajectory_in_browser(actions, action_description, browser_inf
             else:
                 # 일반 액션 실행
                 await executor.run(action_def)
-                success_count += 1
+                success_count += len(indices)
         except Exception as e:
-            print(f"    [오류] 액션 실행 실패: {e}")
-            import traceback
-            traceback.print_exc()
-            fail_count += 1
+            logger.exception(f"    [오류] 액션 실행 실패: {e}")
+            fail_count += len(indices)
 
     if fail_count > 0:
-        print(f"[완료] Trajectory 액션 실행 완료 (성공: {success_count}, 실패: {fail_count})")
+        logger.warning(f"[완료] Trajectory 액션 실행 완료 (성공: {success_count}, 실패: {fail_count})")
     else:
-        print(f"[성공] Trajectory 액션 실행 완료 ({success_count}개 액션 모두 성공)")
+        logger.info(f"[성공] Trajectory 액션 실행 완료 ({success_count}개 액션 모두 성공)")
 
-    print("=" * 60)
-    print("[검증 단계] trajectory 실행 후 페이지 상태 확인 시작")
-    print("=" * 60)
+    logger.info("=" * 60)
+    logger.info("[검증 단계] trajectory 실행 후 페이지 상태 확인 시작")
+    logger.info("=" * 60)
 
     # 검증 로직
     try:
@@ -584,30 +665,21 @@ async def execute_trajectory_in_browser(actions, action_description, browser_inf
         # 예상 제목 결정
         if verification:
             expected_title = verification.get("expected_text", "") or ""
-            print(f"[검증] verification 지정 예상 제목: '{expected_title}'")
+            logger.info(f"[검증] verification 지정 예상 제목: '{expected_title}'")
         else:
             expected_title = extract_expected_page_title(actions)
-            print(f"[검증] trajectory 내부에서 예상 제목 추출: '{expected_title}'")
+            logger.info(f"[검증] trajectory 내부에서 예상 제목 추출: '{expected_title}'")
 
         # 🔧 페이지 로딩 완료 대기 (액션 실행 직후 로딩 시간 확보)
-        print("[검증] 페이지 로딩 대기 중...")
-        try:
-            await page.wait_for_load_state("networkidle", timeout=3000)
-            print("[검증] 페이지 로딩 완료")
-        except Exception as wait_e:
-            print(f"[검증] 페이지 로딩 대기 타임아웃 (계속 진행): {wait_e}")
-
-        # 추가 대기: 팝업이나 동적 콘텐츠 로딩 시간 확보
-        await asyncio.sleep(5)
-        print("[검증] 추가 대기 완료 (1.5초)")
+        await wait_for_page_settle(page, TRAJECTORY_SETTLE_TIMEOUT_MS, expected_title, legacy_sleep=5)
 
         # 🔍 검증 시작 로그 추가
-        print("[검증] ---- scrape_current_page() 호출 시작 ----")
+        logger.info("[검증] ---- scrape_current_page() 호출 시작 ----")
         current_page_info = await scrape_current_page(page)
-        print("[검증] ---- scrape_current_page() 호출 완료 ----")
+        logger.info("[검증] ---- scrape_current_page() 호출 완료 ----")
 
         actual_title = current_page_info.get("title", "")
-        print(f"[검증] 실제 페이지/팝업 제목: '{actual_title}'")
+        logger.info(f"[검증] 실제 페이지/팝업 제목: '{actual_title}'")
 
         # 비교
         if expected_title:
@@ -615,38 +687,61 @@ async def execute_trajectory_in_browser(actions, action_description, browser_inf
             if actual_title and (expected_title in actual_title or actual_title in expected_title):
                 is_success = True
                 verification_message = f"'{expected_title}' 페이지 로드 완료"
-                print("[검증] ✓ 제목 일치")
+                logger.info("[검증] ✓ 제목 일치")
             else:
                 is_success = fail_count == 0
                 verification_message = f"'{expected_title}' 페이지 도달 실패 (현재: '{actual_title}')"
-                print("[검증] ✗ 제목 불일치")
+                logger.warning("[검증] ✗ 제목 불일치")
         else:
-            print("[검증] 예상 제목 없음 - 액션 실행 성공 여부로 판단")
+            logger.info("[검증] 예상 제목 없음 - 액션 실행 성공 여부로 판단")
             is_success = fail_count == 0
             verification_message = "액션 실행 완료" if is_success else "일부 액션 실행 실패"
 
         # 검증 결과를 저장 (백엔드가 요청하면 전송됨)
-        store_verification_result(is_success, verification_message)
+        store_verification_result(session, is_success, verification_message)
 
         # 결과 로깅
         if is_success:
-            print(f"[성공] 액션 목적 달성: '{action_description}'")
+            logger.info(f"[성공] 액션 목적 달성: '{action_description}'")
         else:
-            print(f"[실패] 액션 목적 미달성: '{action_description}'")
+            logger.warning(f"[실패] 액션 목적 미달성: '{action_description}'")
 
     except Exception as e:
-        print(f"[오류] 페이지 검증 실패: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"[오류] 페이지 검증 실패: {e}")
         # 검증 오류 시에도 결과 저장
-        store_verification_result(False, f"검증 중 오류 발생: {str(e)}")
+        store_verification_result(session, False, f"검증 중 오류 발생: {str(e)}")
 
-    print("=" * 60)
-    print("[검증 단계 종료]")
-    print("=" * 60)
+    logger.info("=" * 60)
+    logger.info("[검증 단계 종료]")
+    logger.info("=" * 60)
 
 
-async def execute_action_command():
+@tracing.traced("settle")
+async def wait_for_page_settle(page, timeout_ms, expected_title=None, legacy_sleep=0):
+    """
+    액션 실행 후 검증 전 대기
+    SETTLE_DETECTION이면 안정되는 즉시 반환 (timeout_ms는 상한), 아니면 기존 고정 대기
+    """
+    logger.info("[검증] 페이지 로딩 대기 중...")
+    if SETTLE_DETECTION:
+        result = await page_settle.wait_for_settle(page, timeout_ms, expected_title)
+        state = "안정" if result.settled else "상한 도달"
+        found = "" if not expected_title else (", 예상 제목 표시됨" if result.found else ", 예상 제목 없음")
+        logger.info(f"[검증] 페이지 {state} ({result.elapsed_ms:.0f}ms{found})")
+        return
+
+    try:
+        await page.wait_for_load_state("networkidle", timeout=3000)
+        logger.info("[검증] 페이지 로딩 완료")
+    except Exception as wait_e:
+        logger.warning(f"[검증] 페이지 로딩 대기 타임아웃 (계속 진행): {wait_e}")
+
+    # 추가 대기: 팝업이나 동적 콘텐츠 로딩 시간 확보
+    await asyncio.sleep(legacy_sleep)
+    logger.info(f"[검증] 추가 대기 완료 ({legacy_sleep}초)")
+
+
+async def execute_action_command(session):
     """
     백엔드에서 액션 명령을 가져와서 trajectory 타입이면 실행
 
@@ -656,32 +751,31 @@ async def execute_action_command():
     실제 AI 모델은 액션 생성에 시간이 더 걸릴 수 있음
     Mock: timeout=10초 / 실제 모델: timeout=30~60초 권장
     """
-    global ACTIVE_BROWSERS
-    print("[실행] 액션 명령 가져오기 시작...")
+    logger.info("[실행] 액션 명령 가져오기 시작...")
 
     try:
         # ============================================================
         # 모델 변경 시 수정: timeout 값
         # ============================================================
         # Mock: 10초 / 실제 모델: 30~60초 권장
-        response = requests.get(f"{BACKEND_URL}/action", timeout=10)
+        response = await backend_client.get_action(
+            student_id=session.student_id if session else None, timeout=10
+        )
 
         if response.status_code == 404:
-            print("[경고] state.json 파일이 없습니다.")
+            logger.warning("[경고] state.json 파일이 없습니다.")
             return
 
         if response.status_code != 200:
-            print(f"[오류] 액션 가져오기 실패: {response.status_code}")
+            logger.error(f"[오류] 액션 가져오기 실패: {response.status_code}")
             return
 
         action_data = response.json()
-        print(
-            f"[액션 수신] {json.dumps(action_data, ensure_ascii=False, indent=2)}"
-        )
+        service_log.payload(logger, "[액션 수신]", action_data)
 
         generated_action = action_data.get("generated_action")
         if not generated_action:
-            print("[경고] generated_action이 없습니다.")
+            logger.warning("[경고] generated_action이 없습니다.")
             return
 
         # trajectory 타입 액션이면 실행
@@ -691,8 +785,8 @@ async def execute_action_command():
             # ========== action이 None인 경우 처리 (모든 step 완료) ==========
             if action is None:
                 description = generated_action.get("description", "All steps completed")
-                print(f"[완료] {description}")
-                print("[정보] 더 이상 실행할 액션이 없습니다.")
+                logger.info(f"[완료] {description}")
+                logger.info("[정보] 더 이상 실행할 액션이 없습니다.")
                 # 이미 마지막 액션이 완료되었으므로 아무것도 하지 않음
                 return
             # ========== 처리 끝 ==========
@@ -705,27 +799,27 @@ async def execute_action_command():
 
                 # 마지막 액션 여부 확인: action 내부의 status 필드
                 if action.get("status") is None:
-                    print("status가 없습니다.")
+                    logger.info("status가 없습니다.")
                 
                 action_status = action.get("status")
                 is_last_action = (action_status == "FINISH")
 
-                print(f"[실행] 단일 액션 실행 (step {current_step}/{total_steps})")
+                logger.info(f"[실행] 단일 액션 실행 (step {current_step}/{total_steps})")
                 if is_last_action:
-                    print(f"[확인] 마지막 액션 감지 (status: FINISH)")
-                print(f"[설명] {description}")
+                    logger.info(f"[확인] 마지막 액션 감지 (status: FINISH)")
+                logger.info(f"[설명] {description}")
 
-                if not ACTIVE_BROWSERS:
-                    print("[경고] 열려있는 브라우저가 없습니다.")
-                    send_state({
+                if session is None:
+                    logger.warning("[경고] 열려있는 브라우저가 없습니다.")
+                    await send_state({
                         "action_success": False,
                         "needs_login": True,
                         "message": "브라우저가 닫혔습니다. 다시 로그인하세요."
                     })
                     return
 
-                browser_info = ACTIVE_BROWSERS[-1]
-                page = browser_info.get("page")
+                page = session.page
+                page_settle.track(page)  # 액션이 일으키는 요청부터 추적
                 executor = ActionExecutor(page, {})
 
                 try:
@@ -735,7 +829,7 @@ async def execute_action_command():
                     action_state = action.get("state")
 
                     if action_state == "grid" and action_name == "click":
-                        print(f"     [Grid 모드] click 액션을 click_grid로 변경")
+                        logger.info(f"     [Grid 모드] click 액션을 click_grid로 변경")
                         modified_action = {
                             "name": "click_grid",
                             "args": action_args
@@ -744,14 +838,14 @@ async def execute_action_command():
                     else:
                         await executor.run(action)
 
-                    print(f"[성공] 액션 실행 완료")
+                    logger.info(f"[성공] 액션 실행 완료")
 
                     # ========== 마지막 액션이면 검증 후 완료 상태 전송 ==========
                     if is_last_action:
-                        print(f"[완료] 모든 액션 실행 완료!")
-                        print("=" * 60)
-                        print("[검증 단계] One-Action-at-a-Time 마지막 액션 검증 시작")
-                        print("=" * 60)
+                        logger.info(f"[완료] 모든 액션 실행 완료!")
+                        logger.info("=" * 60)
+                        logger.info("[검증 단계] One-Action-at-a-Time 마지막 액션 검증 시작")
+                        logger.info("=" * 60)
 
                         # 예상 제목 추출 (description에서 추출 또는 액션에서 추출)
                         # action의 selector에서 제목 추출 시도
@@ -763,37 +857,33 @@ async def execute_action_command():
                             name_match = re.search(r"name=['\"]([^'\"]+)['\"]", selector)
                             if name_match:
                                 expected_title = name_match.group(1).strip()
-                                print(f"[검증] 액션 selector에서 예상 제목 추출: '{expected_title}'")
+                                logger.info(f"[검증] 액션 selector에서 예상 제목 추출: '{expected_title}'")
 
                             text_match = re.search(r"text=([^\]]+)", selector)
                             if text_match and not expected_title:
                                 expected_title = text_match.group(1).strip()
-                                print(f"[검증] 액션 selector에서 예상 제목 추출 (text): '{expected_title}'")
+                                logger.info(f"[검증] 액션 selector에서 예상 제목 추출 (text): '{expected_title}'")
 
                         if not expected_title:
                             expected_title = description
-                            print(f"[검증] description을 예상 제목으로 사용: '{expected_title}'")
+                            logger.info(f"[검증] description을 예상 제목으로 사용: '{expected_title}'")
 
                         # 🔧 페이지 로딩 완료 대기 (액션 실행 직후 로딩 시간 확보)
-                        print("[검증] 페이지 로딩 대기 중...")
-                        try:
-                            await page.wait_for_load_state("networkidle", timeout=3000)
-                            print("[검증] 페이지 로딩 완료")
-                        except Exception as wait_e:
-                            print(f"[검증] 페이지 로딩 대기 타임아웃 (계속 진행): {wait_e}")
-
-                        # 추가 대기: 팝업이나 동적 콘텐츠 로딩 시간 확보
-                        await asyncio.sleep(1.5)
-                        print("[검증] 추가 대기 완료 (1.5초)")
+                        # description은 화면 제목이 아닐 수 있으므로 selector에서 뽑은 제목만 기다림
+                        await wait_for_page_settle(
+                            page, ACTION_SETTLE_TIMEOUT_MS,
+                            expected_title if expected_title != description else None,
+                            legacy_sleep=1.5,
+                        )
 
                         # 실제 페이지 제목 확인
                         try:
-                            print("[검증] ---- scrape_current_page() 호출 시작 ----")
+                            logger.info("[검증] ---- scrape_current_page() 호출 시작 ----")
                             current_page_info = await scrape_current_page(page)
-                            print("[검증] ---- scrape_current_page() 호출 완료 ----")
+                            logger.info("[검증] ---- scrape_current_page() 호출 완료 ----")
 
                             actual_title = current_page_info.get("title", "")
-                            print(f"[검증] 실제 페이지/팝업 제목: '{actual_title}'")
+                            logger.info(f"[검증] 실제 페이지/팝업 제목: '{actual_title}'")
 
                             # 제목 비교
                             is_verified = False
@@ -803,108 +893,91 @@ async def execute_action_command():
                                 if expected_title in actual_title or actual_title in expected_title:
                                     is_verified = True
                                     verification_message = f"'{expected_title}' 페이지 로드 완료"
-                                    print("[검증] ✓ 제목 일치")
+                                    logger.info("[검증] ✓ 제목 일치")
                                 else:
                                     is_verified = False
                                     verification_message = f"'{expected_title}' 페이지 도달 실패 (현재: '{actual_title}')"
-                                    print("[검증] ✗ 제목 불일치")
+                                    logger.warning("[검증] ✗ 제목 불일치")
                             else:
                                 # 예상 제목이 없거나 실제 제목이 없으면 일단 성공으로 처리
                                 is_verified = True
                                 verification_message = "액션 실행 완료 (제목 비교 불가)"
-                                print("[검증] 예상/실제 제목 없음 - 액션 실행 성공으로 처리")
+                                logger.info("[검증] 예상/실제 제목 없음 - 액션 실행 성공으로 처리")
 
-                            print(f"[검증 결과] 성공: {is_verified}, 메시지: {verification_message}")
-                            print("=" * 60)
+                            logger.info(f"[검증 결과] 성공: {is_verified}, 메시지: {verification_message}")
+                            logger.info("=" * 60)
 
                             # 검증 결과를 저장 (백엔드가 요청하면 전송됨)
-                            store_verification_result(is_verified, verification_message)
+                            store_verification_result(session, is_verified, verification_message)
 
                         except Exception as verify_e:
-                            print(f"[오류] 페이지 검증 실패: {verify_e}")
-                            import traceback
-                            traceback.print_exc()
+                            logger.exception(f"[오류] 페이지 검증 실패: {verify_e}")
 
                             # 검증 오류 시에도 결과 저장
-                            store_verification_result(False, f"검증 오류: {str(verify_e)}")
+                            store_verification_result(session, False, f"검증 오류: {str(verify_e)}")
 
                 except Exception as e:
-                    print(f"[오류] 액션 실행 실패: {e}")
-                    import traceback
-                    traceback.print_exc()
+                    logger.exception(f"[오류] 액션 실행 실패: {e}")
 
                     # 액션 실행 실패 시에도 결과 저장
-                    store_verification_result(False, f"액션 실행 실패: {str(e)}")
+                    store_verification_result(session, False, f"액션 실행 실패: {str(e)}")
 
-                print(f"[완료] One-Action-at-a-Time 액션 처리 완료\n")
+                logger.info(f"[완료] One-Action-at-a-Time 액션 처리 완료")
                 return
 
             # 기존 방식: 전체 액션 리스트
             actions_file = generated_action.get("actions_file")
             original_description = generated_action.get("description", "")
 
-            print(f"[실행] Trajectory 액션 실행 (전체 리스트 모드)")
+            logger.info(f"[실행] Trajectory 액션 실행 (전체 리스트 모드)")
             if original_description:
-                print(f"[원본 목적] {original_description}")
+                logger.info(f"[원본 목적] {original_description}")
 
             # actions_file이 리스트인지 문자열(파일 경로)인지 확인
-            if isinstance(actions_file, list):
-                # JSON 리스트로 직접 전달된 경우 (Action 모델에서 생성)
-                print(f"[INFO] Action 모델에서 생성된 JSON 액션 리스트 감지 ({len(actions_file)}개 액션)")
-
-                # actions_file이 [{"action": {...}}, ...] 형태일 경우 unwrap
-                actions = []
-                for item in actions_file:
-                    if isinstance(item, dict) and "action" in item:
-                        actions.append(item["action"])
-                    else:
-                        actions.append(item)
-
-                verification = None
-                print(f"[INFO] {len(actions)}개 액션 준비 완료")
-
-            elif isinstance(actions_file, str):
-                # 파일 경로로 전달된 경우 (기존 방식)
-                print(f"[INFO] Trajectory 파일 경로 감지: {actions_file}")
-                trajectory_path = Path(__file__).parent / actions_file
-
-                if not trajectory_path.exists():
-                    print(
-                        f"[오류] Trajectory 파일을 찾을 수 없습니다: {trajectory_path}"
-                    )
-                    return
-
-                trajectory_data = json.loads(
-                    trajectory_path.read_text(encoding="utf-8")
-                )
+            try:
+                if isinstance(actions_file, list):
+                    # JSON 리스트로 직접 전달된 경우 (Action 모델에서 생성)
+                    # [{"action": {...}}, ...] / [{...}, ...] 모두 컴파일러가 정규화
+                    logger.info(f"[INFO] Action 모델에서 생성된 JSON 액션 리스트 감지 ({len(actions_file)}개 액션)")
+                    actions = compile_trajectory(actions_file, source="generated_action")
+
+                elif isinstance(actions_file, str):
+                    # 파일 경로로 전달된 경우 (기존 방식) - 파일이 바뀌지 않았으면 캐시 사용
+                    logger.info(f"[INFO] Trajectory 파일 경로 감지: {actions_file}")
+                    trajectory_path = Path(__file__).parent / actions_file
+
+                    if not trajectory_path.exists():
+                        logger.error(
+                            f"[오류] Trajectory 파일을 찾을 수 없습니다: {trajectory_path}"
+                        )
+                        return
 
-                # 새 형식/구 형식 모두 지원
-                if isinstance(trajectory_data, dict):
-                    actions = trajectory_data.get("actions", [])
-                    verification = trajectory_data.get("verification")
-                    print("[INFO] Trajectory 새 형식 감지 (검증 정보 포함)")
+                    actions = load_trajectory(trajectory_path)
+                    if actions.verification:
+                        logger.info("[INFO] Trajectory 새 형식 감지 (검증 정보 포함)")
                 else:
-                    actions = trajectory_data
-                    verification = None
-                    print("[INFO] Trajectory 구 형식 감지 (검증 정보 없음)")
-            else:
-                print(f"[오류] actions_file 형식이 잘못되었습니다: {type(actions_file)}")
+                    logger.error(f"[오류] actions_file 형식이 잘못되었습니다: {type(actions_file)}")
+                    return
+            except TrajectoryError as e:
+                logger.error(f"[오류] Trajectory 형식 오류: {e}")
                 return
 
+            verification = actions.verification
+            logger.info(f"[INFO] {len(actions)}개 액션 준비 완료")
+
             # 마지막 액션에서 실제 목적 추출 (더 정확함)
             extracted_title = extract_expected_page_title(actions)
             action_description = extracted_title if extracted_title else original_description
-            print(f"[실제 목적] {action_description}")
+            logger.info(f"[실제 목적] {action_description}")
 
-            if ACTIVE_BROWSERS:
-                print("[INFO] 이미 열려있는 브라우저에서 액션 실행")
-                browser_info = ACTIVE_BROWSERS[-1]
+            if session is not None:
+                logger.info("[INFO] 이미 열려있는 브라우저에서 액션 실행")
                 await execute_trajectory_in_browser(
-                    actions, action_description, browser_info, verification
+                    actions, action_description, session, verification
                 )
             else:
-                print("[경고] 열려있는 브라우저가 없습니다. 먼저 로그인하세요.")
-                send_state(
+                logger.warning("[경고] 열려있는 브라우저가 없습니다. 먼저 로그인하세요.")
+                await send_state(
                     {
                         "action_success": False,
                         "needs_login": True,
@@ -914,20 +987,45 @@ async def execute_action_command():
                 )
 
         else:
-            print(
+            logger.info(
                 f"[INFO] 액션 타입 '{generated_action.get('type')}'는 아직 구현되지 않았습니다."
             )
 
-        print("[완료] 액션 명령 처리 완료\n")
+        logger.info("[완료] 액션 명령 처리 완료")
 
     except Exception as e:
-        print(f"[실패] 액션 명령 처리 오류: {e}")
-        import traceback
+        logger.exception(f"[실패] 액션 명령 처리 오류: {e}")
 
-        traceback.print_exc()
+
+async def send_versioned_ui_state(state_data: dict, session):
+    """
+    ui_state를 버전 + JSON Patch로 전송
+    백엔드가 버전 불일치를 알리면 기준 버전을 버리고 전체 스냅샷으로 한 번 더 보낸다.
+    """
+    sync = session.ui_state_sync
+    ui_state = state_data.pop("ui_state")
+
+    fields = sync.build(ui_state)
+    if "ui_state_patch" in fields:
+        logger.info(f"[상태] 증분 전송 (v{fields['ui_state_base_version']} → v{fields['ui_state_version']}, "
+              f"변경 {len(fields['ui_state_patch'])}건)")
+    response = await send_state({**state_data, **fields}, session)
+
+    if sync.is_mismatch(response):
+        logger.warning("[상태] 백엔드 버전 불일치 → 전체 스냅샷 재전송")
+        sync.reset()
+        fields = sync.build(ui_state)
+        response = await send_state({**state_data, **fields}, session)
+
+    if response is not None and response.status_code == 200:
+        sync.ack(fields["ui_state_version"], ui_state)
+    else:
+        # 백엔드가 무엇을 받았는지 알 수 없으므로 다음에는 전체 스냅샷
+        sync.reset()
 
 
-def send_state(data: dict): #백엔드로 상태 전송
+@tracing.traced("send_state")
+async def send_state(data: dict, session=None): #백엔드로 상태 전송
     """
     ============================================================
     🔧 모델 변경 시 수정 필요 (3/3): UI 상태 전송 타임아웃
@@ -936,118 +1034,122 @@ def send_state(data: dict): #백엔드로 상태 전송
     Mock: timeout=10초 / 실제 모델: timeout=60~120초 권장
 
     특히 복잡한 UI 상태를 전송하면 모델이 처리하는데 1~2분 걸릴 수 있음
+
+    session이 주어지면 백엔드가 어느 학생의 상태인지 알 수 있도록 student_id를 채워 보낸다.
     """
+    if session is not None:
+        data.setdefault("student_id", session.student_id)
+
     try:
         # ============================================================
         # 🔧 모델 변경 시 수정: timeout 값
         # ============================================================
         # Mock: 10초 / 실제 모델: 60~120초 권장
-        response = requests.post(
-            f"{BACKEND_URL}/state",
-            json={"data": data},
-            headers={"Content-Type": "application/json"},
-            timeout=10,
-        )
+        response = await backend_client.post_state(data, timeout=10)
 
         if response.status_code == 200:
-            print("[전송 완료] 상태 전송 성공")
+            logger.info("[전송 완료] 상태 전송 성공")
         else:
-            print(f"[전송 실패] 상태 코드: {response.status_code}")
+            logger.warning(f"[전송 실패] 상태 코드: {response.status_code}")
+        return response
     except Exception as e:
-        print(f"[전송 오류] {e}")
+        logger.error(f"[전송 오류] {e}")
+        return None
 
 
-def store_verification_result(success: bool, message: str): #검증 결과 저장
+def store_verification_result(session, success: bool, message: str): #검증 결과 저장
     """
-    액션 실행 후 검증 결과를 전역 변수에 저장
+    액션 실행 후 검증 결과를 세션에 저장
     백엔드가 /verification 요청을 보내면 반환됨
     """
-    global VERIFICATION_RESULT
-    VERIFICATION_RESULT["success"] = success
-    VERIFICATION_RESULT["message"] = message
-    VERIFICATION_RESULT["has_result"] = True
-    print(f"[검증 저장] 성공={success}, 메시지={message}")
+    session.store_verification(success, message)
+    logger.info(f"[검증 저장] 학번={session.student_id}, 성공={success}, 메시지={message}")
 
 
-async def cleanup_browsers(): #모든 브라우저 인스턴스 종료 + 상태 초기화
-    global ACTIVE_BROWSERS, LOGIN_STATUS
+async def send_verification_result(session): #검증 결과 전송
+    if session is None or not session.verification_result["has_result"]:
+        logger.warning("[경고] 검증 결과가 없습니다.")
+        return
 
-    print(f"[정리] 브라우저 종료 시작 (총 {len(ACTIVE_BROWSERS)}개)")
+    result = session.verification_result
+    try:
+        response = await backend_client.post_verification(
+            result["success"],
+            result["message"],
+            student_id=session.student_id,
+            timeout=5,
+        )
+        if response.status_code == 200:
+            logger.info(f"[검증 전송 완료] 성공={result['success']}, 메시지={result['message']}")
+            # 전송 후 초기화
+            session.clear_verification()
+        else:
+            logger.warning(f"[검증 전송 실패] 상태 코드: {response.status_code}")
+    except Exception as e:
+        logger.error(f"[검증 전송 오류] {e}")
 
-    if not ACTIVE_BROWSERS:
-        print("[정리] 종료할 브라우저가 없습니다")
-        try:
-            await playwright_client.close_all()
-        except asyncio.CancelledError:
-            print("[정리] 브라우저 정리 중 취소됨 (정상)")
-        except Exception as e:
-            print(f"[정리] 브라우저 정리 오류: {e}")
-    else:
-        for idx, browser_info in enumerate(ACTIVE_BROWSERS):
-            try:
-                browser = browser_info.get("browser")
-                context = browser_info.get("context")
-                page = browser_info.get("page")
 
-                print(f"[정리] 브라우저 #{idx+1} 종료 시작...")
+async def _close_session_browser(session, idx): #세션의 page/context를 컨텍스트 풀로 반납
+    try:
+        logger.info(f"[정리] 브라우저 #{idx+1} 종료 시작... (학번: {session.student_id})")
 
-                if page:
-                    try:
-                        await page.close()
-                        print(f"[정리] 페이지 #{idx+1} 종료 완료")
-                    except asyncio.CancelledError:
-                        print(
-                            f"[정리] 페이지 #{idx+1} 종료 중 취소됨 (정상)"
-                        )
-                    except Exception as e:
-                        print(
-                            f"[정리] 페이지 #{idx+1} 종료 실패: {e}"
-                        )
+        if session.context:
+            await playwright_client.release_context(session.context, session.page)
+            logger.info(f"[정리] 컨텍스트 #{idx+1} 반납 완료")
 
-                if context:
-                    try:
-                        await context.close()
-                        print(f"[정리] 컨텍스트 #{idx+1} 종료 완료")
-                    except asyncio.CancelledError:
-                        print(
-                            f"[정리] 컨텍스트 #{idx+1} 종료 중 취소됨 (정상)"
-                        )
-                    except Exception as e:
-                        print(
-                            f"[정리] 컨텍스트 #{idx+1} 종료 실패: {e}"
-                        )
+        # browser 자체는 싱글톤 핸들에서 닫으므로 여기선 패스
+    except asyncio.CancelledError:
+        logger.info(
+            f"[정리] 브라우저 #{idx+1} 정리 중 취소됨 (정상)"
+        )
+    except Exception as e:
+        logger.error(f"[정리] 브라우저 #{idx+1} 정리 오류: {e}")
+    finally:
+        session.attach(None, None, None)
+        session.login_status["logged_in"] = False
+        session.login_status["last_url"] = None
 
-                # browser 자체는 싱글톤 핸들에서 닫으므로 여기선 패스
-            except asyncio.CancelledError:
-                print(
-                    f"[정리] 브라우저 #{idx+1} 정리 중 취소됨 (정상)"
-                )
-            except Exception as e:
-                print(f"[정리] 브라우저 #{idx+1} 정리 오류: {e}")
 
-        ACTIVE_BROWSERS.clear()
-        print("[정리] ACTIVE_BROWSERS 리스트 클리어 완료")
+async def cleanup_browsers(session=None, shutdown=False): #세션 브라우저 종료 + 상태 초기화 (session=None이면 전체)
+    targets = [session] if session is not None else list(SESSIONS)
+
+    logger.info(f"[정리] 브라우저 종료 시작 (총 {len(targets)}개)")
+
+    if not targets:
+        logger.info("[정리] 종료할 브라우저가 없습니다")
+
+    for idx, target in enumerate(targets):
+        await _close_session_browser(target, idx)
+        SESSIONS.remove(target)
+
+    logger.info(f"[정리] 세션 정리 완료 (남은 세션: {len(SESSIONS)}개)")
 
+    # 다른 학생의 세션이나 진행 중인 로그인이 컨텍스트를 빌려 쓰고 있으면 공용 브라우저는 유지
+    # (진행 중인 로그인은 아직 SESSIONS에 없으므로 playwright_client의 대여 상태로 판단)
+    # 아무도 안 쓰면 수명 설정에 따라 종료 (resident 모드는 브라우저를 띄워둔 채 유휴 타이머에 맡김)
+    # shutdown 명령은 모드와 관계없이 드라이버/브라우저까지 종료
+    if shutdown or not playwright_client.in_use():
         try:
-            await playwright_client.close_all()
-            print("[정리] 모든 브라우저 정리 완료")
+            if shutdown:
+                await playwright_client.close_all()
+                logger.info("[정리] 모든 브라우저 정리 완료")
+            else:
+                await playwright_client.on_sessions_closed()
         except asyncio.CancelledError:
-            print("[정리] Playwright 정리 중 취소됨 (정상)")
+            logger.info("[정리] Playwright 정리 중 취소됨 (정상)")
         except Exception as e:
-            print(f"[정리] Playwright 정리 오류: {e}")
+            logger.error(f"[정리] Playwright 정리 오류: {e}")
+
 
-    # LOGIN_STATUS 초기화
-    LOGIN_STATUS["logged_in"] = False
-    LOGIN_STATUS["student_id"] = None
-    LOGIN_STATUS["last_url"] = None
-    print("[정리] LOGIN_STATUS 초기화 완료")
+async def run_service(): #폴링 서비스 실행 + 종료 시 HTTP 세션 정리
+    try:
+        await poll_commands()
+    finally:
+        await backend_client.close()
 
 
 if __name__ == "__main__":
     try:
-        asyncio.run(poll_commands())
+        asyncio.run(run_service())
     except Exception as e:
-        print("\n\n[오류] 예상치 못한 오류:", e)
-        import traceback
-
-        traceback.print_exc()
+        logger.exception(f"[오류] 예상치 못한 오류: {e}")
@@ -1,9 +1,45 @@
 import json
 import re
 from pathlib import Path
-from playwright_client import get_browser
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from playwright_client import get_browser, acquire_context, release_context
+import dialog_watcher
+import grid_index
+import tracing
+import service_log
+from trajectory_compiler import compile_trajectory
 import asyncio
 
+logger = service_log.get_logger("executor")
+
+# 팝업 감시자(MutationObserver)가 '확인' 팝업이 없다고 알려주면 액션 전 팝업 확인 생략
+DIALOG_WATCHER = True
+
+
+# 입력칸 여러 개 채우기. 채우지 못한 칸의 인덱스 목록 반환
+_FILL_BATCH_JS = """
+fields => {
+    const missing = [];
+    fields.forEach(({ selector, text }, i) => {
+        let el = null;
+        try { el = document.querySelector(selector); } catch (e) {}
+        const editable = el && el.getClientRects().length
+            && (el instanceof HTMLInputElement || el instanceof HTMLTextAreaElement)
+            && !el.disabled && !el.readOnly;
+        if (!editable) { missing.push(i); return; }
+
+        // 프레임워크가 value 프로퍼티를 가로채도 동작하도록 프로토타입의 setter 사용
+        const proto = el instanceof HTMLInputElement ? HTMLInputElement.prototype : HTMLTextAreaElement.prototype;
+        const setter = Object.getOwnPropertyDescriptor(proto, 'value').set;
+        el.focus();
+        setter.call(el, text);
+        el.dispatchEvent(new Event('input', { bubbles: true }));
+        el.dispatchEvent(new Event('change', { bubbles: true }));
+    });
+    return missing;
+}
+"""
+
 
 class ActionExecutor:
     def __init__(self, page, context):
@@ -23,6 +59,28 @@ class ActionExecutor:
             text = text.replace("${" + k + "}", v)
         await self.page.locator(args["selector"]).fill(text)
 
+    async def fill_batch(self, args):
+        """
+        서로 다른 입력칸 여러 개를 한 번의 evaluate로 채움 (trajectory_planner가 만든 가상 액션)
+        네이티브 value setter + input/change 이벤트로 fill과 같은 효과를 낸다.
+        찾지 못했거나 입력할 수 없는 칸은 기존 type(locator.fill, 자동 대기)으로 하나씩 채움
+        """
+        fields = []
+        for field in args["fields"]:
+            text = field["text"]
+            for k, v in self.ctx.items():
+                text = text.replace("${" + k + "}", v)
+            fields.append({"selector": field["selector"], "text": text})
+
+        try:
+            missing = await self.page.evaluate(_FILL_BATCH_JS, fields)
+        except Exception as e:
+            logger.warning(f"[WARN] 일괄 입력 실패 → 하나씩 입력: {e}")
+            missing = list(range(len(fields)))
+
+        for i in missing:
+            await self.page.locator(fields[i]["selector"]).fill(fields[i]["text"])
+
     async def select(self, args):
         if args.get("by") == "label":
             await self.page.locator(args["selector"]).select_option(label=args["option"])
@@ -54,7 +112,7 @@ class ActionExecutor:
 
     async def download_confirm(self, args):
         # 다운로드 확인용 액션 (실제 저장 경로 검사는 필요 시 구현)
-        print(f"[INFO] 다운로드 확인 (폴더: {args.get('dir', '')})")
+        logger.info(f"[INFO] 다운로드 확인 (폴더: {args.get('dir', '')})")
 
     async def sleep(self, args):
         ms = args.get("timeout_ms", 1000)
@@ -62,7 +120,7 @@ class ActionExecutor:
 
     async def log(self, args):
         # log 액션 처리
-        print(f"[LOG] {args.get('message', '')}")
+        logger.info(f"[LOG] {args.get('message', '')}")
 
     async def click_grid(self, args):
         """
@@ -85,7 +143,26 @@ class ActionExecutor:
             else:
                 raise ValueError(f"[Grid 오류] target_text가 없고 selector에서도 추출 불가: {selector}")
 
-        print(f"[Grid] 텍스트 '{target_text}'를 포함한 셀 찾기...")
+        logger.info(f"[Grid] 텍스트 '{target_text}'를 포함한 셀 찾기...")
+
+        # 신청 버튼이 있는 열 번호 (2열이라고 가정)
+        apply_col_index = "2"
+
+        # 0. 빠른 경로: 페이지 안 그리드 인덱스 (그리드가 다시 그려지기 전까지 재사용)
+        if grid_index.GRID_INDEX_ENABLED:
+            hit = await grid_index.locate_row_button(self.page, target_text, apply_col_index)
+            if hit:
+                state = "재구성" if hit["rebuilt"] else "재사용"
+                logger.info(f"[Grid] 인덱스({state}, 세대 {hit['generation']})에서 발견: {hit['label']}")
+                logger.info(f"[Grid] {hit['row']}행 {apply_col_index}열의 신청 버튼 클릭...")
+                try:
+                    await self.page.locator(hit["selector"]).click(timeout=grid_index.CLICK_TIMEOUT_MS)
+                    logger.info(f"[Grid] 신청 버튼 클릭 완료!")
+                    return
+                except Exception as e:
+                    logger.warning(f"[Grid] 인덱스 버튼 클릭 실패 → 접근성 이름 검색: {e}")
+            else:
+                logger.info("[Grid] 인덱스에서 찾지 못함 → 접근성 이름 검색")
 
         # 1. 텍스트를 가진 gridcell 찾기 (aria-label 안에 텍스트 포함)
         text_cell = self.page.get_by_role(
@@ -98,7 +175,7 @@ class ActionExecutor:
         if not aria_label:
             raise RuntimeError(f"[Grid 오류] aria-label을 읽을 수 없음")
 
-        print(f"[Grid] 발견된 셀의 aria-label: {aria_label}")
+        logger.info(f"[Grid] 발견된 셀의 aria-label: {aria_label}")
 
         # 2. "1행 3열 ..." 에서 행/열 번호 파싱
         m = re.search(r"(\d+)행\s+(\d+)열", aria_label)
@@ -106,10 +183,8 @@ class ActionExecutor:
             raise RuntimeError(f"[Grid 오류] 행/열 정보를 파싱할 수 없음: {aria_label}")
 
         row_index = m.group(1)
-        # 신청 버튼이 있는 열 번호 (2열이라고 가정)
-        apply_col_index = "2"
 
-        print(f"[Grid] 파싱된 위치: {row_index}행, 신청 버튼은 {apply_col_index}열에 위치")
+        logger.info(f"[Grid] 파싱된 위치: {row_index}행, 신청 버튼은 {apply_col_index}열에 위치")
 
         # 3. 같은 행(row_index), 신청 버튼 셀의 aria-label 패턴 만들기
         apply_button = self.page.get_by_role(
@@ -118,37 +193,47 @@ class ActionExecutor:
         ).first
 
         # 4. 클릭
-        print(f"[Grid] {row_index}행 {apply_col_index}열의 신청 버튼 클릭...")
+        logger.info(f"[Grid] {row_index}행 {apply_col_index}열의 신청 버튼 클릭...")
         await apply_button.click()
-        print(f"[Grid] 신청 버튼 클릭 완료!")
+        logger.info(f"[Grid] 신청 버튼 클릭 완료!")
 
     async def run(self, act):
+        name = act["name"]
+        with tracing.span("action", name=name):
+            await self._dismiss_confirm_popup()
+
+            method = getattr(self, name, None)
+            if method:
+                await method(act["args"])
+            else:
+                logger.warning(f"[WARN] 알 수 없는 액션: {name}")
+
+    async def _dismiss_confirm_popup(self):
         # ========== 팝업 자동 처리 추가 (2025-11-19) ==========
         # nDRIMS "실행 중인 새창이 있습니다" 팝업 자동 처리
-        try:
-            confirm_btn = self.page.locator("role=button[name='확인']").first
-            if await confirm_btn.is_visible(timeout=500):
-                await confirm_btn.click()
-                print("[팝업 자동 처리] '확인' 버튼 클릭 (실행 중인 새창 팝업)")
-                # 팝업 닫힌 후 잠깐 대기
-                await self.page.wait_for_timeout(300)
-        except:
-            pass  # 팝업 없으면 무시
+        # 감시자가 팝업 없음(False)을 확인했으면 건너뜀 (모르면 기존처럼 확인)
+        watcher = await dialog_watcher.watch(self.page) if DIALOG_WATCHER else None
+        if watcher is not None and watcher.present is False:
+            return
+        with tracing.span("action.popup_check"):
+            try:
+                confirm_btn = self.page.locator("role=button[name='확인']").first
+                if await confirm_btn.is_visible(timeout=500):
+                    await confirm_btn.click()
+                    logger.info("[팝업 자동 처리] '확인' 버튼 클릭 (실행 중인 새창 팝업)")
+                    # 팝업 닫힌 후 잠깐 대기
+                    await self.page.wait_for_timeout(300)
+            except:
+                pass  # 팝업 없으면 무시
         # ========== 팝업 처리 끝 ==========
 
-        name = act["name"]
-        method = getattr(self, name, None)
-        if method:
-            await method(act["args"])
-        else:
-            print(f"[WARN] 알 수 없는 액션: {name}")
-
 
 async def run_trajectory(actions, context, keep_browser_open=True):
     """
     - record_1.json 처럼 'step' 안에 'state'와 'actions'가 있는 비평탄화 입력도 처리
     - flatten_steps_to_actions() 결과처럼 각 항목이 {'action': {...}}만 있는 평탄화 입력도 처리
     - 각 step/action 실행 전에 'ui_state'가 있으면 로컬 검사 함수로 상태 확인 (log 출력)
+    - actions 대신 trajectory_compiler.CompiledTrajectory를 넘기면 형식 판별/검증을 생략
     - 'wait_for' + event=download 직후 다음 액션을 다운로드 트리거로 감싸서 expect_download 처리
     - '학적부열람' 텍스트가 role=tabpanel 내부 헤더 영역에서만 감지되면 성공 로그 출력
 
@@ -158,13 +243,26 @@ async def run_trajectory(actions, context, keep_browser_open=True):
         - keep_browser_open=False : 컨텍스트는 종료하고 page=None, ctx=None 반환
     """
 
-    # === Playwright 실행 (비동기 싱글톤) ===
+    # 파일에서 읽은 trajectory는 호출 측에서 load_trajectory로 컴파일해서 넘김 (캐시)
+    trajectory = compile_trajectory(actions)
+
+    # === Playwright 실행 (비동기 싱글톤 + 컨텍스트 풀) ===
     browser = await get_browser()
-    ctx = await browser.new_context(accept_downloads=True)
-    page = await ctx.new_page()
+    ctx, page = await acquire_context()
+    try:
+        return await _run_trajectory_on_page(
+            trajectory, context, keep_browser_open, page, browser, ctx
+        )
+    except BaseException:
+        # 실행 중 예외 → 같은 브라우저의 다른 세션에 영향 없도록 이 컨텍스트만 반납
+        await release_context(ctx, page)
+        raise
+
+
+async def _run_trajectory_on_page(trajectory, context, keep_browser_open, page, browser, ctx):
     executor = ActionExecutor(page, context)
 
-    print("\n[INFO] === Trajectory 실행 시작 ===")
+    logger.info("[INFO] === Trajectory 실행 시작 ===")
 
     pending_download = False
     auto_probe_logged = False  # 현재 오토 프로브 로직은 주석 처리 상태
@@ -174,7 +272,7 @@ async def run_trajectory(actions, context, keep_browser_open=True):
         try:
             locator = page.locator("role=tabpanel >> div.h3 >> text=학적부열람")
             if await locator.is_visible():
-                print("[OK] 본문 헤더 감지 (role=tabpanel 내부 div.h3)")
+                logger.info("[OK] 본문 헤더 감지 (role=tabpanel 내부 div.h3)")
                 return True
         except Exception:
             pass
@@ -185,7 +283,7 @@ async def run_trajectory(actions, context, keep_browser_open=True):
                 has_text="학적부열람",
             )
             if await locator.is_visible():
-                print("[OK] 본문 헤더 감지 (cl-output.h3 구조)")
+                logger.info("[OK] 본문 헤더 감지 (cl-output.h3 구조)")
                 return True
         except Exception:
             pass
@@ -196,7 +294,7 @@ async def run_trajectory(actions, context, keep_browser_open=True):
                 state="visible",
                 timeout=timeout_ms,
             )
-            print("[OK] 학적부열람 텍스트 대기 후 감지 완료")
+            logger.info("[OK] 학적부열람 텍스트 대기 후 감지 완료")
             return True
         except Exception:
             return False
@@ -231,7 +329,7 @@ async def run_trajectory(actions, context, keep_browser_open=True):
                     "role=tab[aria-label*='학적부열람']"
                 ).count()
                 if count > 0:
-                    print("학적부열람 탭 감지됨")
+                    logger.info("학적부열람 탭 감지됨")
                     return True
                 return False
 
@@ -247,7 +345,7 @@ async def run_trajectory(actions, context, keep_browser_open=True):
             else:
                 return False
         except Exception as e:
-            print(f"[WARN] check_ui_state 오류: {e}")
+            logger.warning(f"[WARN] check_ui_state 오류: {e}")
             return False
 
     # === 단일 액션 실행 ===
@@ -261,7 +359,7 @@ async def run_trajectory(actions, context, keep_browser_open=True):
             if sub_idx is None
             else f"[STEP {step_idx}.{sub_idx}]"
         )
-        print(f"{idx_tag} {name}")
+        logger.info(f"{idx_tag} {name}")
 
         # 직전 액션이 wait_for(download)였으면, 이번 액션을 다운로드 트리거로 처리
         if pending_download:
@@ -270,11 +368,11 @@ async def run_trajectory(actions, context, keep_browser_open=True):
                     await executor.run(act)
                 download = await dl_info.value
                 try:
-                    print(
+                    logger.info(
                         f"[SUCCESS] 다운로드 완료: {download.suggested_filename}"
                     )
                 except Exception:
-                    print("[SUCCESS] 다운로드 완료")
+                    logger.info("[SUCCESS] 다운로드 완료")
             finally:
                 pending_download = False
             return
@@ -282,7 +380,7 @@ async def run_trajectory(actions, context, keep_browser_open=True):
         # 다운로드 대기 설정
         if name == "wait_for" and args.get("event") == "download":
             pending_download = True
-            print(f"{idx_tag} (다음 액션을 다운로드 트리거로 대기)")
+            logger.info(f"{idx_tag} (다음 액션을 다운로드 트리거로 대기)")
             return
 
         # 기본 액션 실행
@@ -297,96 +395,97 @@ async def run_trajectory(actions, context, keep_browser_open=True):
         #     except Exception:
         #         pass
 
-    # === 입력 형식 판별 (평탄/비평탄) ===
-    is_flat = all(
-        (isinstance(item, dict) and "action" in item and isinstance(item["action"], dict))
-        for item in actions
-    )
-
-    # 평탄 구조: 각 요소가 {"action": {...}, "state": ...} 형태
-    if is_flat:
-        for i, step in enumerate(actions, start=1):
-            ui_state = (
-                (step.get("state") or {}).get("ui_state")
-                if isinstance(step, dict)
-                else None
-            )
-            if ui_state:
-                for label, expected in ui_state.items():
-                    current = await _check_ui_state_local(label)
-                    print(
-                        f"[DEBUG] ({i}) UI상태 {label} → {current} (기대={expected})"
-                    )
-                    if current != expected:
-                        print(
-                            f"[WARN] ({i}) UI 상태 불일치: {label}"
-                        )
-            act = step["action"]
-            await _run_one_action(act, i)
-
-    # 비평탄 구조: 각 step 안에 state/actions 포함
-    else:
-        for i, step in enumerate(actions, start=1):
-            if not isinstance(step, dict):
-                continue
-
-            sid = step.get("step_id", i)
-            print(f"[LOG] [STEP] {sid}")
-
-            ui_state = (step.get("state") or {}).get("ui_state")
-            if ui_state:
-                for label, expected in ui_state.items():
-                    current = await _check_ui_state_local(label)
-                    print(
-                        f"[DEBUG] (step {sid}) UI상태 {label} → {current} (기대={expected})"
+    # === 컴파일된 step 순서대로 실행 (연속 입력은 fill_batch로 묶여 있음) ===
+    for indices, act in trajectory.plan:
+        step = trajectory.steps[indices[0]]
+        tag = step.step_no if step.sub_no is None else f"step {step.step_id}"
+
+        if step.starts_step:
+            logger.info(f"[LOG] [STEP] {step.step_id}")
+
+        if step.ui_state:
+            for label, expected in step.ui_state.items():
+                current = await _check_ui_state_local(label)
+                logger.debug(
+                    f"[DEBUG] ({tag}) UI상태 {label} → {current} (기대={expected})"
+                )
+                if current != expected:
+                    logger.warning(
+                        f"[WARN] ({tag}) UI 상태 불일치: {label}"
                     )
-                    if current != expected:
-                        print(
-                            f"[WARN] (step {sid}) UI 상태 불일치: {label}"
-                        )
-
-            for j, a in enumerate(step.get("actions", []), start=1):
-                if isinstance(a, dict) and "action" in a:
-                    await _run_one_action(a["action"], i, j)
-                elif (
-                    isinstance(a, dict)
-                    and "name" in a
-                    and "args" in a
-                ):
-                    await _run_one_action(a, i, j)
+
+        await _run_one_action(act, step.step_no, step.sub_no)
 
     if pending_download:
-        print(
+        logger.warning(
             "[WARN] 마지막에 'wait_for download'가 있었지만 트리거 액션이 실행되지 않았습니다."
         )
 
-    print("\n[INFO] === Trajectory 실행 완료 ===")
+    logger.info("[INFO] === Trajectory 실행 완료 ===")
 
     # === 로그인 성공 여부 확인 (URL 기반) ===
     current_url = page.url
-    print(f"[DEBUG] 최종 URL: {current_url}")
+    logger.debug(f"[DEBUG] 최종 URL: {current_url}")
 
     login_success = "main/main.clx" in current_url
 
     if login_success:
-        print("[OK] 로그인 성공 (메인 페이지 URL 확인)")
+        logger.info("[OK] 로그인 성공 (메인 페이지 URL 확인)")
     else:
-        print("[FAIL] 로그인 실패 (메인 페이지로 이동하지 않음)")
+        logger.warning("[FAIL] 로그인 실패 (메인 페이지로 이동하지 않음)")
 
     # keep_browser_open 옵션 처리
     if keep_browser_open and login_success:
         # 로그인 성공 + 세션 유지: 호출 측에서 page/browser/ctx 관리
         return login_success, page, browser, ctx
 
-    # 그 외에는 컨텍스트만 정리하고 최소 정보만 반환
-    try:
-        await ctx.close()
-    except Exception:
-        pass
+    # 그 외에는 컨텍스트를 풀로 반납하고 최소 정보만 반환
+    await release_context(ctx, page)
 
     return login_success, None, browser, None
 
 
+async def resume_session(storage_state, probe_url, timeout_ms=3000):
+    """
+    저장된 storage_state(쿠키)로 로그인 세션 복원
+    - 풀에서 컨텍스트를 빌려 쿠키만 넣고 probe_url을 한 번 열어봄
+    - 메인 페이지(main/main.clx)에 머물고 사이드바 메뉴(.cl-tree-item)가 그려지면 성공
+      (main.clx 자체는 만료된 쿠키로도 열리므로 URL만으로는 판단하지 않음.
+       메뉴는 로그인 세션으로만 받아올 수 있음)
+
+    Returns:
+        (login_success: bool, page, browser, ctx) — 실패 시 컨텍스트는 풀로 반납하고 page/ctx는 None
+    """
+    browser = await get_browser()
+    ctx, page = await acquire_context()
+    try:
+        cookies = storage_state.get("cookies") or []
+        if cookies:
+            await ctx.add_cookies(cookies)
+
+        logger.info(f"[INFO] 저장된 세션으로 접속 확인: {probe_url}")
+        await page.goto(probe_url, wait_until="domcontentloaded", timeout=timeout_ms)
+        try:
+            await page.wait_for_selector(".cl-tree-item", state="attached", timeout=timeout_ms)
+            has_menu = True
+        except PlaywrightTimeoutError:
+            has_menu = False
+
+        if has_menu and "main/main.clx" in page.url:
+            logger.info("[OK] 저장된 세션으로 로그인 확인 (사이드바 메뉴 로드)")
+            return True, page, browser, ctx
+
+        logger.info(f"[INFO] 저장된 세션 만료 (현재 URL: {page.url}, 사이드바 메뉴: {'있음' if has_menu else '없음'})")
+    except asyncio.CancelledError:
+        await release_context(ctx, page)
+        raise
+    except Exception as e:
+        logger.warning(f"[WARN] 저장된 세션 확인 실패: {e}")
+
+    await release_context(ctx, page)
+    return False, None, browser, None
+
+
 if __name__ == "__main__":
     # 예시 trajectory.json 로드 (로컬 테스트용)
     actions = json.loads(
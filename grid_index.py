@@ -0,0 +1,123 @@
+"""
+click_grid 빠른 경로: 페이지 안 그리드 인덱스
+
+접근성 트리 이름 검색(get_by_role + 정규식) 두 번 대신,
+페이지 안에서 한 번 훑어서 "N행 M열" aria-label을 가진 셀/버튼을 인덱싱한다.
+- 셀 텍스트 → (행, 열), (행, 열) → 버튼 요소
+- 인덱스는 window에 보관하고, 그리드 DOM이 다시 그려지거나(childList 변경) 셀 aria-label이 바뀌면
+  새로 만든다 (generation 증가). 가상 스크롤 그리드가 행 요소를 재사용하면서 aria-label만 바꾸는 경우 대비
+- 클릭 직전에도 실제 셀/버튼의 aria-label이 인덱스와 같은지 다시 확인 (다르면 재구성)
+- 보이는 그리드의 셀/버튼만 대상 (nDRIMS는 이전 탭을 숨긴 채 DOM에 남겨 둠. get_by_role처럼 숨은 요소 제외)
+  탭 전환은 그리드 조상의 style/class 변경이라 관찰 대상이 아니므로 보이는지는 조회할 때마다 확인
+- 클릭할 버튼 하나에만 data-ndrims-grid="세대:그리드:행:열" 속성을 달아 Playwright locator로 실제 클릭
+  (이전 조회에서 단 속성은 먼저 지움 → selector가 항상 요소 1개만 가리킴)
+못 찾으면 None → 호출 측은 기존 접근성 이름 검색으로 처리
+"""
+
+from playwright.async_api import Page
+
+import service_log
+
+logger = service_log.get_logger("grid_index")
+
+GRID_INDEX_ENABLED = True
+CLICK_TIMEOUT_MS = 3000  # 빠른 경로 클릭 제한 시간. 넘으면 호출 측이 기존 검색으로 다시 시도
+TAG_ATTR = "data-ndrims-grid"
+
+_LOCATE_JS = """
+({ text, col, attr }) => {
+    const POS = /(\\d+)행\\s+(\\d+)열/;
+    const nameOf = el => (el.getAttribute('aria-label') || '').trim();
+    const visible = el => {
+        const rect = el.getBoundingClientRect();
+        return rect.width > 0 && rect.height > 0 && getComputedStyle(el).visibility !== 'hidden';
+    };
+
+    const build = () => {
+        const old = window.__ndrimsGridIndex;
+        if (old && old.observer) old.observer.disconnect();
+
+        const roots = Array.from(document.querySelectorAll('[role="grid"]'));
+        const scope = roots.length ? roots : [document.body];
+        const cells = [];
+        const buttons = new Map();   // "grid번호:행:열" → 버튼
+        const anyButtons = new Map(); // "행:열" → 첫 버튼 (그리드 구분 없이)
+
+        scope.forEach((root, g) => {
+            root.querySelectorAll('[role="gridcell"][aria-label], [role="button"][aria-label]').forEach(el => {
+                const label = nameOf(el);
+                const m = POS.exec(label);
+                if (!m) return;
+                const row = m[1], c = m[2];
+                if (el.getAttribute('role') === 'gridcell') {
+                    cells.push({ el, label, row, col: c, grid: g });
+                } else {
+                    const key = g + ':' + row + ':' + c;
+                    if (!buttons.has(key)) buttons.set(key, el);
+                    if (!anyButtons.has(row + ':' + c)) anyButtons.set(row + ':' + c, el);
+                }
+            });
+        });
+
+        const index = {
+            generation: (old ? old.generation : 0) + 1,
+            roots: scope, cells, buttons, anyButtons, dirty: false,
+        };
+        // 그리드 행이 다시 그려지거나 aria-label이 바뀌면 다음 조회 때 재구성 (data-ndrims-grid 등 다른 속성은 무시)
+        index.observer = new MutationObserver(() => { index.dirty = true; });
+        scope.forEach(root => index.observer.observe(root, {
+            subtree: true, childList: true, characterData: true,
+            attributes: true, attributeFilter: ['aria-label'],
+        }));
+        window.__ndrimsGridIndex = index;
+        return index;
+    };
+
+    const stale = idx => !idx || idx.dirty || idx.roots.some(r => !r.isConnected)
+        || (idx.roots.length === 1 && idx.roots[0] === document.body && document.querySelector('[role="grid"]'));
+
+    const lookup = idx => {
+        const shown = new Map();  // 그리드 번호 → 보이는지 (조회 1번 안에서만 재사용)
+        const gridShown = g => {
+            if (!shown.has(g)) shown.set(g, visible(idx.roots[g]));
+            return shown.get(g);
+        };
+        for (const cell of idx.cells) {
+            if (!cell.label.includes(text) || !gridShown(cell.grid)) continue;
+            const button = idx.buttons.get(cell.grid + ':' + cell.row + ':' + col)
+                || idx.anyButtons.get(cell.row + ':' + col);
+            if (!button || !button.isConnected || !visible(button)) continue;
+            // 관찰자 콜백이 아직 안 돌았어도 재사용된 행을 누르지 않도록 실제 라벨 재확인
+            const pos = POS.exec(nameOf(button));
+            if (!cell.el.isConnected || nameOf(cell.el) !== cell.label
+                || !pos || pos[1] !== cell.row || pos[2] !== col) return null;
+            for (const el of document.querySelectorAll('[' + attr + ']')) el.removeAttribute(attr);
+            const tag = idx.generation + ':' + cell.grid + ':' + cell.row + ':' + col;
+            button.setAttribute(attr, tag);
+            return { label: cell.label, row: cell.row, col, generation: idx.generation, rebuilt: false,
+                     selector: '[' + attr + '="' + tag + '"]' };
+        }
+        return null;
+    };
+
+    let idx = window.__ndrimsGridIndex;
+    let rebuilt = false;
+    if (stale(idx)) { idx = build(); rebuilt = true; }
+    let hit = lookup(idx);
+    if (!hit && !rebuilt) { idx = build(); rebuilt = true; hit = lookup(idx); }
+    if (hit) hit.rebuilt = rebuilt;
+    return hit;
+}
+"""
+
+
+async def locate_row_button(page: Page, target_text, col):
+    """
+    target_text를 포함한 셀과 같은 행의 col열 버튼 찾기
+    → {"selector", "label", "row", "col", "generation", "rebuilt"} 또는 None
+    """
+    try:
+        return await page.evaluate(_LOCATE_JS, {"text": target_text, "col": str(col), "attr": TAG_ATTR})
+    except Exception as e:
+        logger.warning(f"[Grid] 인덱스 조회 실패 (기존 방식 사용): {e}")
+        return None
@@ -0,0 +1,171 @@
+"""
+페이지 안정화(settle) 감지
+
+액션 실행 후 고정 sleep 대신 아래 조건이 모두 만족되는 즉시 돌아온다.
+- 네트워크: 진행 중인 요청이 없는 상태가 network_quiet_ms 동안 유지
+- DOM: MutationObserver 기준 dom_quiet_ms 동안 변경 없음
+- (예상 제목이 주어지면) 보이는 팝업 헤더 / 활성 탭 / 탭패널 제목에 예상 제목이 나타남
+  → 안정된 뒤에도 expect_grace_ms 동안 나타나지 않으면 포기 (검증 단계에서 불일치로 처리)
+
+timeout_ms는 기존 대기 시간(networkidle + sleep)과 같은 상한으로만 쓰인다.
+"""
+
+import time
+import asyncio
+import weakref
+from dataclasses import dataclass
+
+from playwright.async_api import Page
+
+import service_log
+
+logger = service_log.get_logger("settle")
+
+DOM_QUIET_MS = 300
+NETWORK_QUIET_MS = 300
+EXPECT_GRACE_MS = 1500
+LONG_REQUEST_MS = 2000  # 이보다 오래 걸리는 요청(롱폴링 등)은 대기 대상에서 제외
+_IGNORED_RESOURCE_TYPES = {"websocket", "eventsource", "media"}
+
+_trackers = weakref.WeakKeyDictionary()  # page → NetworkTracker
+
+
+class NetworkTracker:
+    """page 요청 이벤트로 진행 중인 요청 수를 센다"""
+
+    def __init__(self, page: Page):
+        self._inflight = {}  # request → 시작 시각
+        self.last_activity = time.monotonic()
+        page.on("request", self._on_request)
+        page.on("requestfinished", self._on_done)
+        page.on("requestfailed", self._on_done)
+
+    def _on_request(self, request):
+        if request.resource_type in _IGNORED_RESOURCE_TYPES:
+            return
+        self._inflight[request] = time.monotonic()
+        self.last_activity = time.monotonic()
+
+    def _on_done(self, request):
+        if self._inflight.pop(request, None) is not None:
+            self.last_activity = time.monotonic()
+
+    def pending(self):
+        """대기해야 할 진행 중 요청 수 (LONG_REQUEST_MS 넘은 요청 제외)"""
+        now = time.monotonic()
+        return sum(1 for started in self._inflight.values() if (now - started) * 1000 < LONG_REQUEST_MS)
+
+    def quiet_for_ms(self):
+        if self.pending():
+            return 0
+        return (time.monotonic() - self.last_activity) * 1000
+
+
+def track(page: Page):
+    """page의 네트워크 추적 시작 (이미 추적 중이면 기존 것 반환)"""
+    tracker = _trackers.get(page)
+    if tracker is None:
+        tracker = _trackers[page] = NetworkTracker(page)
+    return tracker
+
+
+# DOM이 quietMs 동안 조용해지고(예상 제목이 있으면 그것도 보일 때) resolve
+_DOM_SETTLE_JS = """
+({ quietMs, graceMs, timeoutMs, expected }) => new Promise(resolve => {
+    const start = performance.now();
+    let last = start;
+    const observer = new MutationObserver(() => { last = performance.now(); });
+    observer.observe(document.documentElement, {
+        subtree: true, childList: true, attributes: true, characterData: true,
+    });
+
+    const visible = el => {
+        if (!el || !el.getClientRects().length) return false;
+        const style = getComputedStyle(el);
+        return style.visibility !== 'hidden' && style.display !== 'none';
+    };
+    const titles = () => {
+        const out = [];
+        document.querySelectorAll('.cl-dialog').forEach(d => {
+            if (!visible(d)) return;
+            const h = d.querySelector('.cl-dialog-header .cl-text');
+            if (h) out.push(h.innerText);
+        });
+        document.querySelectorAll('[role="tab"][aria-selected="true"]').forEach(t => out.push(t.innerText));
+        document.querySelectorAll('[role="tabpanel"]').forEach(p => {
+            if (!visible(p)) return;
+            const h = p.querySelector('h1, h2, h3, [role=heading]');
+            out.push(h ? h.innerText : (p.innerText || '').split('\\n')[0]);
+        });
+        return out.map(t => (t || '').trim()).filter(Boolean);
+    };
+    const found = () => !expected || titles().some(t => t.includes(expected) || expected.includes(t));
+
+    const tick = () => {
+        const now = performance.now();
+        const quiet = now - last;
+        const hit = quiet >= quietMs && found();
+        if (hit || quiet >= quietMs + graceMs || now - start >= timeoutMs) {
+            observer.disconnect();
+            resolve({ quiet: quiet >= quietMs, found: found(), elapsed: now - start });
+            return;
+        }
+        setTimeout(tick, 50);
+    };
+    setTimeout(tick, Math.min(quietMs, 50));
+})
+"""
+
+
+@dataclass
+class SettleResult:
+    settled: bool        # 네트워크 + DOM 모두 안정
+    found: bool          # 예상 제목이 보임 (예상 제목이 없으면 True)
+    elapsed_ms: float
+
+
+async def wait_for_settle(page: Page, timeout_ms, expected_text=None, *,
+                          dom_quiet_ms=DOM_QUIET_MS, network_quiet_ms=NETWORK_QUIET_MS,
+                          expect_grace_ms=EXPECT_GRACE_MS):
+    """페이지가 안정될 때까지 대기 (최대 timeout_ms). 예외를 던지지 않음"""
+    tracker = track(page)
+    start = time.monotonic()
+    expected_text = (expected_text or "").strip() or None
+    result = {"quiet": False, "found": expected_text is None}
+
+    while True:
+        remaining = timeout_ms - (time.monotonic() - start) * 1000
+        if remaining <= 0:
+            break
+
+        # 1) 네트워크 조용해질 때까지
+        if tracker.quiet_for_ms() < network_quiet_ms:
+            await asyncio.sleep(0.05)
+            continue
+
+        # 2) DOM 조용 + 예상 제목
+        try:
+            result = await page.evaluate(_DOM_SETTLE_JS, {
+                "quietMs": dom_quiet_ms,
+                "graceMs": expect_grace_ms if expected_text else 0,
+                "timeoutMs": remaining,
+                "expected": expected_text,
+            })
+        except Exception as e:
+            # 페이지 이동으로 실행 컨텍스트가 사라짐 → 새 문서 기준으로 다시
+            if page.is_closed():
+                break
+            logger.info(f"[안정화] DOM 확인 재시도: {e}")
+            try:
+                await page.wait_for_load_state("domcontentloaded", timeout=max(remaining, 1))
+            except Exception:
+                pass
+            continue
+
+        # DOM 대기 중에 새 요청이 시작됐으면 다시
+        if result.get("quiet") and tracker.quiet_for_ms() >= network_quiet_ms:
+            break
+
+    elapsed = (time.monotonic() - start) * 1000
+    settled = bool(result.get("quiet")) and tracker.quiet_for_ms() >= network_quiet_ms
+    return SettleResult(settled, bool(result.get("found")), elapsed)
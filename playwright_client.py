@@ -1,23 +1,64 @@
 """
-Playwright 비동기 싱글톤 인스턴스
+Playwright 비동기 싱글톤 인스턴스 + 미리 만들어 둔 BrowserContext 풀
 """
 
+import os
+import time
+import asyncio
+import contextlib
+
 from playwright.async_api import async_playwright
 
+import service_log
+
+logger = service_log.get_logger("playwright")
+
 _playwright_instance = None
 _browser = None
 
+# ============================================================
+# 컨텍스트 풀 설정
+# ============================================================
+# 로그인 시 new_context()/new_page()를 기다리지 않도록 미리 만들어 둔 컨텍스트를 빌려줌
+# 반납된 컨텍스트는 재사용하지 않고 닫은 뒤 새 컨텍스트로 보충 (이전 학생의 IndexedDB,
+# CacheStorage, 서비스 워커, 다른 origin 스토리지까지 남지 않도록)
+POOL_MIN_SIZE = int(os.getenv("CONTEXT_POOL_MIN", "1"))   # 항상 대기시켜 둘 컨텍스트 수
+POOL_WARM_URL = os.getenv("CONTEXT_POOL_WARM_URL", "about:blank")  # 대기 페이지가 미리 열어둘 URL
+
+# ============================================================
+# 브라우저 수명 설정
+# ============================================================
+# resident    : 로그아웃해도 Playwright 드라이버/Chromium 유지. 컨텍스트만 반납하고
+#               빌려간 컨텍스트 없이 BROWSER_IDLE_TIMEOUT 초가 지나면 그때 종료
+# per_session : 기존 방식. 마지막 세션이 로그아웃하면 브라우저까지 전부 종료
+BROWSER_LIFECYCLE = os.getenv("BROWSER_LIFECYCLE", "resident")
+BROWSER_IDLE_TIMEOUT = int(os.getenv("BROWSER_IDLE_TIMEOUT", "900"))  # 유휴 종료 시간 (초)
+HEALTH_CHECK_INTERVAL = 30  # 브라우저 상태 점검 주기 (초)
+
+_idle_contexts = []  # [(ctx, page)] 대기 중인 컨텍스트
+_leased_contexts = set()  # 로그인 세션이 빌려간 컨텍스트
+_holds = 0  # 컨텍스트를 빌리는 중이거나 빌릴 예정인 작업 수 (진행 중인 로그인 등)
+_last_activity = time.monotonic()
+_monitor_task = None
+_refill_task = None
+_launch_lock = asyncio.Lock()  # 동시 로그인/풀 보충 시 브라우저가 두 번 뜨지 않도록
+
 async def get_playwright():
     """Playwright 싱글톤 인스턴스 반환"""
     global _playwright_instance
     if _playwright_instance is None:
-        print("[Playwright] 비동기 인스턴스 생성 중...")
+        logger.info("[Playwright] 비동기 인스턴스 생성 중...")
         _playwright_instance = await async_playwright().start()
-        print("[Playwright] 비동기 인스턴스 생성 완료")
+        logger.info("[Playwright] 비동기 인스턴스 생성 완료")
     return _playwright_instance
 
 async def get_browser():
     """브라우저 인스턴스 반환 (재사용)"""
+    async with _launch_lock:
+        return await _get_browser_locked()
+
+
+async def _get_browser_locked():
     global _browser
     pw = await get_playwright()
 
@@ -33,41 +74,267 @@ async def get_browser():
             needs_new_browser = True
 
     if needs_new_browser:
-        print("[Browser] 새 브라우저 시작...")
+        logger.info("[Browser] 새 브라우저 시작...")
         # 환경변수로 headless 모드 제어 (서버: True, 로컬: False)
-        import os
         headless_mode = os.getenv("HEADLESS", "False").lower() == "true"
         _browser = await pw.chromium.launch(headless=headless_mode)
 
     return _browser
 
+async def _new_warm_context():
+    """새 컨텍스트 + 페이지 생성 후 대기 URL까지 열어둠"""
+    browser = await get_browser()
+    ctx = await browser.new_context(accept_downloads=True)
+    page = await ctx.new_page()
+    if POOL_WARM_URL and POOL_WARM_URL != "about:blank":
+        try:
+            await page.goto(POOL_WARM_URL)
+        except Exception as e:
+            logger.warning(f"[Pool] 대기 페이지 로드 실패 (무시): {e}")
+    return ctx, page
+
+
+def _is_usable(ctx, page):
+    try:
+        return (
+            _browser is not None
+            and _browser.is_connected()
+            and page is not None
+            and not page.is_closed()
+            and ctx.browser is _browser
+        )
+    except Exception:
+        return False
+
+
+async def warm_pool():
+    """대기 컨텍스트를 POOL_MIN_SIZE개까지 채움"""
+    while len(_idle_contexts) < POOL_MIN_SIZE:
+        try:
+            _idle_contexts.append(await _new_warm_context())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"[Pool] 대기 컨텍스트 생성 실패: {e}")
+            return
+    logger.info(f"[Pool] 대기 컨텍스트 {len(_idle_contexts)}개 준비 완료")
+
+
+def schedule_warmup():
+    """풀 보충을 백그라운드로 (로그인을 기다리게 하지 않음)"""
+    global _refill_task
+    if POOL_MIN_SIZE <= 0:
+        return
+    if _refill_task is None or _refill_task.done():
+        _refill_task = asyncio.create_task(warm_pool())
+
+
+@contextlib.contextmanager
+def hold_browser():
+    """
+    블록 안에서는 빌려간 컨텍스트가 없어도 브라우저를 닫지 않음
+    (로그인 중 세션 복원 실패 → 반납 → trajectory 로그인처럼 대여 사이에 틈이 있는 작업용)
+    """
+    global _holds
+    _holds += 1
+    try:
+        yield
+    finally:
+        _holds -= 1
+
+
+def in_use():
+    """빌려간 컨텍스트나 진행 중인 대여가 있는지 (있으면 브라우저를 닫으면 안 됨)"""
+    return bool(_leased_contexts) or _holds > 0
+
+
+async def acquire_context():
+    """
+    로그인용 (ctx, page) 대여
+    풀에 대기 중인 컨텍스트가 있으면 바로 돌려주고, 없으면 새로 만든다.
+    """
+    with hold_browser():
+        return await _acquire_context()
+
+
+async def _acquire_context():
+    while _idle_contexts:
+        ctx, page = _idle_contexts.pop()
+        if _is_usable(ctx, page):
+            logger.info(f"[Pool] 대기 컨텍스트 사용 (남은 대기: {len(_idle_contexts)}개)")
+            _lease(ctx)
+            schedule_warmup()
+            return ctx, page
+        await _close_context(ctx)
+
+    ctx, page = await _new_warm_context()
+    logger.info("[Pool] 대기 컨텍스트 없음 → 새로 생성")
+    _lease(ctx)
+    schedule_warmup()
+    return ctx, page
+
+
+def _lease(ctx):
+    global _last_activity
+    _leased_contexts.add(ctx)
+    _last_activity = time.monotonic()
+
+
+async def release_context(ctx, page=None):
+    """
+    사용이 끝난 컨텍스트 반납
+    로그인 흔적이 남지 않도록 컨텍스트를 닫고(page 포함), 풀은 새 컨텍스트로 백그라운드 보충한다.
+    """
+    global _last_activity
+    if ctx is None:
+        return
+    _leased_contexts.discard(ctx)
+    _last_activity = time.monotonic()
+
+    await _close_context(ctx)
+    logger.info(f"[Pool] 컨텍스트 반납 → 종료 (대기: {len(_idle_contexts)}개)")
+
+    # 끊긴 브라우저를 보충하려고 다시 띄우지는 않음 (다음 로그인 때 재기동)
+    try:
+        connected = _browser is not None and _browser.is_connected()
+    except Exception:
+        connected = False
+    if connected:
+        schedule_warmup()
+
+
+async def _close_context(ctx):
+    try:
+        await ctx.close()
+    except asyncio.CancelledError:
+        logger.info("[Pool] 컨텍스트 종료 중 취소됨 (정상)")
+    except Exception as e:
+        logger.error(f"[Pool] 컨텍스트 종료 오류: {e}")
+
+
+async def drain_pool():
+    """대기 컨텍스트 전부 종료"""
+    global _refill_task
+    if _refill_task is not None and not _refill_task.done():
+        _refill_task.cancel()
+        try:
+            await _refill_task
+        except (asyncio.CancelledError, Exception):
+            pass
+    _refill_task = None
+
+    while _idle_contexts:
+        ctx, _ = _idle_contexts.pop()
+        await _close_context(ctx)
+
+
+async def on_sessions_closed():
+    """
+    모든 로그인 세션이 정리됐을 때 호출
+    per_session 모드면 브라우저까지 종료, resident 모드면 유휴 종료 타이머에 맡김
+    (다른 학생의 로그인이 아직 컨텍스트를 쓰고 있으면 모드와 관계없이 유지)
+    """
+    if in_use():
+        logger.info(f"[Playwright] 사용 중인 컨텍스트 {len(_leased_contexts)}개 (진행 중 {_holds}건) → 브라우저 유지")
+    elif BROWSER_LIFECYCLE == "per_session":
+        await close_all()
+    else:
+        logger.info(f"[Playwright] 브라우저 유지 (resident 모드, 유휴 {BROWSER_IDLE_TIMEOUT}초 후 종료)")
+
+
+async def check_health():
+    """
+    브라우저 연결 상태 점검
+    끊긴 브라우저의 대기 컨텍스트는 버리고 핸들을 초기화 (다음 로그인 때 재기동)
+    """
+    global _browser
+    if _browser is None:
+        return False
+
+    try:
+        connected = _browser.is_connected()
+    except Exception:
+        connected = False
+
+    if not connected:
+        logger.info("[Playwright] 브라우저 연결 끊김 감지 → 핸들 초기화")
+        _idle_contexts.clear()
+        _leased_contexts.clear()
+        _browser = None
+        return False
+
+    # 대기 중 페이지가 죽은 컨텍스트 정리
+    for ctx, page in list(_idle_contexts):
+        if not _is_usable(ctx, page):
+            _idle_contexts.remove((ctx, page))
+            await _close_context(ctx)
+    return True
+
+
+async def _lifecycle_monitor():
+    while True:
+        await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+        try:
+            alive = await check_health()
+            idle_for = time.monotonic() - _last_activity
+            if alive and not in_use() and idle_for >= BROWSER_IDLE_TIMEOUT:
+                logger.info(f"[Playwright] {int(idle_for)}초 동안 사용 없음 → 브라우저 종료")
+                await close_all()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[Playwright] 상태 점검 오류: {e}")
+
+
+def start_lifecycle_monitor():
+    """resident 모드용 상태 점검 + 유휴 종료 태스크 시작"""
+    global _monitor_task
+    if BROWSER_LIFECYCLE != "resident":
+        return
+    if _monitor_task is None or _monitor_task.done():
+        _monitor_task = asyncio.create_task(_lifecycle_monitor())
+
+
+async def stop_lifecycle_monitor():
+    global _monitor_task
+    if _monitor_task is not None:
+        _monitor_task.cancel()
+        try:
+            await _monitor_task
+        except (asyncio.CancelledError, Exception):
+            pass
+        _monitor_task = None
+
+
 async def close_all():
     """모든 리소스 정리"""
     global _browser, _playwright_instance
-    import asyncio
+
+    await drain_pool()
+    _leased_contexts.clear()
 
     if _browser:
         try:
             await _browser.close()
-            print("[Playwright] 브라우저 종료 완료")
+            logger.info("[Playwright] 브라우저 종료 완료")
         except asyncio.CancelledError:
-            print("[Playwright] 브라우저 종료 중 취소됨 (정상)")
+            logger.info("[Playwright] 브라우저 종료 중 취소됨 (정상)")
             pass
         except Exception as e:
-            print(f"[Playwright] 브라우저 종료 오류: {e}")
+            logger.error(f"[Playwright] 브라우저 종료 오류: {e}")
         finally:
             _browser = None
 
     if _playwright_instance:
         try:
             await _playwright_instance.stop()
-            print("[Playwright] 인스턴스 정리 완료")
+            logger.info("[Playwright] 인스턴스 정리 완료")
         except asyncio.CancelledError:
-            print("[Playwright] 인스턴스 정리 중 취소됨 (정상)")
+            logger.info("[Playwright] 인스턴스 정리 중 취소됨 (정상)")
             pass
         except Exception as e:
-            print(f"[Playwright] 인스턴스 정리 오류: {e}")
+            logger.error(f"[Playwright] 인스턴스 정리 오류: {e}")
         finally:
             _playwright_instance = None
 
-    print("[Playwright] 모든 리소스 정리 완료")
+    logger.info("[Playwright] 모든 리소스 정리 완료")
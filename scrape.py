@@ -1,31 +1,98 @@
-import json
 import re
+import asyncio
+import weakref
 from playwright.async_api import Page
 
+import tracing
+import service_log
+from ui_observer import take_dirty_regions
 
-async def scrape_sidebar(page: Page):
-    items = []
-    nodes = await page.locator(".cl-tree-item").all()
+logger = service_log.get_logger("scrape")
+
+# 페이지별 마지막 수집 결과 (증분 수집용). 페이지가 닫혀 GC되면 같이 사라짐
+_LAST_UI_STATE = weakref.WeakKeyDictionary()
+# 페이지별 직전 수집에서 실패한 단위 (다음 증분 수집 때 변경이 없어도 다시 수집)
+_FAILED_UNITS = weakref.WeakKeyDictionary()
+
+
+# True: 한 번의 페이지 내 evaluate로 모든 트리 노드 정보를 수집 (기본)
+# False: 노드마다 count/inner_text/get_attribute를 따로 호출하는 기존 방식 (비교용)
+SIDEBAR_BATCHED = True
+
+# 트리 노드 정보를 한 번에 뽑는 페이지 내 스크립트
+_SIDEBAR_NODES_JS = """
+nodes => nodes.map(el => {
+    const labelEl = el.querySelector('.cl-text');
+    return {
+        label: (labelEl ? labelEl.innerText : el.innerText) || '',
+        level_attr: el.getAttribute('aria-level') || '',
+        el_class: el.getAttribute('class') || '',
+        aria_selected: el.getAttribute('aria-selected'),
+    };
+})
+"""
+
+
+@tracing.traced("scrape_sidebar")
+async def scrape_sidebar(page: Page, batched=None):
+    if batched is None:
+        batched = SIDEBAR_BATCHED
+
+    if batched:
+        rows = await _collect_sidebar_rows_batched(page)
+    else:
+        rows = await _collect_sidebar_rows_per_node(page)
+
+    return _build_sidebar_tree(rows)
+
+
+async def _collect_sidebar_rows_batched(page: Page):
+    """모든 .cl-tree-item 노드 정보를 CDP 왕복 1번으로 수집"""
+    return await page.eval_on_selector_all(".cl-tree-item", _SIDEBAR_NODES_JS)
 
-    sidebar = []
-    stack = []  # (level, item)
+
+async def _collect_sidebar_rows_per_node(page: Page):
+    """노드마다 4~5번씩 왕복하는 기존 수집 방식"""
+    rows = []
+    nodes = await page.locator(".cl-tree-item").all()
 
     for el in nodes:
         try:
             label_el = el.locator(":scope >> .cl-text").first  # label 추출
             label_count = await label_el.count()
-            label = (await label_el.inner_text()).strip() if label_count > 0 else (await el.inner_text()).strip()
+            label = (await label_el.inner_text()) if label_count > 0 else (await el.inner_text())
+
+            rows.append({
+                "label": label,
+                "level_attr": await el.get_attribute("aria-level") or "",  # 이 자식을 자식인척만 하고 사실 형제였음
+                "el_class": await el.get_attribute("class") or "",
+                "aria_selected": await el.get_attribute("aria-selected"),
+            })
+        except Exception as e:
+            logger.warning(f"[WARN] sidebar item parse failed: {e}")
+            continue
+
+    return rows
+
+
+def _build_sidebar_tree(rows):
+    """수집한 노드 목록(문서 순서) → aria-level 기준 중첩 트리"""
+    sidebar = []
+    stack = []  # (level, item)
+
+    for row in rows:
+        try:
+            label = (row.get("label") or "").strip()
 
-            level_attr = await el.get_attribute("aria-level") or ""  # 이 자식을 자식인척만 하고 사실 형제였음
-            el_class = await el.get_attribute("class") or ""
+            level_attr = row.get("level_attr") or ""
+            el_class = row.get("el_class") or ""
             match = re.search(r"cl-level-(\d+)", el_class)
             level = int(level_attr) if level_attr.isdigit() else int(match.group(1)) if match else 1
 
             # expanded 여부
             expanded = "cl-expanded" in el_class
             # 선택 여부
-            aria_selected = await el.get_attribute("aria-selected")
-            checked = "cl-selected" in el_class or aria_selected == "true"
+            checked = "cl-selected" in el_class or row.get("aria_selected") == "true"
 
             node = {
                 "label": label,
@@ -44,12 +111,156 @@ async def scrape_sidebar(page: Page):
 
             stack.append((level, node))
         except Exception as e:
-            print(f"[WARN] sidebar item parse failed: {e}")
+            logger.warning(f"[WARN] sidebar item parse failed: {e}")
             continue
 
     return sidebar
 
 
+# True: 활성 탭패널 안의 입력 필드를 evaluate 1번으로 수집 (기본)
+# False: 필드마다 evaluate 4번 + get_attribute 2번씩 읽는 기존 방식 (비교용, SCOPED_SCRAPE=False면 페이지 전체)
+FORM_FIELDS_BATCHED = True
+FORM_FIELD_LIMIT = 200  # 수집할 최대 필드 수 (그리드가 큰 화면 대비)
+
+# 컨테이너 안의 input/select/textarea 정보를 한 번에 뽑는 페이지 내 스크립트
+_FORM_FIELDS_JS = """
+(root, limit) => {
+    const fields = [];
+    for (const el of root.querySelectorAll('input, select, textarea')) {
+        if (fields.length >= limit) break;
+        fields.push({
+            tag: el.tagName.toLowerCase(),
+            input_type: el.type || 'text',
+            label: el.labels?.[0]?.innerText
+                || el.getAttribute('aria-label')
+                || el.placeholder
+                || '',
+            value: el.value || '',
+            id: el.getAttribute('id'),
+            name: el.getAttribute('name'),
+        });
+    }
+    return fields;
+}
+"""
+
+
+async def _collect_form_fields_batched(container, limit=None):
+    """컨테이너(탭패널/팝업) 안의 필드 정보를 CDP 왕복 1번으로 수집"""
+    if limit is None:
+        limit = FORM_FIELD_LIMIT
+    return _build_form_fields(await container.evaluate(_FORM_FIELDS_JS, limit))
+
+
+def _build_form_fields(rows):
+    """페이지에서 읽은 필드 행 → form_fields"""
+    form_fields = []
+    for row in rows:
+        tag = row.get("tag") or ""
+        fid = row.get("id") or row.get("name") or f"{tag}_{len(form_fields)}"
+        form_fields.append({
+            "id": fid,
+            "label": (row.get("label") or "").strip(),
+            "type": tag,
+            "input_type": row.get("input_type") or "text",
+            "value": (row.get("value") or "").strip()
+        })
+    return form_fields
+
+
+async def _collect_form_fields_per_field(root):
+    """root(페이지 또는 범위 locator) 안의 필드를 필드마다 왕복하며 읽는 기존 수집 방식"""
+    form_fields = []
+    inputs = await root.locator("input, select, textarea").all()
+    for el in inputs:
+        try:
+            tag = await el.evaluate("el => el.tagName.toLowerCase()")
+            input_type = await el.evaluate("el => el.type || 'text'")
+            label = await el.evaluate(
+                """el => el.labels?.[0]?.innerText
+                || el.getAttribute('aria-label')
+                || el.placeholder
+                || ''"""
+            )
+            value = await el.evaluate("el => el.value || ''")
+            fid_attr_id = await el.get_attribute("id")
+            fid_attr_name = await el.get_attribute("name")
+            fid = fid_attr_id or fid_attr_name or f"{tag}_{len(form_fields)}"
+            form_fields.append({
+                "id": fid,
+                "label": (label or "").strip(),
+                "type": tag,
+                "input_type": input_type,
+                "value": (value or "").strip()
+            })
+        except Exception:
+            continue
+    return form_fields
+
+
+# True: 활성 컨테이너(맨 위 팝업, 없으면 보이는 탭패널)를 evaluate 1번으로 찾아
+#       data-ndrims-scope로 표시하고 제목/필드도 그 안에서만 수집 (기본)
+# False: 팝업/탭패널 locator마다 is_visible 왕복하는 기존 방식 (비교용)
+SCOPED_SCRAPE = True
+SCOPE_ATTR = "data-ndrims-scope"
+
+# 제목 요소가 없는 탭패널에서 첫 줄을 제목으로 인정할 키워드 (nDRIMS 페이지 제목에 포함될 법한 것)
+_TITLE_KEYWORDS = ("조회", "등록", "관리", "신청", "확인", "열람", "출력", "발급")
+
+# 활성 컨테이너 결정 + 표시 + 제목/필드 수집을 한 번에 하는 페이지 내 스크립트
+# 보이는지 여부는 Playwright is_visible과 같은 기준 (크기가 있고 visibility: hidden이 아님)
+_SCOPE_JS = """
+({attr, limit}) => {
+    const collectFields = %s;
+    const visible = el => {
+        const rect = el.getBoundingClientRect();
+        return rect.width > 0 && rect.height > 0 && getComputedStyle(el).visibility !== 'hidden';
+    };
+
+    for (const el of document.querySelectorAll('[' + attr + ']')) el.removeAttribute(attr);
+
+    // 맨 위 팝업: z-index가 가장 큰 것, 같으면 문서상 나중 것 (중첩 팝업이면 안쪽)
+    let dialog = null;
+    let top = -Infinity;
+    for (const el of document.querySelectorAll('.cl-dialog')) {
+        if (!visible(el)) continue;
+        const z = parseInt(getComputedStyle(el).zIndex, 10) || 0;
+        if (z >= top) {
+            dialog = el;
+            top = z;
+        }
+    }
+    if (dialog) {
+        dialog.setAttribute(attr, 'dialog');
+        const header = dialog.querySelector('.cl-dialog-header .cl-text');
+        return { kind: 'dialog', title: header ? header.innerText : null };
+    }
+
+    const panels = document.querySelectorAll('[role="tabpanel"]');
+    const panel = Array.prototype.find.call(panels, visible);
+    if (!panel) return { kind: null, panels: panels.length };
+    panel.setAttribute(attr, 'tabpanel');
+
+    const heading = panel.querySelector('h1, h2, h3, [role=heading]');
+    return {
+        kind: 'tabpanel',
+        heading: heading ? heading.innerText : null,
+        first_line: heading ? null : (panel.innerText || '').trim().split('\\n')[0],
+        fields: limit > 0 ? collectFields(panel, limit) : null,
+    };
+}
+""" % _FORM_FIELDS_JS.strip()
+
+
+def _title_from_first_line(raw_text):
+    """제목 요소가 없을 때 탭패널 첫 줄 → 제목 (키워드가 없으면 인식 실패)"""
+    if any(k in raw_text for k in _TITLE_KEYWORDS):
+        logger.info(f"[INFO] 탭패널 첫 줄에서 제목 감지: {raw_text}")
+        return raw_text
+    return "제목 인식 실패"
+
+
+@tracing.traced("scrape_current_page")
 async def scrape_current_page(page: Page):
     """
     현재 활성화된 탭패널(role=tabpanel) 또는 팝업창(.cl-dialog)을 감지해서 상태를 JSON으로 리턴
@@ -57,107 +268,198 @@ async def scrape_current_page(page: Page):
     current_page = {"title": "", "detail_page": "", "form_fields": []}
 
     try:
-        #팝업창 감지
-        dialogs = await page.locator('.cl-dialog').all()
-        visible_dialogs = [d for d in dialogs if await d.is_visible()]
-        if visible_dialogs:
-            print("[INFO] nDRIMS 팝업창(.cl-dialog) 감지")
-            dialog = visible_dialogs[0]
-            header = dialog.locator('.cl-dialog-header .cl-text').first
-            if await header.count() > 0:
-                current_page["title"] = (await header.inner_text()).strip()
-            else:
-                current_page["title"] = "팝업 제목 인식 실패"
-            print(f"[INFO] 팝업 제목: {current_page['title']}")
-            return current_page
+        if SCOPED_SCRAPE:
+            return await _scrape_current_page_scoped(page, current_page)
+        return await _scrape_current_page_unscoped(page, current_page)
 
-        # 탭패널 감지 (이전 작동 버전의 로직)
-        tabpanels = await page.locator('[role="tabpanel"]').all()
-        if not tabpanels:
-            current_page["title"] = "탭패널 없음"
-            return current_page
+    except Exception as e:
+        logger.error(f"[ERROR] scrape_current_page 오류: {e}")
+        current_page["title"] = f"탭패널 감지 중 오류: {e}"
+        current_page["form_fields"] = "인식되지 않았다"
+        return current_page
 
-        # display:none이거나 aria-hidden인 패널 제외, visible한 패널만
-        visible_panels = [p for p in tabpanels if await p.is_visible()]
-        if not visible_panels:
-            current_page["title"] = "활성 탭패널 인식 실패"
-            return current_page
 
-        panel = visible_panels[0]  # 첫 번째 활성 탭패널
+async def _scrape_current_page_scoped(page: Page, current_page):
+    """활성 컨테이너만 읽음 (숨겨진 탭/닫힌 팝업 수와 무관하게 왕복 1번)"""
+    scope = await page.evaluate(
+        _SCOPE_JS, {"attr": SCOPE_ATTR, "limit": FORM_FIELD_LIMIT if FORM_FIELDS_BATCHED else 0}
+    )
 
-        # 제목 탐색 로직 (이전 작동 버전)
-        try:
-            title_el = panel.locator("h1, h2, h3, [role=heading]").first
-            if await title_el.count() > 0:
-                current_page["title"] = (await title_el.inner_text()).strip()
-            else:
-                # 없으면 inner_text 첫 줄
-                raw_text = (await panel.inner_text()).strip().split("\n")[0]
-                # 키워드 필터링: nDRIMS 페이지 제목에 포함될 법한 키워드
-                if any(k in raw_text for k in ["조회", "등록", "관리", "신청", "확인", "열람", "출력", "발급"]):
-                    current_page["title"] = raw_text
-                    print(f"[INFO] 탭패널 첫 줄에서 제목 감지: {raw_text}")
-                else:
-                    current_page["title"] = "제목 인식 실패"
-        except Exception as e:
-            print(f"[ERROR] 제목 추출 실패: {e}")
-            current_page["title"] = "제목 인식 실패"
-
-        #form 필드 수집 (기존과 동일)
-        form_fields = []
-        inputs = await page.locator("input, select, textarea").all()
-        for el in inputs:
-            try:
-                tag = await el.evaluate("el => el.tagName.toLowerCase()")
-                input_type = await el.evaluate("el => el.type || 'text'")
-                label = await el.evaluate(
-                    """el => el.labels?.[0]?.innerText
-                    || el.getAttribute('aria-label')
-                    || el.placeholder
-                    || ''"""
-                )
-                value = await el.evaluate("el => el.value || ''")
-                fid_attr_id = await el.get_attribute("id")
-                fid_attr_name = await el.get_attribute("name")
-                fid = fid_attr_id or fid_attr_name or f"{tag}_{len(form_fields)}"
-                form_fields.append({
-                    "id": fid,
-                    "label": (label or "").strip(),
-                    "type": tag,
-                    "input_type": input_type,
-                    "value": (value or "").strip()
-                })
-            except Exception:
-                continue
-
-        current_page["form_fields"] = form_fields or "인식되지 않았다"
-
-        #print(json.dumps({"current_page": current_page}, ensure_ascii=False, indent=2))
+    if scope["kind"] == "dialog":
+        logger.info("[INFO] nDRIMS 팝업창(.cl-dialog) 감지")
+        title = scope.get("title")
+        current_page["title"] = title.strip() if title is not None else "팝업 제목 인식 실패"
+        logger.info(f"[INFO] 팝업 제목: {current_page['title']}")
         return current_page
 
-    except Exception as e:
-        print(f"[ERROR] scrape_current_page 오류: {e}")
-        current_page["title"] = f"탭패널 감지 중 오류: {e}"
-        current_page["form_fields"] = "인식되지 않았다"
+    if scope["kind"] is None:
+        current_page["title"] = "활성 탭패널 인식 실패" if scope.get("panels") else "탭패널 없음"
         return current_page
 
+    if scope.get("heading") is not None:
+        current_page["title"] = scope["heading"].strip()
+    else:
+        current_page["title"] = _title_from_first_line(scope.get("first_line") or "")
 
+    if FORM_FIELDS_BATCHED:
+        form_fields = _build_form_fields(scope.get("fields") or [])
+    else:
+        form_fields = await _collect_form_fields_per_field(page.locator(f"[{SCOPE_ATTR}]"))
 
-async def scrape_current_ui_state(page: Page):
-    """NDRIMS 전체 UI 상태를 수집"""
-    result = {"url": page.url}
+    current_page["form_fields"] = form_fields or "인식되지 않았다"
+    return current_page
+
+
+async def _scrape_current_page_unscoped(page: Page, current_page):
+    """팝업/탭패널마다 is_visible을 확인하는 기존 수집 방식"""
+    #팝업창 감지
+    dialogs = await page.locator('.cl-dialog').all()
+    visible_dialogs = [d for d in dialogs if await d.is_visible()]
+    if visible_dialogs:
+        logger.info("[INFO] nDRIMS 팝업창(.cl-dialog) 감지")
+        dialog = visible_dialogs[0]
+        header = dialog.locator('.cl-dialog-header .cl-text').first
+        if await header.count() > 0:
+            current_page["title"] = (await header.inner_text()).strip()
+        else:
+            current_page["title"] = "팝업 제목 인식 실패"
+        logger.info(f"[INFO] 팝업 제목: {current_page['title']}")
+        return current_page
 
+    # 탭패널 감지 (이전 작동 버전의 로직)
+    tabpanels = await page.locator('[role="tabpanel"]').all()
+    if not tabpanels:
+        current_page["title"] = "탭패널 없음"
+        return current_page
+
+    # display:none이거나 aria-hidden인 패널 제외, visible한 패널만
+    visible_panels = [p for p in tabpanels if await p.is_visible()]
+    if not visible_panels:
+        current_page["title"] = "활성 탭패널 인식 실패"
+        return current_page
+
+    panel = visible_panels[0]  # 첫 번째 활성 탭패널
+
+    # 제목 탐색 로직 (이전 작동 버전)
     try:
-        result["sidebar"] = await scrape_sidebar(page)
+        title_el = panel.locator("h1, h2, h3, [role=heading]").first
+        if await title_el.count() > 0:
+            current_page["title"] = (await title_el.inner_text()).strip()
+        else:
+            # 없으면 inner_text 첫 줄
+            raw_text = (await panel.inner_text()).strip().split("\n")[0]
+            current_page["title"] = _title_from_first_line(raw_text)
     except Exception as e:
-        print(f"[ERROR] sidebar 수집 실패: {e}")
-        result["sidebar"] = []
+        logger.error(f"[ERROR] 제목 추출 실패: {e}")
+        current_page["title"] = "제목 인식 실패"
+
+    #form 필드 수집 (활성 탭패널 범위로 한정)
+    if FORM_FIELDS_BATCHED:
+        form_fields = await _collect_form_fields_batched(panel)
+    else:
+        form_fields = await _collect_form_fields_per_field(page)
+
+    current_page["form_fields"] = form_fields or "인식되지 않았다"
+    return current_page
+
+
+# True: 사이드바와 현재 페이지를 asyncio.gather로 동시에 수집 (기본)
+# False: 사이드바 → 현재 페이지 순서로 하나씩 수집 (비교용)
+PARALLEL_SCRAPE = True
+# 수집 단위별 제한 시간 (초). 넘으면 그 단위만 기본값으로 채우고 나머지 결과는 그대로 사용
+SIDEBAR_TIMEOUT = 10
+CURRENT_PAGE_TIMEOUT = 10
+
+
+def _empty_current_page():
+    return {"title": "(탭 감지 실패)", "form_fields": []}
+
 
+async def _scrape_unit(page: Page, key, scraper, timeout, fallback):
+    """수집 단위 1개 실행 → (결과, 성공 여부). 예외/시간 초과면 그 단위만 기본값"""
     try:
-        result["current_page"] = await scrape_current_page(page)
+        return await asyncio.wait_for(scraper(page), timeout), True
+    except asyncio.TimeoutError:
+        logger.error(f"[ERROR] {key} 수집 시간 초과 ({timeout}초)")
     except Exception as e:
-        print(f"[ERROR] current_page 수집 실패: {e}")
-        result["current_page"] = {"title": "(탭 감지 실패)", "form_fields": []}
+        logger.error(f"[ERROR] {key} 수집 실패: {e}")
+    return fallback(), False
 
-    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+async def _scrape_units(page: Page, keys):
+    """
+    여러 수집 단위 실행 → ({키: 결과}, 실패한 키 목록)
+    서로 독립적인 읽기이므로 PARALLEL_SCRAPE면 동시에 보냄 (CDP 왕복 대기가 겹침)
+    """
+    # 결과 키 → (수집 함수, 제한 시간, 실패 시 기본값)
+    units = {
+        "sidebar": (scrape_sidebar, SIDEBAR_TIMEOUT, list),
+        "current_page": (scrape_current_page, CURRENT_PAGE_TIMEOUT, _empty_current_page),
+    }
+    jobs = [_scrape_unit(page, key, *units[key]) for key in keys]
+    if PARALLEL_SCRAPE:
+        outcomes = await asyncio.gather(*jobs)
+    else:
+        outcomes = [await job for job in jobs]
+
+    values = {key: value for key, (value, _) in zip(keys, outcomes)}
+    failed = [key for key, (_, ok) in zip(keys, outcomes) if not ok]
+    return values, failed
+
+
+@tracing.traced("scrape_ui_state")
+async def scrape_current_ui_state(page: Page):
+    """NDRIMS 전체 UI 상태를 수집"""
+    result = {"url": page.url}
+    values, _ = await _scrape_units(page, ["sidebar", "current_page"])
+    result.update(values)
+
+    service_log.payload(logger, "[UI 상태]", result)
     return result
+
+
+@tracing.traced("scrape_ui_state")
+async def scrape_current_ui_state_incremental(page: Page):
+    """
+    바뀐 영역만 다시 수집하는 scrape_current_ui_state
+
+    페이지 내 MutationObserver가 표시한 dirty 영역(사이드바 / 탭패널·팝업)만 다시 읽고
+    (스크립트가 el.value로 바꾼 필드 값은 ui_observer의 값 해시 비교로 탭패널·팝업 dirty 처리)
+    나머지는 직전 결과를 재사용한다. URL이 바뀌었거나 첫 수집이면 전체 수집.
+    직전에 실패한 영역은 변경이 없어도 다시 수집한다.
+
+    Returns:
+        (ui_state, changed) — changed는 직전 결과 대비 달라진 최상위 키 목록
+        (직전 결과가 없으면 None)
+    """
+    previous = _LAST_UI_STATE.get(page)
+    dirty = await take_dirty_regions(page)
+
+    if previous is None or previous.get("url") != page.url:
+        dirty = {"sidebar": True, "page": True}
+
+    rescrape = {
+        "sidebar": dirty["sidebar"],
+        "current_page": dirty["page"],
+    }
+    for key in _FAILED_UNITS.get(page, ()):
+        rescrape[key] = True
+
+    values, failed = await _scrape_units(page, [key for key, needed in rescrape.items() if needed])
+
+    result = {"url": page.url}
+    for key, needed in rescrape.items():
+        result[key] = values[key] if needed else previous[key]
+
+    logger.info(f"[INFO] 증분 수집: sidebar={'재수집' if rescrape['sidebar'] else '재사용'}, "
+                f"current_page={'재수집' if rescrape['current_page'] else '재사용'}")
+
+    _LAST_UI_STATE[page] = result
+    _FAILED_UNITS[page] = failed
+
+    changed = None
+    if previous is not None:
+        changed = [key for key, value in result.items() if previous.get(key) != value]
+
+    service_log.payload(logger, "[UI 상태]", result)
+    return result, changed
@@ -0,0 +1,246 @@
+"""
+서비스 로깅 (레벨 + 비동기 출력 + 링 버퍼)
+
+print 대신 표준 logging을 쓰되, 실제 출력(stdout/파일 쓰기)은 QueueListener 스레드에서 한다.
+이벤트 루프는 기록을 큐에 넣기만 하므로 느린 로그 싱크 때문에 멈추지 않는다.
+
+- LOG_LEVEL: 콘솔/파일 출력 레벨 (기본 INFO)
+- LOG_FILE: 지정하면 파일에도 기록
+- 큰 payload(ui_state, 액션 JSON)는 payload()로 기록: 요약 한 줄은 항상,
+  본문은 LOG_PAYLOAD_SAMPLE_EVERY번에 1번만 잘라서 DEBUG로 기록
+- 링 버퍼: 최근 기록을 LOG_RING_SIZE줄 보관 (LOG_RING_LEVEL 이상, 기본은 LOG_LEVEL과 같음)
+  출력 레벨보다 낮은 DEBUG까지 모으려면 LOG_RING_LEVEL=DEBUG (그만큼 DEBUG 기록도 포맷/큐 비용이 듦)
+  dump_debug() / SIGUSR1 / metrics 엔드포인트 /debug/logs(LOG_DEBUG_TOKEN 필요)로 꺼내 봄
+- 토큰 등 비밀값은 mask()로 가려서 기록
+"""
+
+import os
+import sys
+import time
+import json
+import hmac
+import queue
+import asyncio
+import atexit
+import signal
+import logging
+import logging.handlers
+from collections import Counter, deque
+from pathlib import Path
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE", "")
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(message)s"
+LOG_DATE_FORMAT = "%H:%M:%S"
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "2000"))   # payload 본문 최대 길이
+LOG_PAYLOAD_SAMPLE_EVERY = int(os.getenv("LOG_PAYLOAD_SAMPLE_EVERY", "10"))  # 0이면 본문 기록 안 함
+LOG_RING_SIZE = int(os.getenv("LOG_RING_SIZE", "5000"))  # 0이면 링 버퍼 끔
+LOG_RING_LEVEL = os.getenv("LOG_RING_LEVEL", LOG_LEVEL).upper()  # 링 버퍼에 보관할 최소 레벨
+# /debug/logs 접근 토큰 (Authorization: Bearer <토큰>). 비어 있으면 엔드포인트 끔
+LOG_DEBUG_TOKEN = os.getenv("LOG_DEBUG_TOKEN", "")
+LOG_DUMP_DIR = Path(os.getenv("LOG_DUMP_DIR", Path(__file__).parent / "logs"))
+
+ROOT_LOGGER = "ndrims"
+
+# payload 본문을 자를 때 컨테이너/문자열별 최대 크기
+_CLIP_ITEMS = 20
+_CLIP_STR = 200
+_CLIP_DEPTH = 6
+
+_listener = None
+_ring = None
+_payload_counts = Counter()
+_dump_tasks = set()
+
+
+class RingBufferHandler(logging.Handler):
+    """최근 기록 N줄 보관 (QueueListener 스레드에서 호출됨)"""
+
+    def __init__(self, capacity, level=logging.DEBUG):
+        super().__init__(level)
+        self.lines = deque(maxlen=capacity)
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.lines)
+
+
+def setup():
+    """ndrims 로거에 큐 핸들러 연결 + 출력 스레드 시작 (여러 번 불러도 1회만)"""
+    global _listener, _ring
+    if _listener is not None:
+        return
+
+    formatter = logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT)
+    level = _level(LOG_LEVEL, logging.INFO)
+
+    handlers = []
+    console = logging.StreamHandler(sys.stdout)
+    console.setLevel(level)
+    handlers.append(console)
+    if LOG_FILE:
+        file_handler = logging.FileHandler(LOG_FILE, encoding="utf-8")
+        file_handler.setLevel(level)
+        handlers.append(file_handler)
+    if LOG_RING_SIZE > 0:
+        _ring = RingBufferHandler(LOG_RING_SIZE, _level(LOG_RING_LEVEL, level))
+        handlers.append(_ring)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    # 어느 핸들러도 받지 않을 기록은 포맷/큐에 넣기 전에 걸러냄
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(min(level, _ring.level) if _ring is not None else level)
+    root.addHandler(logging.handlers.QueueHandler(queue.SimpleQueue()))
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(root.handlers[-1].queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown)
+
+
+def _level(name, default):
+    level = logging.getLevelName(name)
+    return level if isinstance(level, int) else default
+
+
+def shutdown():
+    """큐에 남은 기록을 모두 출력하고 출력 스레드 종료"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name):
+    setup()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def mask(secret, visible=4):
+    """비밀값을 앞 몇 글자만 남기고 가림 (예: 'abcd…(32자)')"""
+    if not secret:
+        return "(없음)"
+    secret = str(secret)
+    return f"{secret[:visible]}…({len(secret)}자)" if len(secret) > visible * 2 else f"…({len(secret)}자)"
+
+
+# ============================================================
+# 큰 payload
+# ============================================================
+
+def _clip(value, depth=0):
+    """리스트/딕셔너리/문자열을 앞부분만 남긴 사본 (작업량이 payload 크기와 무관하도록)"""
+    if depth >= _CLIP_DEPTH:
+        return "…"
+    if isinstance(value, dict):
+        clipped = {str(k): _clip(v, depth + 1) for k, v in list(value.items())[:_CLIP_ITEMS]}
+        if len(value) > _CLIP_ITEMS:
+            clipped["…"] = f"+{len(value) - _CLIP_ITEMS}"
+        return clipped
+    if isinstance(value, (list, tuple)):
+        clipped = [_clip(v, depth + 1) for v in value[:_CLIP_ITEMS]]
+        if len(value) > _CLIP_ITEMS:
+            clipped.append(f"… +{len(value) - _CLIP_ITEMS}")
+        return clipped
+    if isinstance(value, str) and len(value) > _CLIP_STR:
+        return value[:_CLIP_STR] + "…"
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return repr(value)[:_CLIP_STR]
+
+
+def clip_json(value, max_chars=None):
+    """잘라낸 JSON 문자열"""
+    if max_chars is None:
+        max_chars = LOG_PAYLOAD_MAX_CHARS
+    text = json.dumps(_clip(value), ensure_ascii=False, separators=(",", ":"))
+    return text if len(text) <= max_chars else text[:max_chars] + "…"
+
+
+def summarize(value):
+    """최상위 키와 크기만 (예: {url, sidebar[12], current_page{3}})"""
+    def size(v):
+        if isinstance(v, dict):
+            return f"{{{len(v)}}}"
+        if isinstance(v, (list, tuple)):
+            return f"[{len(v)}]"
+        return ""
+
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{k}{size(v)}" for k, v in value.items()) + "}"
+    if isinstance(value, (list, tuple)):
+        return f"[{len(value)}개 항목]"
+    return clip_json(value, _CLIP_STR)
+
+
+def payload(logger, label, value, level=logging.INFO):
+    """
+    큰 payload 기록
+    - level로 요약 한 줄
+    - LOG_PAYLOAD_SAMPLE_EVERY번에 1번은 잘라낸 본문을 DEBUG로 (label별로 셈)
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, "%s %s", label, summarize(value))
+
+    if LOG_PAYLOAD_SAMPLE_EVERY <= 0 or not logger.isEnabledFor(logging.DEBUG):
+        return
+    _payload_counts[label] += 1
+    if (_payload_counts[label] - 1) % LOG_PAYLOAD_SAMPLE_EVERY == 0:
+        logger.debug("%s %s", label, clip_json(value))
+
+
+# ============================================================
+# 링 버퍼 덤프
+# ============================================================
+
+def recent_lines():
+    """링 버퍼에 보관된 최근 기록"""
+    return _ring.snapshot() if _ring is not None else []
+
+
+def debug_access_allowed(authorization):
+    """/debug/logs 요청의 Authorization 헤더 확인 (LOG_DEBUG_TOKEN이 없으면 항상 거부)"""
+    if not LOG_DEBUG_TOKEN or not authorization:
+        return False
+    scheme, _, token = authorization.partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(token.strip(), LOG_DEBUG_TOKEN)
+
+
+def dump_debug(reason=""):
+    """링 버퍼를 LOG_DUMP_DIR 아래 파일로 저장 → 경로 (링 버퍼가 꺼져 있으면 None)"""
+    if _ring is None:
+        return None
+    lines = recent_lines()
+    LOG_DUMP_DIR.mkdir(parents=True, exist_ok=True)
+    path = LOG_DUMP_DIR / f"debug-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.log"
+    header = f"# reason: {reason}\n" if reason else ""
+    path.write_text(header + "\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+def install_dump_signal(loop):
+    """SIGUSR1 수신 시 링 버퍼 덤프 (지원하지 않는 플랫폼에서는 무시)"""
+    sigusr1 = getattr(signal, "SIGUSR1", None)
+    if sigusr1 is None:
+        return
+
+    async def dump():
+        try:
+            path = await asyncio.to_thread(dump_debug, "SIGUSR1")
+            get_logger("log").info(f"[Log] 디버그 로그 덤프: {path}")
+        except OSError as e:
+            get_logger("log").warning(f"[Log] 디버그 로그 덤프 실패: {e}")
+
+    def on_signal():
+        task = loop.create_task(dump())
+        _dump_tasks.add(task)
+        task.add_done_callback(_dump_tasks.discard)
+
+    try:
+        loop.add_signal_handler(sigusr1, on_signal)
+    except (NotImplementedError, RuntimeError):
+        pass
@@ -0,0 +1,163 @@
+"""
+로그인 세션(storage_state) 암호화 캐시
+
+같은 학번이 다시 로그인하면 전체 로그인 trajectory(약 10초)를 돌리는 대신
+저장해 둔 쿠키를 새 컨텍스트에 넣고 URL 한 번만 열어 세션이 살아있는지 확인한다.
+
+- 캐시는 Fernet(AES-128-CBC + HMAC)으로 암호화해서 보관, SESSION_CACHE_TTL 초가 지나면 폐기
+- 비밀번호는 저장하지 않고 솔트를 넣은 PBKDF2 해시만 저장
+  (같은 학번이라도 비밀번호가 맞아야 캐시를 쓸 수 있음)
+- SESSION_CACHE_KEY 환경변수가 없으면 프로세스마다 임시 키를 만들고 디스크에는 쓰지 않음
+"""
+
+import os
+import hmac
+import json
+import time
+import asyncio
+import hashlib
+from pathlib import Path
+
+import service_log
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # cryptography 미설치 시 캐시 비활성화
+    Fernet = None
+    InvalidToken = Exception
+
+logger = service_log.get_logger("session_cache")
+
+SESSION_CACHE_ENABLED = os.getenv("SESSION_CACHE", "true").lower() == "true"
+SESSION_CACHE_TTL = int(os.getenv("SESSION_CACHE_TTL", "1800"))  # 캐시 유효 시간 (초)
+SESSION_CACHE_DIR = Path(os.getenv("SESSION_CACHE_DIR", Path(__file__).parent / ".session_cache"))
+PBKDF2_ITERATIONS = 100_000
+
+_fernet = None
+_persist = False
+_memory = {}  # 학번 해시 → 암호화 토큰
+
+
+def _get_fernet():
+    """암호화 객체 (최초 1회 생성). 사용할 수 없으면 None"""
+    global _fernet, _persist
+    if _fernet is not None:
+        return _fernet
+    if Fernet is None:
+        logger.info("[세션 캐시] cryptography 패키지가 없어 캐시를 사용하지 않습니다.")
+        return None
+
+    key = os.getenv("SESSION_CACHE_KEY")
+    if key:
+        _fernet = Fernet(key.encode())
+        _persist = True
+    else:
+        # 재시작하면 못 읽는 키이므로 메모리에만 보관
+        _fernet = Fernet(Fernet.generate_key())
+        _persist = False
+    return _fernet
+
+
+def _entry_name(student_id):
+    return hashlib.sha256(str(student_id).encode("utf-8")).hexdigest()
+
+
+def _hash_password(password, salt):
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, PBKDF2_ITERATIONS)
+
+
+def _read_token(name):
+    token = _memory.get(name)
+    if token is None and _persist:
+        path = SESSION_CACHE_DIR / name
+        if path.exists():
+            token = path.read_bytes()
+    return token
+
+
+def _write_token(name, token):
+    _memory[name] = token
+    if _persist:
+        SESSION_CACHE_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+        path = SESSION_CACHE_DIR / name
+        path.write_bytes(token)
+        os.chmod(path, 0o600)
+
+
+def invalidate(student_id):
+    """캐시 삭제 (세션 확인 실패 시)"""
+    name = _entry_name(student_id)
+    _memory.pop(name, None)
+    path = SESSION_CACHE_DIR / name
+    try:
+        if path.exists():
+            path.unlink()
+    except OSError as e:
+        logger.warning(f"[세션 캐시] 캐시 파일 삭제 실패: {e}")
+
+
+def _load_sync(student_id, password):
+    fernet = _get_fernet()
+    if fernet is None:
+        return None
+
+    name = _entry_name(student_id)
+    token = _read_token(name)
+    if token is None:
+        return None
+
+    try:
+        entry = json.loads(fernet.decrypt(token, ttl=SESSION_CACHE_TTL))
+    except InvalidToken:
+        # 만료되었거나 다른 키로 암호화된 캐시
+        invalidate(student_id)
+        return None
+
+    salt = bytes.fromhex(entry["salt"])
+    if not hmac.compare_digest(bytes.fromhex(entry["password_hash"]), _hash_password(password, salt)):
+        logger.warning("[세션 캐시] 비밀번호 불일치 → 캐시 사용 안 함")
+        return None
+
+    return entry
+
+
+def _save_sync(student_id, password, storage_state, last_url):
+    fernet = _get_fernet()
+    if fernet is None:
+        return
+
+    salt = os.urandom(16)
+    entry = {
+        "salt": salt.hex(),
+        "password_hash": _hash_password(password, salt).hex(),
+        "saved_at": time.time(),
+        "last_url": last_url,
+        "storage_state": storage_state,
+    }
+    token = fernet.encrypt(json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+    _write_token(_entry_name(student_id), token)
+
+
+async def load(student_id, password):
+    """
+    캐시된 세션 조회 → {"storage_state": ..., "last_url": ...} 또는 None
+    (PBKDF2/복호화는 이벤트 루프를 막지 않도록 스레드에서 실행)
+    """
+    if not SESSION_CACHE_ENABLED:
+        return None
+    try:
+        return await asyncio.to_thread(_load_sync, student_id, password)
+    except Exception as e:
+        logger.warning(f"[세션 캐시] 조회 실패: {e}")
+        return None
+
+
+async def save(student_id, password, storage_state, last_url):
+    """로그인 성공 후 storage_state 저장"""
+    if not SESSION_CACHE_ENABLED:
+        return
+    try:
+        await asyncio.to_thread(_save_sync, student_id, password, storage_state, last_url)
+        logger.info("[세션 캐시] 로그인 세션 저장 완료")
+    except Exception as e:
+        logger.warning(f"[세션 캐시] 저장 실패: {e}")
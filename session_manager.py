@@ -0,0 +1,115 @@
+"""
+학생별 브라우저 세션 관리
+
+하나의 Chromium 프로세스 위에서 학생마다 BrowserContext/page, 로그인 상태,
+검증 결과를 따로 들고 있다. 백엔드 명령은 student_id(또는 token)로 세션을 찾아간다.
+"""
+
+from state_sync import UIStateSync
+
+
+class BrowserSession:
+    """학생 1명의 실행 세션"""
+
+    def __init__(self, student_id, token=None):
+        self.student_id = student_id
+        self.token = token
+        self.page = None
+        self.browser = None
+        self.context = None
+
+        self.login_status = {
+            "logged_in": False,
+            "student_id": student_id,
+            "last_url": None,
+        }
+        self.verification_result = {
+            "success": False,
+            "message": "",
+            "has_result": False,  # 검증 결과가 있는지 여부
+        }
+        self.ui_state_sync = UIStateSync()  # 백엔드에 보낸 ui_state 버전
+
+    @property
+    def key(self):
+        return self.student_id
+
+    def attach(self, page, browser, context):
+        """로그인 성공한 브라우저 핸들 연결"""
+        self.page = page
+        self.browser = browser
+        self.context = context
+
+    def is_page_closed(self):
+        try:
+            return self.page is not None and self.page.is_closed()
+        except Exception:
+            return True
+
+    def store_verification(self, success, message):
+        self.verification_result["success"] = success
+        self.verification_result["message"] = message
+        self.verification_result["has_result"] = True
+
+    def clear_verification(self):
+        self.verification_result = {"success": False, "message": "", "has_result": False}
+
+    def __repr__(self):
+        return f"<BrowserSession {self.student_id} logged_in={self.login_status['logged_in']}>"
+
+
+class SessionManager:
+    """student_id → BrowserSession (삽입 순서 = 최근 로그인 순)"""
+
+    def __init__(self):
+        self._sessions = {}
+        self._tokens = {}  # token → student_id
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __iter__(self):
+        return iter(list(self._sessions.values()))
+
+    def get(self, student_id):
+        return self._sessions.get(student_id)
+
+    def add(self, session):
+        """세션 등록 (같은 학번의 기존 세션은 호출 측에서 먼저 정리해야 함)"""
+        self._sessions.pop(session.key, None)
+        self._sessions[session.key] = session
+        if session.token:
+            self._tokens[session.token] = session.key
+
+    def remove(self, session):
+        if self._sessions.get(session.key) is session:
+            del self._sessions[session.key]
+        for token, key in list(self._tokens.items()):
+            if key == session.key:
+                del self._tokens[token]
+
+    def latest(self):
+        """가장 최근에 로그인한 세션"""
+        if not self._sessions:
+            return None
+        return next(reversed(self._sessions.values()))
+
+    def resolve_key(self, command):
+        """명령 → 세션 키 (student_id 우선, 없으면 token). 식별자가 없으면 None"""
+        student_id = command.get("student_id")
+        if student_id:
+            return student_id
+        token = command.get("token")
+        if token:
+            return self._tokens.get(token, token)
+        return None
+
+    def resolve(self, command):
+        """
+        명령을 처리할 세션 찾기
+        식별자가 없는 명령(구 백엔드)은 가장 최근 세션으로 보낸다.
+        """
+        key = self.resolve_key(command)
+        if key is None:
+            return self.latest()
+        return self._sessions.get(key)
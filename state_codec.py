@@ -0,0 +1,208 @@
+"""
+/state 요청 본문 인코딩 (압축 + 축약 직렬화)
+
+- JSON은 항상 공백 없이, 한글은 \\uXXXX 이스케이프 없이 UTF-8 그대로 직렬화
+- 압축(gzip/zstd)과 축약 형식(compact-1)은 백엔드가 /execution_web/init 응답으로
+  지원한다고 알린 경우에만 사용 (negotiate)
+    헤더:  Accept-Encoding: zstd, gzip          /  X-State-Formats: compact-1
+    JSON:  {"state_encodings": ["zstd", "gzip"], "state_formats": ["compact-1"]}
+- 축약 형식은 data.ui_state(전체 스냅샷)에만 적용: 키를 짧게 바꾸고 기본값
+  (빈 sub_items, false, 빈 문자열 등)을 생략한다. ui_state_patch는 원래 키 그대로 보낸다.
+  백엔드는 expand_ui_state()와 같은 방식으로 되돌려 쓰면 된다.
+"""
+
+import os
+import gzip
+import json
+
+import service_log
+
+try:
+    import zstandard
+except ImportError:  # zstandard 미설치 시 gzip만 사용
+    zstandard = None
+
+logger = service_log.get_logger("state_codec")
+
+# auto: 백엔드가 알린 것 중 선택 / off: 압축 안 함 / gzip, zstd: 강제
+STATE_COMPRESSION = os.getenv("STATE_COMPRESSION", "auto").lower()
+# auto: 백엔드 지원 시 축약 형식 / true: 강제 / false: 사용 안 함
+STATE_COMPACT = os.getenv("STATE_COMPACT", "auto").lower()
+STATE_COMPRESS_MIN_BYTES = 1024  # 이보다 작은 본문은 압축하지 않음
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+COMPACT_FORMAT = "compact-1"
+
+_encoding = None          # 협상된 압축 방식 (None = 압축 안 함)
+_compact = False          # 축약 형식 사용 여부
+_zstd_compressor = None
+
+
+# ============================================================
+# 축약 형식 (compact-1)
+# ============================================================
+
+# 스키마별 (원래 키 → 짧은 키, 생략 가능한 기본값)
+_STATE_KEYS = {"url": "u", "sidebar": "s", "current_page": "p"}
+_SIDEBAR_KEYS = {"label": "l", "expanded": "e", "checked": "c", "sub_items": "s"}
+_SIDEBAR_DEFAULTS = {"expanded": False, "checked": False, "sub_items": []}
+_PAGE_KEYS = {"title": "t", "detail_page": "d", "form_fields": "f"}
+_PAGE_DEFAULTS = {"detail_page": "", "form_fields": []}
+_FIELD_KEYS = {"id": "i", "label": "l", "type": "t", "input_type": "y", "value": "v"}
+_FIELD_DEFAULTS = {"type": "input", "input_type": "text", "value": ""}
+
+
+def _shrink(obj, keys, defaults):
+    out = {}
+    for key, value in obj.items():
+        if key in defaults and value == defaults[key]:
+            continue
+        out[keys.get(key, key)] = value
+    return out
+
+
+def _grow(obj, keys, defaults):
+    reverse = {short: key for key, short in keys.items()}
+    out = {reverse.get(key, key): value for key, value in obj.items()}
+    for key, value in defaults.items():
+        if key not in out:
+            out[key] = list(value) if isinstance(value, list) else value
+    return out
+
+
+def _compact_sidebar(nodes):
+    result = []
+    for node in nodes:
+        short = _shrink(node, _SIDEBAR_KEYS, _SIDEBAR_DEFAULTS)
+        if "s" in short:
+            short["s"] = _compact_sidebar(short["s"])
+        result.append(short)
+    return result
+
+
+def _expand_sidebar(nodes):
+    result = []
+    for node in nodes:
+        full = _grow(node, _SIDEBAR_KEYS, _SIDEBAR_DEFAULTS)
+        full["sub_items"] = _expand_sidebar(full["sub_items"])
+        result.append(full)
+    return result
+
+
+def compact_ui_state(ui_state):
+    """ui_state → 축약 형식 (원본은 변경하지 않음)"""
+    if not isinstance(ui_state, dict):
+        return ui_state
+    result = _shrink(ui_state, _STATE_KEYS, {})
+    if isinstance(result.get("s"), list):
+        result["s"] = _compact_sidebar(result["s"])
+    if isinstance(result.get("p"), dict):
+        page = _shrink(result["p"], _PAGE_KEYS, _PAGE_DEFAULTS)
+        # 필드를 못 찾으면 scrape가 form_fields에 문자열("인식되지 않았다")을 넣음 → 그대로 전송
+        if isinstance(page.get("f"), list):
+            page["f"] = [_shrink(f, _FIELD_KEYS, _FIELD_DEFAULTS) for f in page["f"]]
+        result["p"] = page
+    return result
+
+
+def expand_ui_state(compact):
+    """compact_ui_state의 역변환 (백엔드/목 서버/검증용)"""
+    if not isinstance(compact, dict):
+        return compact
+    result = _grow(compact, _STATE_KEYS, {})
+    if isinstance(result.get("sidebar"), list):
+        result["sidebar"] = _expand_sidebar(result["sidebar"])
+    if isinstance(result.get("current_page"), dict):
+        page = _grow(result["current_page"], _PAGE_KEYS, _PAGE_DEFAULTS)
+        if isinstance(page["form_fields"], list):
+            page["form_fields"] = [_grow(f, _FIELD_KEYS, _FIELD_DEFAULTS) for f in page["form_fields"]]
+        result["current_page"] = page
+    return result
+
+
+# ============================================================
+# 협상 / 인코딩
+# ============================================================
+
+def _split_tokens(value):
+    if isinstance(value, str):
+        value = value.split(",")
+    return {str(v).split(";")[0].strip().lower() for v in value or [] if str(v).strip()}
+
+
+def _available(encoding):
+    return encoding == "gzip" or (encoding == "zstd" and zstandard is not None)
+
+
+def negotiate(response):
+    """
+    init 응답에서 백엔드가 받을 수 있는 압축/형식 확인
+    (응답이 없거나 알리지 않으면 기존처럼 비압축 JSON)
+    """
+    global _encoding, _compact
+    encodings, formats = set(), set()
+    if response is not None:
+        encodings |= _split_tokens(response.headers.get("Accept-Encoding", ""))
+        formats |= _split_tokens(response.headers.get("X-State-Formats", ""))
+        try:
+            body = response.json()
+        except Exception:
+            body = None
+        if isinstance(body, dict):
+            encodings |= _split_tokens(body.get("state_encodings"))
+            formats |= _split_tokens(body.get("state_formats"))
+
+    if STATE_COMPRESSION == "off":
+        _encoding = None
+    elif STATE_COMPRESSION in ("gzip", "zstd"):
+        _encoding = STATE_COMPRESSION if _available(STATE_COMPRESSION) else "gzip"
+    else:
+        _encoding = next((e for e in ("zstd", "gzip") if e in encodings and _available(e)), None)
+
+    if STATE_COMPACT in ("true", "false"):
+        _compact = STATE_COMPACT == "true"
+    else:
+        _compact = COMPACT_FORMAT in formats
+
+    logger.info(f"[상태 인코딩] 압축: {_encoding or '없음'}, 축약 형식: {'사용' if _compact else '사용 안 함'}")
+
+
+def disable():
+    """백엔드가 인코딩된 본문을 거부함(415) → 이후 평문 JSON"""
+    global _encoding, _compact
+    _encoding = None
+    _compact = False
+
+
+def _compress(raw, encoding):
+    global _zstd_compressor
+    if encoding == "zstd":
+        if _zstd_compressor is None:
+            _zstd_compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        return _zstd_compressor.compress(raw)
+    return gzip.compress(raw, compresslevel=GZIP_LEVEL)
+
+
+def encode_state(data, encoding=None, compact=None):
+    """
+    /state 본문 {"data": data} → (bytes, headers)
+    encoding/compact를 주지 않으면 협상 결과 사용
+    """
+    encoding = _encoding if encoding is None else encoding or None
+    compact = _compact if compact is None else compact
+
+    headers = {"Content-Type": "application/json; charset=utf-8"}
+    if compact and isinstance(data.get("ui_state"), dict):
+        data = {**data, "ui_state": compact_ui_state(data["ui_state"])}
+        headers["X-State-Format"] = COMPACT_FORMAT
+
+    raw = json.dumps({"data": data}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if encoding and len(raw) >= STATE_COMPRESS_MIN_BYTES:
+        raw = _compress(raw, encoding)
+        headers["Content-Encoding"] = encoding
+    return raw, headers
+
+
+def is_encoded(headers):
+    return "Content-Encoding" in headers or "X-State-Format" in headers
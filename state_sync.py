@@ -0,0 +1,131 @@
+"""
+UI 상태 버전 관리 + JSON Patch(RFC 6902) 증분 전송
+
+세션마다 백엔드가 마지막으로 받았다고 확인(200 응답)한 ui_state를 기억해 두고,
+다음 전송부터는 그 버전 대비 patch만 보낸다.
+백엔드가 버전 불일치(409 또는 ui_state_version_mismatch)를 알리면 전체 스냅샷을 다시 보낸다.
+
+전송 형식 (send_state의 data 안):
+    전체: {"ui_state_version": 3, "ui_state": {...}}
+    증분: {"ui_state_version": 4, "ui_state_base_version": 3, "ui_state_patch": [{"op": ..., "path": ..., ...}]}
+"""
+
+import copy
+
+
+def _escape(key):
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token):
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def json_diff(old, new, path=""):
+    """old → new 로 바꾸는 JSON Patch 연산 목록 (리스트는 인덱스 기준 비교)"""
+    if old == new:
+        return []
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in new.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in old:
+                ops.append({"op": "add", "path": child, "value": value})
+            else:
+                ops.extend(json_diff(old[key], value, child))
+        return ops
+
+    if isinstance(old, list) and isinstance(new, list):
+        ops = []
+        common = min(len(old), len(new))
+        for i in range(common):
+            ops.extend(json_diff(old[i], new[i], f"{path}/{i}"))
+        for i in range(common, len(new)):
+            ops.append({"op": "add", "path": f"{path}/{i}", "value": new[i]})
+        # 뒤에서부터 지워야 앞쪽 인덱스가 밀리지 않음
+        for i in range(len(old) - 1, common - 1, -1):
+            ops.append({"op": "remove", "path": f"{path}/{i}"})
+        return ops
+
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+def apply_patch(document, ops):
+    """json_diff 결과 적용 (백엔드/목 서버/검증용). 원본은 건드리지 않음"""
+    document = copy.deepcopy(document)
+    for op in ops:
+        tokens = [_unescape(t) for t in op["path"].split("/")[1:]]
+        if not tokens:
+            document = copy.deepcopy(op["value"])
+            continue
+
+        parent = document
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+        last = tokens[-1]
+
+        if isinstance(parent, list):
+            index = len(parent) if last == "-" else int(last)
+            if op["op"] == "add":
+                parent.insert(index, copy.deepcopy(op["value"]))
+            elif op["op"] == "remove":
+                del parent[index]
+            else:
+                parent[index] = copy.deepcopy(op["value"])
+        else:
+            if op["op"] == "remove":
+                del parent[last]
+            else:
+                parent[last] = copy.deepcopy(op["value"])
+    return document
+
+
+class UIStateSync:
+    """세션 1개의 ui_state 버전 상태"""
+
+    def __init__(self):
+        self.version = 0
+        self.acked_version = None
+        self.acked_state = None
+
+    def build(self, ui_state):
+        """
+        다음 버전의 전송 필드 생성
+        확인된 기준 버전이 있으면 patch, 없으면 전체 스냅샷
+        """
+        self.version += 1
+        if self.acked_state is None:
+            return {"ui_state_version": self.version, "ui_state": ui_state}
+
+        return {
+            "ui_state_version": self.version,
+            "ui_state_base_version": self.acked_version,
+            "ui_state_patch": json_diff(self.acked_state, ui_state),
+        }
+
+    def ack(self, version, ui_state):
+        """백엔드가 해당 버전을 받았음 (수집 결과는 이후 변경하지 않으므로 참조만 보관)"""
+        self.acked_version = version
+        self.acked_state = ui_state
+
+    def reset(self):
+        """기준 버전 폐기 → 다음 전송은 전체 스냅샷"""
+        self.acked_version = None
+        self.acked_state = None
+
+    @staticmethod
+    def is_mismatch(response):
+        """백엔드가 버전 불일치(전체 스냅샷 필요)를 알렸는지"""
+        if response is None:
+            return False
+        if response.status_code == 409:
+            return True
+        try:
+            body = response.json()
+        except Exception:
+            return False
+        return isinstance(body, dict) and bool(body.get("ui_state_version_mismatch"))
@@ -0,0 +1,266 @@
+"""
+단계별 지연시간 추적 (span + 히스토그램)
+
+/command 수신부터 /state 전송까지 어느 단계에서 시간이 쓰이는지 보기 위한 가벼운 추적 계층.
+- span(stage, **attrs): with 블록 실행 시간을 기록. 명령 하나(trace) 안의 span은 같은 trace_id를 가짐
+  (contextvars 기반이라 동시에 실행되는 다른 학번 명령과 섞이지 않음)
+- 단계별 최근 샘플로 p50/p95/p99 계산
+- TRACE_FILE: span마다 JSON 한 줄 기록 (1초마다 스레드에서 모아 쓰기)
+- METRICS_PORT: 127.0.0.1에서 /metrics(Prometheus 텍스트), /metrics.json, /debug/logs 제공 (0이면 끔)
+  /debug/logs는 LOG_DEBUG_TOKEN을 Authorization: Bearer 헤더로 보낸 요청에만 응답
+"""
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import contextvars
+import functools
+from collections import deque
+from contextlib import contextmanager
+
+import service_log
+
+logger = service_log.get_logger("tracing")
+
+TRACING_ENABLED = os.getenv("TRACING", "true").lower() == "true"
+TRACE_FILE = os.getenv("TRACE_FILE", "")  # 비어 있으면 파일 기록 안 함
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+HISTOGRAM_SAMPLES = 2048  # 단계별로 보관하는 최근 샘플 수
+QUANTILES = (0.5, 0.95, 0.99)
+
+_trace_id = contextvars.ContextVar("trace_id", default=None)
+_span_id = contextvars.ContextVar("span_id", default=None)
+
+_pending_lines = []
+_flush_task = None
+_server = None
+
+
+class Histogram:
+    """최근 샘플 기반 분위수 + 누적 개수/합계"""
+
+    def __init__(self):
+        self.samples = deque(maxlen=HISTOGRAM_SAMPLES)
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+
+    def observe(self, value_ms, error=False):
+        self.samples.append(value_ms)
+        self.count += 1
+        self.total += value_ms
+        if error:
+            self.errors += 1
+
+    def quantile(self, q):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            **{f"p{int(q * 100)}_ms": round(self.quantile(q), 3) for q in QUANTILES},
+        }
+
+
+HISTOGRAMS = {}  # 단계 이름 → Histogram
+
+
+def _new_id():
+    return uuid.uuid4().hex[:16]
+
+
+def current_trace_id():
+    return _trace_id.get()
+
+
+@contextmanager
+def trace(stage, **attrs):
+    """명령 1개 단위의 최상위 span (새 trace_id 발급)"""
+    token = _trace_id.set(_new_id())
+    try:
+        with span(stage, **attrs) as s:
+            yield s
+    finally:
+        _trace_id.reset(token)
+
+
+@contextmanager
+def span(stage, **attrs):
+    """
+    with 블록 실행 시간 기록
+    블록 안에서 attrs dict(yield 값)에 값을 추가하면 trace 파일에 함께 기록된다.
+    """
+    if not TRACING_ENABLED:
+        yield attrs
+        return
+
+    span_id = _new_id()
+    parent_id = _span_id.get()
+    token = _span_id.set(span_id)
+    start_wall = time.time()
+    start = time.perf_counter()
+    error = None
+    try:
+        yield attrs
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        _span_id.reset(token)
+        HISTOGRAMS.setdefault(stage, Histogram()).observe(duration_ms, error is not None)
+        if TRACE_FILE:
+            record = {
+                "trace_id": _trace_id.get(),
+                "span_id": span_id,
+                "parent_id": parent_id,
+                "name": stage,
+                "start": round(start_wall, 6),
+                "duration_ms": round(duration_ms, 3),
+            }
+            if error:
+                record["error"] = error
+            if attrs:
+                record["attrs"] = attrs
+            _pending_lines.append(json.dumps(record, ensure_ascii=False, default=str))
+
+
+def traced(stage):
+    """async 함수 전체를 span으로 감싸는 데코레이터"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(stage):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def snapshot():
+    """단계별 요약 {이름: {count, errors, mean_ms, p50_ms, p95_ms, p99_ms}}"""
+    return {name: hist.summary() for name, hist in sorted(HISTOGRAMS.items())}
+
+
+def render_prometheus():
+    lines = [
+        "# HELP ndrims_stage_latency_ms Stage latency in milliseconds (recent samples)",
+        "# TYPE ndrims_stage_latency_ms summary",
+    ]
+    for name, hist in sorted(HISTOGRAMS.items()):
+        for q in QUANTILES:
+            lines.append(f'ndrims_stage_latency_ms{{stage="{name}",quantile="{q}"}} {hist.quantile(q):.3f}')
+        lines.append(f'ndrims_stage_latency_ms_sum{{stage="{name}"}} {hist.total:.3f}')
+        lines.append(f'ndrims_stage_latency_ms_count{{stage="{name}"}} {hist.count}')
+        lines.append(f'ndrims_stage_errors_total{{stage="{name}"}} {hist.errors}')
+    return "\n".join(lines) + "\n"
+
+
+# ============================================================
+# trace 파일 / metrics 엔드포인트
+# ============================================================
+
+def _write_lines(lines):
+    with open(TRACE_FILE, "a", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+async def flush():
+    """모인 trace 줄을 파일에 기록 (파일 I/O는 스레드에서)"""
+    if not _pending_lines or not TRACE_FILE:
+        return
+    lines = _pending_lines[:]
+    del _pending_lines[:len(lines)]
+    try:
+        await asyncio.to_thread(_write_lines, lines)
+    except OSError as e:
+        logger.warning(f"[Tracing] trace 파일 기록 실패: {e}")
+
+
+async def _flush_loop():
+    while True:
+        await asyncio.sleep(1)
+        await flush()
+
+
+async def _handle_metrics(reader, writer):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        # 헤더는 Authorization만 확인
+        authorization = ""
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout=5)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "authorization":
+                authorization = value.strip()
+        parts = request_line.decode("latin-1").split()
+        path = parts[1] if len(parts) > 1 else "/"
+
+        if path.startswith("/metrics.json"):
+            status, content_type = "200 OK", "application/json; charset=utf-8"
+            body = json.dumps(snapshot(), ensure_ascii=False).encode("utf-8")
+        elif path.startswith("/metrics"):
+            status, content_type = "200 OK", "text/plain; version=0.0.4; charset=utf-8"
+            body = render_prometheus().encode("utf-8")
+        elif path.startswith("/debug/logs") and not service_log.LOG_DEBUG_TOKEN:
+            status, content_type, body = "404 Not Found", "text/plain", b"not found\n"
+        elif path.startswith("/debug/logs") and not service_log.debug_access_allowed(authorization):
+            status, content_type, body = "401 Unauthorized", "text/plain", b"unauthorized\n"
+        elif path.startswith("/debug/logs"):
+            # 링 버퍼에 보관된 최근 로그 (LOG_RING_LEVEL 이상)
+            status, content_type = "200 OK", "text/plain; charset=utf-8"
+            body = ("\n".join(service_log.recent_lines()) + "\n").encode("utf-8")
+        else:
+            status, content_type, body = "404 Not Found", "text/plain", b"not found\n"
+
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start():
+    """trace 파일 기록 + metrics 엔드포인트 시작 (poll 시작 시 1회)"""
+    global _flush_task, _server
+    if not TRACING_ENABLED:
+        return
+    if TRACE_FILE and _flush_task is None:
+        _flush_task = asyncio.create_task(_flush_loop())
+        logger.info(f"[Tracing] trace 파일: {TRACE_FILE}")
+    if METRICS_PORT and _server is None:
+        try:
+            _server = await asyncio.start_server(_handle_metrics, METRICS_HOST, METRICS_PORT)
+            logger.info(f"[Tracing] metrics: http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+        except OSError as e:
+            logger.warning(f"[Tracing] metrics 엔드포인트 시작 실패: {e}")
+
+
+async def stop():
+    """종료 시 남은 trace 기록 + 엔드포인트 종료"""
+    global _flush_task, _server
+    if _flush_task is not None:
+        _flush_task.cancel()
+        try:
+            await _flush_task
+        except asyncio.CancelledError:
+            pass
+        _flush_task = None
+    await flush()
+    if _server is not None:
+        _server.close()
+        await _server.wait_closed()
+        _server = None
@@ -0,0 +1,162 @@
+"""
+Trajectory 컴파일러 + 캐시
+
+trajectory JSON의 여러 형태를 하나의 내부 step 목록으로 정규화하고 검증한다.
+- 평탄 구조:   [{"action": {...}, "state": {"ui_state": {...}}}, ...]
+- 비평탄 구조: [{"step_id": ..., "state": {...}, "actions": [{"action": {...}} 또는 {...}]}, ...]
+- 액션만:      [{"name": ..., "args": {...}}, ...]   (Action 모델이 만든 리스트)
+- 새 형식:     {"actions": [위 형태 중 하나], "verification": {...}}
+
+파일은 (경로, mtime_ns, 크기) 기준으로 컴파일 결과를 캐시하므로
+같은 파일을 다시 실행할 때는 JSON 파싱/형식 판별/실행 계획을 다시 하지 않는다.
+"""
+
+import os
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+import trajectory_planner
+import service_log
+
+logger = service_log.get_logger("trajectory")
+
+NDRIMS_ORIGIN = "https://ndrims.dongguk.edu"
+# goto URL의 nDRIMS 주소를 다른 곳(로컬 목 사이트 등)으로 바꿔 실행할 때 지정
+NDRIMS_BASE_URL = os.getenv("NDRIMS_BASE_URL", "").rstrip("/")
+
+
+class TrajectoryError(ValueError):
+    """trajectory 형식 오류"""
+
+
+@dataclass(frozen=True)
+class CompiledStep:
+    action: dict            # {"name": ..., "args": {...}, ("state": "grid")}
+    step_no: int            # 로그용 step 번호 (1부터)
+    sub_no: int = None      # 비평탄 구조의 step 안 순번 (평탄 구조는 None)
+    step_id: object = None  # 비평탄 구조의 step_id
+    ui_state: dict = None   # 실행 전에 확인할 UI 상태 (step의 첫 액션에만)
+    starts_step: bool = False  # 비평탄 구조에서 step의 첫 액션
+
+
+@dataclass(frozen=True)
+class CompiledTrajectory:
+    steps: tuple
+    plan: tuple             # trajectory_planner.plan 결과 ((인덱스 목록, 액션), ...)
+    verification: dict = None
+    source: str = "<inline>"
+
+    @property
+    def actions(self):
+        """액션 dict 목록"""
+        return [step.action for step in self.steps]
+
+    def __len__(self):
+        return len(self.steps)
+
+
+def _normalize_action(action, where):
+    if not isinstance(action, dict):
+        raise TrajectoryError(f"{where}: 액션은 객체여야 합니다 ({type(action).__name__})")
+    name = action.get("name")
+    if not isinstance(name, str) or not name:
+        raise TrajectoryError(f"{where}: 액션 name이 없습니다")
+    args = action.get("args") or {}
+    if not isinstance(args, dict):
+        raise TrajectoryError(f"{where}: args는 객체여야 합니다")
+
+    if name == "goto" and NDRIMS_BASE_URL and str(args.get("url", "")).startswith(NDRIMS_ORIGIN):
+        args = {**args, "url": NDRIMS_BASE_URL + args["url"][len(NDRIMS_ORIGIN):]}
+
+    normalized = {"name": name, "args": args}
+    if action.get("state") is not None:
+        normalized["state"] = action["state"]
+    return normalized
+
+
+def _ui_state(item):
+    state = item.get("state")
+    return state.get("ui_state") if isinstance(state, dict) else None
+
+
+def _compile_steps(items):
+    steps = []
+    for i, item in enumerate(items, start=1):
+        if not isinstance(item, dict):
+            raise TrajectoryError(f"[{i}]: step은 객체여야 합니다")
+
+        if isinstance(item.get("action"), dict):
+            # 평탄 구조
+            steps.append(CompiledStep(
+                _normalize_action(item["action"], f"[{i}]"), i, ui_state=_ui_state(item),
+            ))
+
+        elif isinstance(item.get("actions"), list):
+            # 비평탄 구조 (기존처럼 name/args가 없는 항목은 건너뜀)
+            sid = item.get("step_id", i)
+            ui_state = _ui_state(item)
+            j = 0
+            for a in item["actions"]:
+                if isinstance(a, dict) and "action" in a:
+                    a = a["action"]
+                elif not (isinstance(a, dict) and "name" in a and "args" in a):
+                    continue
+                j += 1
+                steps.append(CompiledStep(
+                    _normalize_action(a, f"[{i}.{j}]"), i, j, sid,
+                    ui_state=ui_state if j == 1 else None, starts_step=(j == 1),
+                ))
+
+        elif "name" in item:
+            # 액션만 있는 리스트
+            steps.append(CompiledStep(_normalize_action(item, f"[{i}]"), i))
+
+        else:
+            raise TrajectoryError(f"[{i}]: action/actions/name 중 하나가 필요합니다")
+    return tuple(steps)
+
+
+def compile_trajectory(data, source="<inline>"):
+    """파싱된 trajectory(JSON 값) → CompiledTrajectory"""
+    if isinstance(data, CompiledTrajectory):
+        return data
+
+    verification = None
+    if isinstance(data, dict):
+        verification = data.get("verification")
+        data = data.get("actions", [])
+    if not isinstance(data, list):
+        raise TrajectoryError(f"{source}: trajectory는 리스트 또는 actions를 가진 객체여야 합니다")
+
+    steps = _compile_steps(data)
+    # 상태 검사가 있는 액션이나 비평탄 step의 시작은 묶음 중간에 넣지 않음
+    plan = trajectory_planner.plan(
+        [step.action for step in steps],
+        barrier=lambda k: bool(steps[k].ui_state) or steps[k].starts_step,
+    )
+    return CompiledTrajectory(steps, tuple(plan), verification, source)
+
+
+_cache = {}  # 경로 → ((mtime_ns, size), CompiledTrajectory)
+
+
+def load_trajectory(path):
+    """trajectory 파일 컴파일 (파일이 바뀌지 않았으면 캐시 사용)"""
+    path = Path(path).resolve()
+    stat = path.stat()
+    key = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _cache.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError as e:
+        raise TrajectoryError(f"{path.name}: JSON 파싱 실패: {e}") from e
+
+    compiled = compile_trajectory(data, source=path.name)
+    _cache[path] = (key, compiled)
+    logger.info(f"[Trajectory] 컴파일 완료: {path.name} ({len(compiled)}개 액션)")
+    return compiled
@@ -0,0 +1,74 @@
+"""
+Trajectory 실행 계획 (독립 액션 묶기)
+
+연속된 type 액션이 서로 다른 입력칸을 채우는 경우 서로 의존성이 없으므로
+fill_batch 가상 액션 하나로 묶어 페이지 안에서 한 번에 채운다 (ActionExecutor.fill_batch).
+goto/click/select/wait_for 등은 페이지 이동이나 팝업을 일으킬 수 있는 경계라서
+묶지 않고 그대로 하나씩 실행한다.
+
+묶을 수 있는 조건
+- 연속된 type 액션이 2개 이상
+- selector가 document.querySelector로 그대로 쓸 수 있는 CSS (role=, text=, >> 등 Playwright 전용 문법 제외)
+- 같은 입력칸(selector)이 두 번 나오지 않음
+- barrier(i)가 True인 액션(실행 전 상태 검사가 필요한 step 등)은 묶음을 시작만 할 수 있음
+"""
+
+import re
+
+PIPELINE_ENABLED = True
+BATCHABLE_ACTIONS = {"type"}
+
+# Playwright 전용 selector 엔진/문법
+_PLAYWRIGHT_SELECTOR = re.compile(
+    r"^\s*(role|text|id|data-testid|xpath|css|internal:[\w-]+|nth|visible)\s*=|>>|^\s*//|^\s*\.\.|"
+    r":has-text\(|:text\(|:text-is\(|:text-matches\(|:visible|:nth-match\(|:left-of\(|:right-of\(|:above\(|:below\(|:near\("
+)
+
+
+def is_plain_css(selector):
+    return bool(selector) and not _PLAYWRIGHT_SELECTOR.search(selector)
+
+
+def _batchable(action):
+    if action.get("name") not in BATCHABLE_ACTIONS:
+        return False
+    args = action.get("args") or {}
+    return is_plain_css(args.get("selector", "")) and "text" in args
+
+
+def plan(actions, barrier=None):
+    """
+    actions(액션 dict 목록) → [(원래 인덱스 목록, 실행할 액션)]
+    묶을 수 없는 액션은 ([i], 원래 액션) 그대로
+    """
+    if not PIPELINE_ENABLED:
+        return [([i], action) for i, action in enumerate(actions)]
+
+    planned = []
+    group = []  # (인덱스, 액션)
+
+    def flush():
+        if len(group) >= 2:
+            fields = [{"selector": a["args"]["selector"], "text": a["args"]["text"]} for _, a in group]
+            planned.append(([i for i, _ in group], {"name": "fill_batch", "args": {"fields": fields}}))
+        else:
+            planned.extend(([i], a) for i, a in group)
+        group.clear()
+
+    for i, action in enumerate(actions):
+        joinable = (
+            _batchable(action)
+            and not (barrier and barrier(i) and group)
+            and all(a["args"]["selector"] != action["args"]["selector"] for _, a in group)
+        )
+        if not joinable:
+            flush()
+            if _batchable(action):
+                group.append((i, action))
+            else:
+                planned.append(([i], action))
+            continue
+        group.append((i, action))
+
+    flush()
+    return planned
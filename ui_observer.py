@@ -0,0 +1,116 @@
+"""
+페이지 내 MutationObserver 에이전트
+
+문서마다 한 번 설치되어 사이드바 트리 / 활성 탭패널·팝업 영역의 DOM 변경을 감시하고,
+마지막 수집 이후 어느 영역이 바뀌었는지(dirty) 기록한다.
+스크래퍼는 바뀐 영역만 다시 수집한다.
+
+스크립트가 el.value = ... 로 넣은 값은 DOM 변경도 input/change 이벤트도 없으므로,
+dirty 플래그를 읽는 같은 evaluate 안에서 탭패널·팝업 필드 값의 해시를 직전 값과 비교한다.
+"""
+
+from playwright.async_api import Page
+
+import service_log
+
+logger = service_log.get_logger("ui_observer")
+
+# 설치(없을 때만) + dirty 플래그 읽고 초기화를 한 번의 evaluate로 처리
+# 새 문서(페이지 이동 후)에서는 설치 직후이므로 모든 영역을 dirty로 돌려준다.
+_TAKE_DIRTY_JS = """
+() => {
+    let agent = window.__ndrimsUiObserver;
+    let installed = false;
+
+    if (!agent) {
+        const dirty = { sidebar: true, page: true };
+        const SIDEBAR = '.cl-tree, .cl-tree-item';
+        const PAGE = '[role="tabpanel"], .cl-dialog';
+        const FIELDS = PAGE.split(', ').map(p => `${p} input, ${p} select, ${p} textarea`).join(', ');
+
+        // 필드 값 해시 (FNV-1a 32비트) — 값 문자열을 보관하지 않고 비교만
+        const valuesHash = () => {
+            let h = 0x811c9dc5;
+            for (const el of document.querySelectorAll(FIELDS)) {
+                const v = (el.value || '') + '\u0001';
+                for (let i = 0; i < v.length; i++) {
+                    h ^= v.charCodeAt(i);
+                    h = Math.imul(h, 0x01000193);
+                }
+            }
+            return h >>> 0;
+        };
+
+        const mark = (node, deep) => {
+            if (dirty.sidebar && dirty.page) return;
+            const el = node.nodeType === 1 ? node : node.parentElement;
+            if (!el) return;
+            if (!dirty.sidebar && (el.closest(SIDEBAR) || (deep && el.querySelector(SIDEBAR)))) {
+                dirty.sidebar = true;
+            }
+            if (!dirty.page && (el.closest(PAGE) || (deep && el.querySelector(PAGE)))) {
+                dirty.page = true;
+            }
+        };
+
+        const observer = new MutationObserver(records => {
+            for (const r of records) {
+                if (dirty.sidebar && dirty.page) break;
+                if (r.type === 'childList') {
+                    mark(r.target, false);
+                    r.addedNodes.forEach(n => mark(n, true));
+                    r.removedNodes.forEach(n => { if (n.nodeType === 1) mark(n, true); });
+                } else if (r.type === 'attributes') {
+                    // 에이전트 자신이 다는 표시 속성(data-ndrims-*)은 UI 변경이 아님
+                    if (r.attributeName && r.attributeName.startsWith('data-ndrims')) continue;
+                    // 탭 전환/팝업 표시는 조상 요소의 style/class 변경으로 일어나기도 함
+                    mark(r.target, true);
+                } else {
+                    mark(r.target, false);
+                }
+            }
+        });
+        observer.observe(document.documentElement, {
+            subtree: true, childList: true, attributes: true, characterData: true,
+        });
+
+        // 입력값 변경은 DOM 변경이 아니므로 이벤트로 감지
+        const onInput = e => mark(e.target, false);
+        document.addEventListener('input', onInput, true);
+        document.addEventListener('change', onInput, true);
+
+        agent = window.__ndrimsUiObserver = {
+            values: valuesHash(),
+            take() {
+                const values = valuesHash();
+                const result = { sidebar: dirty.sidebar, page: dirty.page || values !== this.values };
+                this.values = values;
+                dirty.sidebar = false;
+                dirty.page = false;
+                return result;
+            },
+        };
+        installed = true;
+    }
+
+    const result = agent.take();
+    if (installed) {
+        result.sidebar = true;
+        result.page = true;
+    }
+    result.installed = installed;
+    return result;
+}
+"""
+
+
+async def take_dirty_regions(page: Page):
+    """
+    마지막 호출 이후 바뀐 영역 → {"sidebar": bool, "page": bool, "installed": bool}
+    관찰자 설치에 실패하면 전부 dirty로 간주
+    """
+    try:
+        return await page.evaluate(_TAKE_DIRTY_JS)
+    except Exception as e:
+        logger.warning(f"[WARN] UI 변경 감지 에이전트 사용 불가: {e}")
+        return {"sidebar": True, "page": True, "installed": False}